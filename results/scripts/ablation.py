@@ -39,6 +39,10 @@ def extract_decision(review_obj, fallback_to_reject=True):
             if isinstance(value, bool):
                 return "Accept" if value else "Reject"
 
+        # Structured verdicts ({decision, confidence, rationale}) carry the decision explicitly.
+        if review_obj.get("decision") in ("Accept", "Reject"):
+            return review_obj["decision"]
+
         for key, text in review_obj.items():
             if isinstance(text, str):
                 match = re.search(r'\b(accept|reject)\b', text, re.IGNORECASE)
@@ -64,6 +68,9 @@ def extract_score(review_obj, decision_scores=None, fallback_to_reject=True, act
         reviewer_scores = []
         
         for reviewer, review in review_obj["Reviewers"].items():
+            # Reviewers skipped by the adaptive (early exit) mode or timed out did not vote
+            if isinstance(review, dict) and (review.get("Skipped") or review.get("Timeout")):
+                continue
             # If an active_reviewers list is provided, skip keys not in it
             if active_reviewers is not None and reviewer not in active_reviewers:
                 continue
@@ -74,7 +81,7 @@ def extract_score(review_obj, decision_scores=None, fallback_to_reject=True, act
         if reviewer_scores:
             return sum(reviewer_scores) / len(reviewer_scores)
 
-    if isinstance(review_obj, dict):
+    if isinstance(review_obj, dict) and "decision" not in review_obj:
         for key, value in review_obj.items():
             if isinstance(value, (int, float)) and 0 <= value <= 100:
                 return value
@@ -23,6 +23,10 @@ def extract_decision(review_obj):
             if isinstance(value, bool):
                 return "Accept" if value else "Reject"
 
+        # Structured verdicts ({decision, confidence, rationale}) carry the decision explicitly.
+        if review_obj.get("decision") in ("Accept", "Reject"):
+            return review_obj["decision"]
+
         for key, text in review_obj.items():
             if isinstance(text, str):
                 match = re.search(r'\b(accept|reject)\b', text, re.IGNORECASE)
@@ -43,6 +47,9 @@ def extract_score(review_obj):
         reviewer_scores = []
         
         for reviewer, review in review_obj["Reviewers"].items():
+            # Reviewers skipped by the adaptive (early exit) mode or timed out did not vote
+            if isinstance(review, dict) and (review.get("Skipped") or review.get("Timeout")):
+                continue
             decision = extract_decision(review)  
             reviewer_scores.append(DECISION_SCORES.get(decision, 0))  
         
@@ -50,7 +57,7 @@ def extract_score(review_obj):
             return sum(reviewer_scores) / len(reviewer_scores)  
     
 
-    if isinstance(review_obj, dict):
+    if isinstance(review_obj, dict) and "decision" not in review_obj:
         for key, value in review_obj.items():
             if isinstance(value, (int, float)) and 0 <= value <= 100:
                 return value  
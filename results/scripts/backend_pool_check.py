@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util import backends, llm
+
+MODEL = "stub"
+
+class StubOllama:
+    """
+    Local stand-in for an Ollama host: answers /api/ps and /api/chat after `delay`
+    seconds, or with a 500 while unhealthy. Counts the requests it gets.
+    """
+
+    def __init__(self, resident=True, delay=0.0):
+        self.resident = resident
+        self.delay = delay
+        self.healthy = True
+        self.requests = {"ps": 0, "chat": 0}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def answer(self, kind, body):
+                with stub.lock:
+                    stub.requests[kind] += 1
+                time.sleep(stub.delay if kind == "chat" else 0)
+                status = 200 if stub.healthy else 500
+                data = json.dumps(body if stub.healthy else {"error": "stub host is down"}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on a timed-out call
+
+            def do_GET(self):
+                models = [{"name": MODEL, "model": f"{MODEL}:latest", "size": 0, "digest": "", "details": {}}] if stub.resident else []
+                self.answer("ps", {"models": models})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.answer("chat", {"model": MODEL, "created_at": datetime.now(timezone.utc).isoformat(),
+                                     "message": {"role": "assistant", "content": "ok"}, "done": True})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+def configure(*stubs):
+    """Pool of the stub hosts, once the pool's monitor has finished probing each of them."""
+    pool = backends.configure(",".join(stub.url for stub in stubs))
+    while any(stub.requests["ps"] == 0 for stub in stubs) or any(backend.probing for backend in pool.backends):
+        time.sleep(0.01)
+    return pool
+
+def ask():
+    return llm.chat("reviewer", MODEL, [{"role": "user", "content": "ping"}]).message.content
+
+def check(name, passed, detail):
+    print(f"{'ok  ' if passed else 'FAIL'} {name}: {detail}")
+    return passed
+
+def check_routing(delay):
+    """Concurrent calls are spread by outstanding requests across two warm hosts."""
+    a, b = StubOllama(delay=delay), StubOllama(delay=delay)
+    configure(a, b)
+    results = llm.fan_out(lambda _: ask(), range(8))
+    return check("least outstanding", results == ["ok"] * 8 and a.requests["chat"] == b.requests["chat"] == 4,
+                 f"8 concurrent calls -> {a.requests['chat']} / {b.requests['chat']}")
+
+def check_cold_penalty():
+    """Sequential calls stay on the host that has the model loaded."""
+    warm, cold = StubOllama(), StubOllama(resident=False)
+    configure(warm, cold)
+    for _ in range(4):
+        ask()
+    return check("cold penalty", warm.requests["chat"] == 4 and cold.requests["chat"] == 0,
+                 f"4 sequential calls -> warm {warm.requests['chat']}, cold {cold.requests['chat']}")
+
+def check_ejection():
+    """A failing host is ejected after EJECT_AFTER failed calls; its calls are retried on the other host."""
+    good, bad = StubOllama(), StubOllama()
+    pool = configure(good, bad)
+    bad.healthy = False
+    results = [ask() for _ in range(2 * backends.EJECT_AFTER)]
+    ejected = next(b for b in pool.backends if b.host == bad.url).ejected
+    return check("ejection", results == ["ok"] * len(results) and ejected and bad.requests["chat"] == backends.EJECT_AFTER,
+                 f"{bad.requests['chat']} failed calls before ejection, every call answered")
+
+def check_timeouts(delay):
+    """Calls that time out on slow hosts do not eject them."""
+    a, b = StubOllama(delay=delay), StubOllama(delay=delay)
+    pool = configure(a, b)
+    llm.configure(deadline=delay / 3, retries=0, backoff=0.01, context_size="pinned")
+    timeouts = 0
+    for _ in range(2 * backends.EJECT_AFTER):
+        try:
+            ask()
+        except llm.CallTimeout:
+            timeouts += 1
+    # The abandoned requests release their host once their HTTP timeout (the deadline) passes
+    while any(backend.outstanding for backend in pool.backends):
+        time.sleep(0.01)
+    llm.configure(retries=1, backoff=0.01, context_size="pinned")
+    ejected = sum(backend.ejected for backend in pool.backends)
+    return check("timeouts", timeouts == 2 * backends.EJECT_AFTER and not ejected,
+                 f"{timeouts} timed-out calls, {ejected} hosts ejected")
+
+def check_reprobe(eject_seconds):
+    """With every host down, a host is re-probed early at most once per ejection, and rejoins once it is back."""
+    a, b = StubOllama(), StubOllama()
+    pool = configure(a, b)
+    pool.eject_seconds = eject_seconds
+    a.healthy = b.healthy = False
+    for backend in pool.backends:
+        pool.eject(backend)
+    probes = a.requests["ps"] + b.requests["ps"]
+    start = time.monotonic()
+    failures = 0
+    for _ in range(5):
+        try:
+            ask()
+        except ConnectionError:
+            failures += 1
+    stalled = time.monotonic() - start
+    early = a.requests["ps"] + b.requests["ps"] - probes
+    passed = check("early re-probe", failures == 5 and early <= 2,
+                   f"5 calls while down: {early} probes, {stalled:.2f}s")
+    a.healthy = b.healthy = True
+    time.sleep(eject_seconds * 2 ** max(b.ejections for b in pool.backends))
+    return check("re-probe", ask() == "ok" and not any(b.ejected for b in pool.backends),
+                 "hosts rejoin after their ejection expires") and passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the backend pool's routing, ejection, timeouts and re-probing against local stub Ollama hosts")
+    parser.add_argument("--delay", type=float, default=0.3, help="Seconds a stub chat call takes (makes concurrent calls overlap)")
+    parser.add_argument("--eject-seconds", type=float, default=0.5, help="First ejection of a failing stub host")
+    args = parser.parse_args()
+
+    llm.configure(retries=1, backoff=0.01, context_size="pinned")
+    results = [check_routing(args.delay), check_cold_penalty(), check_ejection(), check_timeouts(args.delay), check_reprobe(args.eject_seconds)]
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
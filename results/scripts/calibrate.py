@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import glob
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util.budget import estimate_tokens
+
+DEFAULT_MODELS = ["mistral", "llama3.2", "qwen2.5", "deepseek-r1"]
+# Output keys of a section review -> role names used by the planner
+ROLE_KEYS = {"Test": "test", "Grammar Check": "grammar", "Novelty Check": "novelty",
+             "Fact Check": "factchecker", "Questioner": "questioner", "Final Summary": "summarizer"}
+PROBE_PROMPT = "Summarize the following text in a few sentences.\n\n" + " ".join(
+    ["Multi-agent review systems split a paper into sections and ask several language models to critique each one."] * 30)
+
+def measure_model(model, num_predict, runs):
+    """Prompt and completion throughput (tokens/second) of a model, from Ollama's own timings."""
+    import ollama
+    ollama.generate(model=model, prompt="Hello", options={"num_predict": 1})  # load the model first
+    prompt_tokens = prompt_ns = completion_tokens = completion_ns = 0
+    for _ in range(runs):
+        response = ollama.generate(model=model, prompt=PROBE_PROMPT, options={"num_predict": num_predict})
+        prompt_tokens += response.prompt_eval_count or 0
+        prompt_ns += response.prompt_eval_duration or 0
+        completion_tokens += response.eval_count or 0
+        completion_ns += response.eval_duration or 0
+    return {
+        "prompt_tps": round(prompt_tokens / (prompt_ns / 1e9), 1) if prompt_ns else None,
+        "completion_tps": round(completion_tokens / (completion_ns / 1e9), 1) if completion_ns else None,
+    }
+
+def output_sizes(directory):
+    """Mean completion tokens per role and mean questions per section in stored MARS outputs."""
+    lengths = defaultdict(list)
+    questions = []
+    for file_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(file_path, "r") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Error parsing {file_path}: {e}")
+                continue
+        for review_data in data.get("Section Reviews", {}).values():
+            if not isinstance(review_data, dict):
+                continue
+            if isinstance(review_data.get("Review"), str):
+                lengths["deskreviewer"].append(estimate_tokens(review_data["Review"]))
+            for review in review_data.get("Reviewers", {}).values():
+                if isinstance(review, str):
+                    lengths["reviewer"].append(estimate_tokens(review))
+            for key, role in ROLE_KEYS.items():
+                if isinstance(review_data.get(key), str):
+                    lengths[role].append(estimate_tokens(review_data[key]))
+            if isinstance(review_data.get("Questioner"), str):
+                questions.append(len([q for q in review_data["Questioner"].split("?") if q.strip()]))
+    sizes = {role: round(sum(values) / len(values)) for role, values in lengths.items() if values}
+    return sizes, (round(sum(questions) / len(questions), 1) if questions else None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the calibration file used by MARS.py --plan and the review budget")
+    parser.add_argument("output", help="Calibration file to write (JSON)")
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="Comma separated models to measure")
+    parser.add_argument("--results", default=None, help="Stored MARS outputs (e.g. dataset_results) to measure output sizes from")
+    parser.add_argument("--num-predict", type=int, default=128, help="Tokens generated per measurement")
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per model")
+    parser.add_argument("--skip-throughput", action="store_true", help="Only measure output sizes (no model calls)")
+    args = parser.parse_args()
+
+    calibration = {}
+    if os.path.exists(args.output):
+        with open(args.output, "r") as f:
+            calibration = json.load(f)
+
+    if not args.skip_throughput:
+        models = calibration.setdefault("models", {})
+        for model in [m.strip() for m in args.models.split(",") if m.strip()]:
+            rates = {k: v for k, v in measure_model(model, args.num_predict, args.runs).items() if v}
+            models[model] = {**models.get(model, {}), **rates}
+            print(f"{model}: {rates}")
+        measured = [m for m in models.values() if "prompt_tps" in m and "completion_tps" in m]
+        if measured:
+            calibration["default"] = {
+                "prompt_tps": round(min(m["prompt_tps"] for m in measured), 1),
+                "completion_tps": round(min(m["completion_tps"] for m in measured), 1),
+            }
+
+    if args.results:
+        sizes, questions_per_section = output_sizes(args.results)
+        calibration["completion_tokens"] = {**calibration.get("completion_tokens", {}), **sizes}
+        if questions_per_section is not None:
+            calibration["questions_per_section"] = questions_per_section
+        print(f"Completion tokens per role: {sizes}")
+        print(f"Questions per section: {questions_per_section}")
+
+    with open(args.output, "w") as f:
+        json.dump(calibration, f, indent=4)
+    print(f"Calibration saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
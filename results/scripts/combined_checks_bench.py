@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util.verdict import parse_decision
+from util.combined_checks import combined_checks, COMBINED_MODEL
+
+VERDICT_KEYS = ["Grammar Check", "Novelty Check", "Fact Check"]
+
+def check_decision(output):
+    """Accept/Reject of a check output, whether structured or free-form."""
+    if isinstance(output, dict):
+        return output.get("decision")
+    accepted = parse_decision(output)
+    return None if accepted is None else ("Accept" if accepted else "Reject")
+
+def run_agents(section_text, structured):
+    """The per-agent path, as run by MARS.py --check-mode agents (role models must already exist)."""
+    from util.multiagent import consultTest, consultGrammar, consultNovelty, consultFactChecker, consultQuestioner
+    return {
+        "Test": consultTest(section_text),
+        "Grammar Check": consultGrammar(section_text, structured),
+        "Novelty Check": consultNovelty(section_text, structured),
+        "Fact Check": consultFactChecker(section_text, structured),
+        "Questioner": consultQuestioner(section_text),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark combined single-call checks against the per-agent path")
+    parser.add_argument("paper", help="Sectioned paper JSON (paper.schema.json) that produced the stored results")
+    parser.add_argument("results", help="Stored MARS output for the paper (e.g. a dataset_results/ file)")
+    parser.add_argument("--model", default=COMBINED_MODEL, help="Model used for the combined call")
+    parser.add_argument("--structured", action="store_true", help="Request structured verdicts")
+    parser.add_argument("--max-sections", type=int, default=0, help="Only benchmark the first N sections")
+    parser.add_argument("--rerun-agents", action="store_true", help="Also time the per-agent path live")
+    args = parser.parse_args()
+
+    with open(args.paper, "r", encoding="utf-8") as f:
+        paper = json.load(f)
+    with open(args.results, "r", encoding="utf-8") as f:
+        stored = json.load(f).get("Section Reviews", {})
+
+    sections = [(s["heading"], s["text"]) for s in paper.get("input", {}).get("sections", []) if s["heading"] in stored]
+    if args.max_sections:
+        sections = sections[:args.max_sections]
+    if not sections:
+        print("No sections of the paper appear in the stored results.")
+        return
+
+    combined_time = 0.0
+    agents_time = 0.0
+    agree_stored = {key: 0 for key in VERDICT_KEYS}
+    agree_live = {key: 0 for key in VERDICT_KEYS}
+
+    for heading, text in sections:
+        start = time.time()
+        combined = combined_checks(text, args.structured, args.model)
+        elapsed = time.time() - start
+        combined_time += elapsed
+        line = f"{heading[:40]:<40} combined {elapsed:6.1f}s"
+
+        for key in VERDICT_KEYS:
+            agree_stored[key] += check_decision(combined[key]) == check_decision(stored[heading].get(key))
+
+        if args.rerun_agents:
+            start = time.time()
+            agents = run_agents(text, args.structured)
+            elapsed = time.time() - start
+            agents_time += elapsed
+            line += f" | agents {elapsed:6.1f}s"
+            for key in VERDICT_KEYS:
+                agree_live[key] += check_decision(combined[key]) == check_decision(agents[key])
+        print(line)
+
+    n = len(sections)
+    print(f"\nSections: {n}")
+    print(f"Combined mean latency: {combined_time / n:.1f}s per section (1 call)")
+    if args.rerun_agents:
+        print(f"Per-agent mean latency: {agents_time / n:.1f}s per section (5+ calls)")
+        print(f"Speed-up: {agents_time / combined_time:.2f}x" if combined_time else "Speed-up: n/a")
+    print("\nDecision agreement with the stored per-agent results:")
+    for key in VERDICT_KEYS:
+        print(f"  {key}: {agree_stored[key]}/{n} ({agree_stored[key] / n * 100:.1f}%)")
+    if args.rerun_agents:
+        print("Decision agreement with the live per-agent run:")
+        for key in VERDICT_KEYS:
+            print(f"  {key}: {agree_live[key]}/{n} ({agree_live[key] / n * 100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,8 @@ def process_json_file(file_path, cond_counts, total_counts, pair_counts):
         # First, check for nested "Reviewers"
         if isinstance(review_data, dict) and "Reviewers" in review_data:
             for reviewer, rev_obj in review_data["Reviewers"].items():
+                if isinstance(rev_obj, dict) and (rev_obj.get("Skipped") or rev_obj.get("Timeout")):
+                    continue
                 decision = extract_decision(rev_obj)
                 if decision:
                     decisions[reviewer] = decision
@@ -64,7 +66,7 @@ def process_json_file(file_path, cond_counts, total_counts, pair_counts):
         # Also look at other keys that might represent individual reviewer entries.
         if isinstance(review_data, dict):
             for key, value in review_data.items():
-                if key in {"Reviewers", "Review", "Test", "Grammar Check", "Novelty Check", "Fact Check", "Questioner", "Final Summary"}:
+                if key in {"Reviewers", "Review", "Test", "Grammar Check", "Novelty Check", "Fact Check", "Fact Check Claims", "Questioner", "Final Summary"}:
                     continue
                 decision = extract_decision(value)
                 if decision:
@@ -116,12 +118,14 @@ def compute_multi_condition_probabilities(directory):
             decisions = {}
             if isinstance(review_data, dict) and "Reviewers" in review_data:
                 for reviewer, rev_obj in review_data["Reviewers"].items():
+                    if isinstance(rev_obj, dict) and (rev_obj.get("Skipped") or rev_obj.get("Timeout")):
+                        continue
                     decision = extract_decision(rev_obj)
                     if decision:
                         decisions[reviewer] = decision
             if isinstance(review_data, dict):
                 for key, value in review_data.items():
-                    if key in {"Reviewers", "Review", "Test", "Grammar Check", "Novelty Check", "Fact Check", "Questioner", "Final Summary"}:
+                    if key in {"Reviewers", "Review", "Test", "Grammar Check", "Novelty Check", "Fact Check", "Fact Check Claims", "Questioner", "Final Summary"}:
                         continue
                     decision = extract_decision(value)
                     if decision:
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import glob
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util.consensus import review_decision, consensus_reached
+
+DEFAULT_ORDER = ["mistral", "llama3.2", "qwen2.5", "deepseek-r1"]
+DECISION_SCORES = {"Accept": 100, "Reject": 0}
+
+def section_score(decisions):
+    """Average Accept/Reject score of the given decisions; unknown decisions count as Reject."""
+    if not decisions:
+        return 0
+    return sum(DECISION_SCORES.get(d, 0) for d in decisions) / len(decisions)
+
+def replay_section(reviewers, order, k, min_confidence):
+    """
+    Replays the sequential agreement rule over the stored reviews of one section.
+
+    Returns (decisions of all reviewers, decisions of the reviewers that would have been issued).
+    """
+    decisions = [review_decision(reviewers[model]) for model in order if model in reviewers]
+    issued = len(decisions)
+    for i in range(1, len(decisions)):
+        if consensus_reached(decisions[:i], k, min_confidence):
+            issued = i
+            break
+    return [d for d, _ in decisions], [d for d, _ in decisions[:issued]]
+
+def replay_file(file_path, order, k, min_confidence):
+    with open(file_path, "r") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing {file_path}: {e}")
+            return None
+
+    stats = {"calls": 0, "issued": 0, "sections": 0, "section_flips": 0}
+    full_scores = []
+    adaptive_scores = []
+    for section, review_data in data.get("Section Reviews", {}).items():
+        if not isinstance(review_data, dict):
+            continue
+        if "Reviewers" not in review_data:
+            # DeskReviewer and similar entries are unaffected by early exit.
+            accepted = review_data.get("Accept")
+            if isinstance(accepted, bool):
+                full_scores.append(100 if accepted else 0)
+                adaptive_scores.append(100 if accepted else 0)
+            continue
+
+        full, issued = replay_section(review_data["Reviewers"], order, k, min_confidence)
+        full_score, adaptive_score = section_score(full), section_score(issued)
+        stats["calls"] += len(full)
+        stats["issued"] += len(issued)
+        stats["sections"] += 1
+        stats["section_flips"] += (full_score >= 50) != (adaptive_score >= 50)
+        full_scores.append(full_score)
+        adaptive_scores.append(adaptive_score)
+
+    full_paper = sum(full_scores) / len(full_scores) if full_scores else 0
+    adaptive_paper = sum(adaptive_scores) / len(adaptive_scores) if adaptive_scores else 0
+    stats["paper_flip"] = (full_paper >= 50) != (adaptive_paper >= 50)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay consensus-based early exit against stored reviews")
+    parser.add_argument("directory", help="Directory containing JSON review files (e.g. dataset_results)")
+    parser.add_argument("--order", default=",".join(DEFAULT_ORDER), help="Comma separated reviewer order")
+    parser.add_argument("--k", type=int, default=2, help="Number of agreeing reviewers needed to stop")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="Minimum confidence of structured verdicts")
+    args = parser.parse_args()
+
+    order = [m.strip() for m in args.order.split(",") if m.strip()]
+    totals = {"calls": 0, "issued": 0, "sections": 0, "section_flips": 0, "paper_flips": 0, "papers": 0}
+
+    print(f"Order: {', '.join(order)} | k={args.k} | min confidence={args.min_confidence}\n")
+    print(f"{'Paper':<60} {'Calls':>6} {'Issued':>6} {'Saved':>7} {'Flips':>6} {'Paper flip':>10}")
+    for file_path in sorted(glob.glob(os.path.join(args.directory, "*.json"))):
+        stats = replay_file(file_path, order, args.k, args.min_confidence)
+        if not stats or not stats["calls"]:
+            continue
+        saved = stats["calls"] - stats["issued"]
+        print(f"{os.path.basename(file_path):<60} {stats['calls']:>6} {stats['issued']:>6} "
+              f"{saved / stats['calls'] * 100:>6.1f}% {stats['section_flips']:>6} {str(stats['paper_flip']):>10}")
+        for key in ("calls", "issued", "sections", "section_flips"):
+            totals[key] += stats[key]
+        totals["paper_flips"] += stats["paper_flip"]
+        totals["papers"] += 1
+
+    if totals["calls"]:
+        saved = totals["calls"] - totals["issued"]
+        print(f"\nReviewer calls saved: {saved}/{totals['calls']} ({saved / totals['calls'] * 100:.1f}%)")
+        print(f"Section decision flips: {totals['section_flips']}/{totals['sections']}")
+        print(f"Paper decision flips: {totals['paper_flips']}/{totals['papers']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ARXIV_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <title>Simulating Superconducting
+      Processors in gem5</title>
+    <summary>We model superconducting logic in gem5.</summary>
+    <published>2024-03-01T00:00:00Z</published>
+    <author><name>Ada Lovelace</name></author>
+    <link href="http://arxiv.org/pdf/2403.00001" type="application/pdf"/>
+  </entry>
+  <entry>
+    <title>Cryogenic Memory Hierarchies</title>
+    <summary>A study of cryogenic caches.</summary>
+    <published>2023-11-20T00:00:00Z</published>
+    <author><name>Alan Turing</name></author>
+    <author><name>Grace Hopper</name></author>
+    <link href="http://arxiv.org/pdf/2311.00002" type="application/pdf"/>
+  </entry>
+</feed>"""
+
+CFP_PAGE = """<html><body>
+<ul><li>Submission deadline: 11/15/2025</li><li>Notification: 02/01/2026</li></ul>
+<ul>
+  <li>Processor, memory and storage architecture</li>
+  <li>Accelerators for machine learning workloads</li>
+  <li>Power, energy and thermal management</li>
+  <li>Abstract registration opens soon</li>
+  <li>Security</li>
+</ul>
+</body></html>"""
+CFP_TOPICS = ["Accelerators for machine learning workloads", "Power, energy and thermal management",
+              "Processor, memory and storage architecture"]
+
+WIKI_PAGE = "<html><body><p>The stub article is about the claim. It has several sentences.</p><p>More text.</p></body></html>"
+
+class StubWeb:
+    """
+    Local stand-in for Wikipedia, the arXiv API and a CFP page, answering after `delay`
+    seconds. /flaky/cfp answers 503 for its first `failures` requests. Records the time
+    of every request it gets.
+    """
+
+    def __init__(self, delay=0.0, failures=2):
+        self.delay = delay
+        self.failures = failures
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def answer(self, status, body, content_type):
+                data = body.encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    if status == 503:
+                        self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), url.path))
+                    flaky = sum(path == "/flaky/cfp" for _, path in stub.requests) <= stub.failures
+                time.sleep(stub.delay)
+                if url.path == "/w/api.php":
+                    query = parse_qs(url.query).get("srsearch", [""])[0]
+                    results = [] if query == "nothing" else [{"title": f"Stub Article {query}"}]
+                    self.answer(200, json.dumps({"query": {"search": results}}), "application/json")
+                elif url.path.startswith("/api/rest_v1/page/html/"):
+                    self.answer(200, WIKI_PAGE, "text/html")
+                elif url.path == "/api/query":
+                    self.answer(200, ARXIV_FEED, "application/atom+xml")
+                elif url.path == "/cfp" or (url.path == "/flaky/cfp" and not flaky):
+                    self.answer(200, CFP_PAGE, "text/html")
+                elif url.path == "/flaky/cfp":
+                    self.answer(503, "busy", "text/plain")
+                else:
+                    self.answer(404, "not found", "text/plain")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def count(self, prefix):
+        with self.lock:
+            return sum(path.startswith(prefix) for _, path in self.requests)
+
+    def since(self, start):
+        with self.lock:
+            return [t for t, _ in self.requests if t >= start]
+
+# The tools read their base URLs at import time
+stub = StubWeb()
+os.environ["MARS_WIKIPEDIA_URL"] = stub.url
+os.environ["MARS_ARXIV_URL"] = f"{stub.url}/api/query"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util.transport import get_transport
+from util.multiagent import consultWiki
+from util.factcheck import lookup_claims, NO_RESULTS
+from util.scholar import search_arxiv_papers
+from util.extract_cfp import CFPTopicExtractor
+
+def check(name, passed, detail):
+    print(f"{'ok  ' if passed else 'FAIL'} {name}: {detail}")
+    return passed
+
+def set_rate(rate, burst):
+    """Rate limit of the stub host; its bucket is rebuilt with the new rate."""
+    transport = get_transport()
+    transport.host_rates["127.0.0.1"] = (rate, burst)
+    transport.buckets.pop("127.0.0.1", None)
+
+def check_wiki():
+    """The Wikipedia tool searches, then fetches the top article; a search without results says so."""
+    found = consultWiki("cache coherence")
+    missing = consultWiki("nothing")
+    return check("wikipedia", found.startswith("**Stub Article cache coherence**") and "stub article" in found
+                 and missing.startswith(NO_RESULTS), "article found, empty search reported")
+
+def check_claim_lookups(delay):
+    """The claim lookups run concurrently on the transport loop: about one lookup's time for all of them."""
+    stub.delay = delay
+    claims = [{"claim": f"Claim {i}", "query": f"query {i}"} for i in range(4)]
+    start = time.monotonic()
+    records = lookup_claims(claims)
+    elapsed = time.monotonic() - start
+    stub.delay = 0.0
+    sequential = len(claims) * 2 * delay
+    return check("concurrent claim lookups", [r["Query"] for r in records] == [c["query"] for c in claims]
+                 and all(r["Hit"] for r in records) and elapsed < sequential / 2,
+                 f"{len(claims)} lookups in {elapsed:.2f}s ({sequential:.2f}s one after another)")
+
+def check_arxiv():
+    """The arXiv tool parses the Atom feed into paper records."""
+    papers = search_arxiv_papers("superconductors gem5", max_results=2)
+    return check("arxiv", [p["title"] for p in papers] == ["Simulating Superconducting Processors in gem5", "Cryogenic Memory Hierarchies"]
+                 and papers[1]["authors"] == ["Alan Turing", "Grace Hopper"] and papers[0]["pdf_url"].endswith("2403.00001")
+                 and papers[0]["published"].year == 2024, f"{len(papers)} papers parsed")
+
+def check_cfp():
+    """The CFP extractor keeps the topic list and drops administrative items."""
+    result = CFPTopicExtractor().extract_topics(f"{stub.url}/cfp")
+    return check("cfp topics", result.get("topics") == CFP_TOPICS, f"{result.get('topics', result.get('error'))}")
+
+def check_retries():
+    """A 503 with Retry-After is retried with backoff until the page answers."""
+    result = CFPTopicExtractor().extract_topics(f"{stub.url}/flaky/cfp")
+    requests = stub.count("/flaky/cfp")
+    return check("retries", result.get("topics") == CFP_TOPICS and requests == stub.failures + 1,
+                 f"{requests} requests for {stub.failures} failures")
+
+def check_rate_limit(rate, burst):
+    """Concurrent lookups to one host stay within its token bucket: burst requests at once, then `rate` per second."""
+    set_rate(rate, burst)
+    start = time.monotonic()
+    claims = [{"claim": f"Rate {i}", "query": f"rate {i}"} for i in range(4)]
+    lookup_claims(claims)
+    times = stub.since(start)
+    needed = (len(times) - burst) / rate
+    spread = times[-1] - start if times else 0.0
+    set_rate(1000.0, 1000)
+    return check("rate limit", len(times) == 2 * len(claims) and spread >= needed * 0.9,
+                 f"{len(times)} requests over {spread:.2f}s (at least {needed:.2f}s at {rate}/s, burst {burst})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the external tools (Wikipedia, arXiv, CFP pages) against a local stub server through the shared transport")
+    parser.add_argument("--delay", type=float, default=0.3, help="Seconds a stub lookup request takes (makes concurrent lookups overlap)")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests per second allowed to the stub host in the rate limit check")
+    parser.add_argument("--burst", type=int, default=2, help="Burst of the stub host's token bucket in the rate limit check")
+    args = parser.parse_args()
+
+    set_rate(1000.0, 1000)
+    results = [check_wiki(), check_claim_lookups(args.delay), check_arxiv(), check_cfp(), check_retries(),
+               check_rate_limit(args.rate, args.burst)]
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
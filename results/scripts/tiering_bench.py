@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import glob
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from util.budget import Calibration, estimate_tokens
+from util.consensus import review_decision
+from util.tiers import ROLE_TIERS, MIN_CONFIDENCE, tier_model, valid
+
+PANEL = ["mistral", "llama3.2", "qwen2.5", "deepseek-r1"]
+DECISION_SCORES = {"Accept": 100, "Reject": 0}
+
+def section_score(decisions):
+    """Average Accept/Reject score of the given decisions; unknown decisions count as Reject."""
+    if not decisions:
+        return 0
+    return sum(DECISION_SCORES.get(d, 0) for d in decisions) / len(decisions)
+
+def replay_section(reviewers, calibration, prompt_tokens, min_confidence):
+    """
+    Replays the reviewer cascade over the stored reviews of one section.
+
+    Returns (panel decisions, cascade decision, panel model seconds, panel wall seconds,
+    cascade seconds, models the cascade called), or None if a tier model has no stored review.
+    """
+    seconds = {model: calibration.seconds(prompt_tokens, estimate_tokens(str(review)), model)
+               for model, review in reviewers.items()}
+    cascade_models = [tier_model("reviewer", tier) for tier in ROLE_TIERS["reviewer"]]
+    if any(model not in reviewers for model in cascade_models):
+        return None
+    called = []
+    for model in cascade_models:
+        called.append(model)
+        if valid("reviewer", reviewers[model], min_confidence):
+            break
+    panel = [model for model in PANEL if model in reviewers]
+    return (
+        [review_decision(reviewers[model])[0] for model in panel],
+        review_decision(reviewers[called[-1]])[0],
+        sum(seconds[model] for model in panel),
+        max(seconds[model] for model in panel),
+        sum(seconds[model] for model in called),
+        called,
+    )
+
+def replay_file(file_path, calibration, prompt_tokens, min_confidence):
+    with open(file_path, "r") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing {file_path}: {e}")
+            return None
+
+    stats = {"calls": 0, "cascade_calls": 0, "escalations": 0, "model_seconds": 0.0, "wall_seconds": 0.0,
+             "cascade_seconds": 0.0, "sections": 0, "section_flips": 0}
+    panel_scores = []
+    cascade_scores = []
+    for section, review_data in data.get("Section Reviews", {}).items():
+        if not isinstance(review_data, dict):
+            continue
+        if "Reviewers" not in review_data:
+            # DeskReviewer and similar entries count the same in both runs.
+            accepted = review_data.get("Accept")
+            if isinstance(accepted, bool):
+                panel_scores.append(100 if accepted else 0)
+                cascade_scores.append(100 if accepted else 0)
+            continue
+
+        replayed = replay_section(review_data["Reviewers"], calibration, prompt_tokens, min_confidence)
+        if replayed is None:
+            continue
+        panel, decision, model_seconds, wall_seconds, cascade_seconds, called = replayed
+        panel_score, cascade_score = section_score(panel), section_score([decision])
+        stats["calls"] += len(panel)
+        stats["cascade_calls"] += len(called)
+        stats["escalations"] += len(called) - 1
+        stats["model_seconds"] += model_seconds
+        stats["wall_seconds"] += wall_seconds
+        stats["cascade_seconds"] += cascade_seconds
+        stats["sections"] += 1
+        stats["section_flips"] += (panel_score >= 50) != (cascade_score >= 50)
+        panel_scores.append(panel_score)
+        cascade_scores.append(cascade_score)
+
+    panel_paper = sum(panel_scores) / len(panel_scores) if panel_scores else 0
+    cascade_paper = sum(cascade_scores) / len(cascade_scores) if cascade_scores else 0
+    stats["paper_flip"] = (panel_paper >= 50) != (cascade_paper >= 50)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the tiered reviewer cascade against stored reviews: latency saved vs verdict agreement")
+    parser.add_argument("directory", help="Directory containing JSON review files (e.g. dataset_results)")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE, help="Structured confidence below which a verdict escalates")
+    parser.add_argument("--calibration", type=str, default=None, help="Throughput calibration file (results/scripts/calibrate.py)")
+    parser.add_argument("--prompt-tokens", type=int, default=1500, help="Prompt tokens of a reviewer call (section text and instructions)")
+    args = parser.parse_args()
+
+    calibration = Calibration.load(args.calibration) if args.calibration else Calibration()
+    tiers = " -> ".join(tier_model("reviewer", tier) for tier in ROLE_TIERS["reviewer"])
+    totals = {"calls": 0, "cascade_calls": 0, "escalations": 0, "model_seconds": 0.0, "wall_seconds": 0.0,
+              "cascade_seconds": 0.0, "sections": 0, "section_flips": 0, "paper_flips": 0, "papers": 0}
+
+    print(f"Panel: {', '.join(PANEL)} | cascade: {tiers} | min confidence={args.min_confidence}\n")
+    print(f"{'Paper':<60} {'Calls':>6} {'Tiered':>6} {'Panel s':>8} {'Tiered s':>8} {'Saved':>7} {'Flips':>6} {'Paper flip':>10}")
+    for file_path in sorted(glob.glob(os.path.join(args.directory, "*.json"))):
+        stats = replay_file(file_path, calibration, args.prompt_tokens, args.min_confidence)
+        if not stats or not stats["calls"]:
+            continue
+        saved = stats["model_seconds"] - stats["cascade_seconds"]
+        print(f"{os.path.basename(file_path):<60} {stats['calls']:>6} {stats['cascade_calls']:>6} "
+              f"{stats['model_seconds']:>8.0f} {stats['cascade_seconds']:>8.0f} {saved / stats['model_seconds'] * 100:>6.1f}% "
+              f"{stats['section_flips']:>6} {str(stats['paper_flip']):>10}")
+        for key in ("calls", "cascade_calls", "escalations", "model_seconds", "wall_seconds", "cascade_seconds", "sections", "section_flips"):
+            totals[key] += stats[key]
+        totals["paper_flips"] += stats["paper_flip"]
+        totals["papers"] += 1
+
+    if totals["calls"]:
+        saved = totals["model_seconds"] - totals["cascade_seconds"]
+        agreed = totals["sections"] - totals["section_flips"]
+        print(f"\nReviewer calls: {totals['cascade_calls']}/{totals['calls']} ({totals['escalations']} escalations)")
+        print(f"Model time saved: {saved:.0f}/{totals['model_seconds']:.0f} s ({saved / totals['model_seconds'] * 100:.1f}%)")
+        print(f"Section latency: {totals['wall_seconds']:.0f} s with the panel in parallel, {totals['cascade_seconds']:.0f} s tiered")
+        print(f"Section verdict agreement with the panel: {agreed}/{totals['sections']} ({agreed / totals['sections'] * 100:.1f}%)")
+        print(f"Paper decision flips: {totals['paper_flips']}/{totals['papers']}")
+        print("Only the reviewer role is replayed: the stored results hold one model's output for the other roles.")
+
+if __name__ == "__main__":
+    main()
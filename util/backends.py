@@ -0,0 +1,248 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import ollama
+from util import cassette
+
+# Comma separated Ollama hosts, or a JSON file mapping each host to the models it serves
+HOSTS_ENV = "MARS_OLLAMA_HOSTS"
+
+EJECT_AFTER = 3          # consecutive failed calls before a host is ejected
+EJECT_SECONDS = 10.0     # first ejection; doubled on every failed re-probe
+MAX_EJECT_SECONDS = 300.0
+COLD_PENALTY = 2         # a host that must load the model counts as this many extra outstanding requests
+PROBE_TIMEOUT = 5.0
+MONITOR_INTERVAL = 30.0
+MAX_AFFINITY_KEYS = 256
+
+class NoBackendError(ConnectionError):
+    """No healthy Ollama host serves the requested model."""
+
+def normalize_model(model):
+    return model[:-len(":latest")] if model.endswith(":latest") else model
+
+class Backend:
+    """One Ollama host and the models it serves (None: any model)."""
+
+    def __init__(self, host=None, models=None):
+        self.host = host
+        self.models = {normalize_model(m) for m in models} if models is not None else None
+        self.outstanding = 0
+        self.calls = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.early_probe = False
+        self.probing = False
+        self.resident = set()
+        self.clients = {}
+
+    @property
+    def name(self):
+        return self.host or "default"
+
+    @property
+    def ejected(self):
+        return self.ejected_until > 0
+
+    def serves(self, model):
+        return self.models is None or normalize_model(model) in self.models
+
+    def client(self, timeout=None):
+        """Ollama client of this host; clients are kept per timeout so their connections are reused."""
+        if timeout not in self.clients:
+            self.clients[timeout] = ollama.Client(host=self.host, timeout=timeout, transport=cassette.transport(match_host=False))
+        return self.clients[timeout]
+
+    def status(self):
+        return {
+            "Host": self.name,
+            "Healthy": not self.ejected,
+            "Outstanding": self.outstanding,
+            "Calls": self.calls,
+            "Resident": sorted(self.resident),
+        }
+
+class BackendPool:
+    """
+    Routes model calls across several Ollama hosts.
+
+    A call goes to the host serving the model with the fewest outstanding requests,
+    where a host that does not have the model loaded counts COLD_PENALTY extra. Hosts
+    that fail EJECT_AFTER calls in a row are ejected and re-probed (GET /api/ps) once
+    their ejection expires; the ejection doubles on every failed probe. When every host
+    serving a model is ejected, each is re-probed early, but at most once per ejection,
+    so calls to a pool that is down fail fast. Residency is learned from the probes
+    and from successful calls.
+    """
+
+    def __init__(self, backends, eject_after=EJECT_AFTER, eject_seconds=EJECT_SECONDS,
+                 cold_penalty=COLD_PENALTY, probe_timeout=PROBE_TIMEOUT):
+        self.backends = list(backends)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.cold_penalty = cold_penalty
+        self.probe_timeout = probe_timeout
+        self.affinity = OrderedDict()
+        self.lock = threading.Lock()
+        self.monitor = None
+
+    def serving(self, model):
+        return [b for b in self.backends if b.serves(model)]
+
+    def clients(self, model, timeout=None):
+        """Clients of the healthy hosts serving a model (e.g. to create the model on each of them)."""
+        return [b.client(timeout) for b in self.serving(model) if not b.ejected]
+
+    def cost(self, backend, model):
+        return backend.outstanding + (0 if normalize_model(model) in backend.resident else self.cold_penalty)
+
+    def acquire(self, model, exclude=(), affinity=None):
+        """
+        Picks a host for one call and counts it as outstanding until release().
+
+        Hosts in exclude (e.g. the one a hedged or retried request already went to) are
+        avoided when another host can take the call. Calls with the same affinity key
+        stay on the same host while it is healthy, so they can reuse its cached prompt.
+        """
+        serving = self.serving(model)
+        if not serving:
+            raise NoBackendError(f"No Ollama host serves {model}")
+        now = time.monotonic()
+        for backend in serving:
+            if backend.ejected and now >= backend.ejected_until:
+                self.probe(backend)
+        if all(b.ejected for b in serving):
+            # Rather than fail outright, re-probe early (once per ejection): the only hosts left may be back.
+            for backend in serving:
+                with self.lock:
+                    due, backend.early_probe = not backend.early_probe, True
+                if due:
+                    self.probe(backend)
+
+        with self.lock:
+            candidates = [b for b in serving if not b.ejected]
+            if not candidates:
+                raise NoBackendError(f"No healthy Ollama host serves {model}")
+            preferred = [b for b in candidates if b not in exclude] or candidates
+            pinned = self.affinity.get(affinity) if affinity is not None else None
+            if pinned in preferred:
+                backend = pinned
+            else:
+                backend = min(preferred, key=lambda b: (self.cost(b, model), b.calls))
+            backend.outstanding += 1
+            backend.calls += 1
+            if affinity is not None:
+                self.affinity[affinity] = backend
+                self.affinity.move_to_end(affinity)
+                while len(self.affinity) > MAX_AFFINITY_KEYS:
+                    self.affinity.popitem(last=False)
+            return backend
+
+    def release(self, backend, model, failed=False, answered=True):
+        """
+        Ends a call; failed calls (connection errors, 5xx) count towards ejection. A call
+        that was not answered without failing (a timeout) leaves the host's record as is.
+        """
+        with self.lock:
+            backend.outstanding -= 1
+            if not failed and not answered:
+                return
+            if not failed:
+                backend.failures = 0
+                backend.resident.add(normalize_model(model))
+                return
+            backend.failures += 1
+            if backend.failures >= self.eject_after and not backend.ejected:
+                self.eject(backend)
+
+    def eject(self, backend):
+        seconds = min(MAX_EJECT_SECONDS, self.eject_seconds * 2 ** backend.ejections)
+        backend.ejections += 1
+        backend.ejected_until = time.monotonic() + seconds
+        backend.early_probe = False
+        backend.resident.clear()
+        print(f"Ollama host {backend.name} ejected for {seconds:g}s")
+
+    def probe(self, backend):
+        """Checks a host and refreshes its loaded models; returns whether it is healthy."""
+        with self.lock:
+            if backend.probing:
+                return not backend.ejected
+            backend.probing = True
+        try:
+            loaded = backend.client(self.probe_timeout).ps().models
+        except Exception:
+            with self.lock:
+                if not backend.ejected or time.monotonic() >= backend.ejected_until:
+                    self.eject(backend)
+            return False
+        finally:
+            backend.probing = False
+        with self.lock:
+            if backend.ejected:
+                print(f"Ollama host {backend.name} is back")
+            backend.resident = {normalize_model(m.model) for m in loaded}
+            backend.failures = 0
+            backend.ejections = 0
+            backend.ejected_until = 0.0
+        return True
+
+    def refresh(self):
+        for backend in self.backends:
+            self.probe(backend)
+
+    def start_monitor(self, interval=MONITOR_INTERVAL):
+        """Re-probes every host in the background so residency and health stay current."""
+        def run():
+            while True:
+                self.refresh()
+                time.sleep(interval)
+        if self.monitor is None:
+            self.monitor = threading.Thread(target=run, name="mars-backends", daemon=True)
+            self.monitor.start()
+
+    def status(self):
+        with self.lock:
+            return [b.status() for b in self.backends]
+
+def load_backends(spec):
+    """
+    Parses a backend spec: a JSON file mapping each host to the list of models it
+    serves (null: any model), or comma separated hosts that all serve any model.
+    """
+    if os.path.isfile(spec):
+        with open(spec) as f:
+            hosts = json.load(f)
+        return [Backend(host, models) for host, models in hosts.items()]
+    return [Backend(host.strip()) for host in spec.split(",") if host.strip()]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def build_pool(spec=None):
+    """Pool of a backend spec (default: $MARS_OLLAMA_HOSTS, else the local Ollama)."""
+    spec = spec or os.environ.get(HOSTS_ENV)
+    backends = load_backends(spec) if spec else [Backend()]
+    pool = BackendPool(backends)
+    if len(backends) > 1:
+        pool.start_monitor()
+    return pool
+
+def configure(spec=None):
+    """Replaces the process-wide pool (e.g. from the --backends flag)."""
+    global _pool
+    pool = build_pool(spec)
+    with _pool_lock:
+        _pool = pool
+    return pool
+
+def get_pool():
+    """The process-wide pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = build_pool()
+        return _pool
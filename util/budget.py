@@ -0,0 +1,185 @@
+import json
+import math
+import re
+
+REVIEW_DEPTHS = ["full", "light", "skipped"]
+
+# Model calls of the claim-level fact check: one claim extraction and one adjudication
+# (the claim lookups are HTTP requests, not model calls)
+CLAIM_CALLS = 2
+
+# Rough per-call sizes, used when no calibration file is given
+INSTRUCTION_TOKENS = 200
+EVIDENCE_TOKENS = 1200
+COMPLETION_TOKENS = 400
+PROMPT_TOKENS_PER_SECOND = 500.0
+COMPLETION_TOKENS_PER_SECOND = 25.0
+QUESTIONS_PER_SECTION = 5
+
+class Calibration:
+    """
+    Measured throughput and output sizes (results/scripts/calibrate.py) used to turn
+    token counts into model time. Layout of the JSON file:
+
+        {"default": {"prompt_tps": 500, "completion_tps": 25},
+         "models": {"mistral": {"prompt_tps": 610.2, "completion_tps": 31.5, "tokenizer": "unsloth/mistral-7b-instruct-v0.3"}},
+         "completion_tokens": {"reviewer": 420, "summarizer": 380},
+         "questions_per_section": 4.6,
+         "call_overhead_seconds": 0.2}
+
+    Anything missing falls back to the module defaults.
+    """
+
+    def __init__(self, data=None):
+        self.data = data or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def model(self, model):
+        return {**self.data.get("default", {}), **self.data.get("models", {}).get(model or "", {})}
+
+    def throughput(self, model=None):
+        """(prompt tokens per second, completion tokens per second) of a model."""
+        rates = self.model(model)
+        return rates.get("prompt_tps", PROMPT_TOKENS_PER_SECOND), rates.get("completion_tps", COMPLETION_TOKENS_PER_SECOND)
+
+    def seconds(self, prompt_tokens, completion_tokens, model=None):
+        prompt_tps, completion_tps = self.throughput(model)
+        return prompt_tokens / prompt_tps + completion_tokens / completion_tps + self.data.get("call_overhead_seconds", 0.0)
+
+    def completion_tokens(self, role, default=COMPLETION_TOKENS):
+        return self.data.get("completion_tokens", {}).get(role, default)
+
+    @property
+    def questions_per_section(self):
+        return self.data.get("questions_per_section", QUESTIONS_PER_SECTION)
+
+DEFAULT_CALIBRATION = Calibration()
+
+def estimate_tokens(text):
+    """Approximate token count (about 4 tokens per 3 words of English text)."""
+    return int(len(text.split()) * 4 / 3)
+
+def call_cost(prompt_tokens, completion_tokens=COMPLETION_TOKENS, calibration=DEFAULT_CALIBRATION, model=None):
+    return {
+        "calls": 1,
+        "tokens": prompt_tokens + completion_tokens,
+        "seconds": calibration.seconds(prompt_tokens, completion_tokens, model),
+    }
+
+def add_costs(costs):
+    total = {"calls": 0, "tokens": 0, "seconds": 0.0}
+    for cost in costs:
+        for key in total:
+            total[key] += cost[key]
+    return total
+
+def check_calls(check_mode="agents", structured=False, fact_check="agent"):
+    """
+    Model calls made by the section checks. In the agents mode the free-form fact checker
+    first asks whether it needs more facts (structured verdicts skip that question);
+    shared-prefix primes the section once before the role calls. The claim-level fact
+    check replaces the fact checker (agent or shared-prefix role) with CLAIM_CALLS.
+    """
+    if check_mode == "combined":
+        calls = 1
+    elif check_mode == "shared-prefix":
+        calls = 1 + (4 if fact_check == "claims" else 5)  # the prime and the role calls
+    else:
+        calls = 4 + (0 if fact_check == "claims" else 1 if structured else 2)
+    return calls + (CLAIM_CALLS if fact_check == "claims" else 0)
+
+def section_cost(section_text, depth, num_reviewers=4, check_mode="agents", calibration=DEFAULT_CALIBRATION,
+                 structured=False, fact_check="agent"):
+    """Estimated calls, tokens and seconds of reviewing one section at the given depth."""
+    if depth == "skipped":
+        return add_costs([])
+    tokens = estimate_tokens(section_text)
+    reviewer = call_cost(tokens + INSTRUCTION_TOKENS, calibration.completion_tokens("reviewer"), calibration)
+    if depth == "light":
+        return reviewer
+
+    costs = [reviewer] * num_reviewers
+    # Summarizer: section plus the BART summary of the reviews
+    costs.append(call_cost(tokens + INSTRUCTION_TOKENS + 200, calibration.completion_tokens("summarizer"), calibration))
+    check_completion = calibration.completion_tokens("check")
+    claim_calls = CLAIM_CALLS if fact_check == "claims" else 0
+    calls = check_calls(check_mode, structured, fact_check) - claim_calls
+    if check_mode == "shared-prefix":
+        costs.append(call_cost(tokens + INSTRUCTION_TOKENS, 1, calibration))
+        costs += [call_cost(INSTRUCTION_TOKENS, check_completion, calibration)] * (calls - 1)
+    else:
+        costs += [call_cost(tokens + INSTRUCTION_TOKENS, check_completion, calibration)] * calls
+    if claim_calls:
+        costs.append(call_cost(tokens + INSTRUCTION_TOKENS, check_completion, calibration))
+        costs.append(call_cost(tokens + INSTRUCTION_TOKENS + EVIDENCE_TOKENS, check_completion, calibration))
+    return add_costs(costs)
+
+def within_budget(spent, cost, budget):
+    return all(spent[key] + cost[key] <= limit for key, limit in budget.items() if limit is not None)
+
+def section_value(index, num_sections, section_text, keyword_engine=None):
+    """
+    Expected review value of a section in [0, 1], from its length, its position
+    (earlier sections carry the contribution; appendices come last) and its keyword
+    density (mean IDF of its words with a keyword engine, lexical variety otherwise).
+    """
+    words = re.findall(r'[a-z][a-z0-9\-]+', section_text.lower())
+    length = min(1.0, math.log1p(len(words)) / math.log1p(3000))
+    position = 1.0 - 0.5 * index / max(1, num_sections - 1)
+    if not words:
+        density = 0.0
+    elif keyword_engine:
+        tokens = keyword_engine.tokenize(section_text)
+        density = (sum(keyword_engine.idf.get(t, keyword_engine.default_idf) for t in tokens) / len(tokens) / keyword_engine.default_idf) if tokens else 0.0
+    else:
+        density = len(set(words)) / len(words)
+    return 0.5 * length + 0.3 * position + 0.2 * density
+
+def plan_review_depth(sections, budget, num_reviewers=4, check_mode="agents", keyword_engine=None, reserved=None,
+                      calibration=DEFAULT_CALIBRATION, structured=False, fact_check="agent"):
+    """
+    Allocates review depths to sections under a budget.
+
+    Args:
+        sections (list): (name, text) pairs in document order.
+        budget (dict): Limits on "calls", "tokens" and/or "seconds" (None means unlimited).
+        reserved (dict): Cost already committed outside the section loop (e.g. the desk review).
+        calibration (Calibration): Throughput and output sizes behind the estimates.
+        structured, fact_check: The run's --structured and --fact-check, which change the check calls.
+
+    Returns:
+        dict: Section name -> {"Depth", "Value", "Estimated Cost"} in document order.
+        Every section first gets a light single-agent review if the budget allows, then the
+        highest-value sections are upgraded to a full review while the budget holds.
+    """
+    spent = add_costs([reserved] if reserved else [])
+    values = {name: section_value(i, len(sections), text, keyword_engine) for i, (name, text) in enumerate(sections)}
+    ranked = sorted(sections, key=lambda s: -values[s[0]])
+    depths = {name: "skipped" for name, _ in sections}
+
+    for name, text in ranked:
+        cost = section_cost(text, "light", num_reviewers, check_mode, calibration, structured, fact_check)
+        if within_budget(spent, cost, budget):
+            depths[name] = "light"
+            spent = add_costs([spent, cost])
+
+    for name, text in ranked:
+        if depths[name] != "light":
+            continue
+        light = section_cost(text, "light", num_reviewers, check_mode, calibration, structured, fact_check)
+        full = section_cost(text, "full", num_reviewers, check_mode, calibration, structured, fact_check)
+        extra = {key: full[key] - light[key] for key in full}
+        if within_budget(spent, extra, budget):
+            depths[name] = "full"
+            spent = add_costs([spent, extra])
+
+    plan = {}
+    for name, text in sections:
+        cost = section_cost(text, depths[name], num_reviewers, check_mode, calibration, structured, fact_check)
+        plan[name] = {"Depth": depths[name], "Value": round(values[name], 3),
+                      "Estimated Cost": {"calls": cost["calls"], "tokens": cost["tokens"], "seconds": round(cost["seconds"], 1)}}
+    return plan
@@ -6,19 +6,41 @@ from ollama import chat
 from ollama import ChatResponse
 from util.extract_cfp import CFPTopicExtractor
 from util.scholar import search_arxiv_papers
-from util.extract_keywords import extract_keywords
+from util.backends import get_pool
+from util import metrics, tiers
+from util.context_size import sizer, PINNED_NUM_CTX
 
-def isModelLoaded(model):
-    loaded_models = [model.model for model in ollama.list().models]
+# System prompts of the llama3.2-based role agents that check every section.
+ROLE_MESSAGES = {
+    "questioner": "Your job is to ask questions about this section. Your questions should be open-ended and should not be leading. Your questions should be about the paper and not about the authors. Your questions should be about the content of the paper and not about the presentation of the paper. Your questions should be about the paper and not about the conference. Your questions should be about the paper and not about the reviewers.",
+    "grammar": "Your job is to check the grammar of the paper. Your decisions have to be [Accept/Reject], where \"Accept\" means the grammar is correct and \"Reject\" means the grammar is incorrect. ONLY say \"Accept\" if the grammar is correct. ONLY say \"Reject\" if the grammar is incorrect.",
+    "test": "This is a test model. Please ignore this message.",
+    "novelty": "Your job is to judge whether a paper is novel. Your decisions have to be [Accept/Reject], where \"Accept\" means the paper is novel and \"Reject\" means the paper is not novel. Say \"Accept\" if the paper is novel. Say \"Reject\" if the paper is not novel. Use all the information in the prompt to make your decision and tell why you chose what you chose.", 
+    "factchecker": "You are a fact checker. Respond with [Accept] if the facts are correct or [Reject] if there are inaccuracies, followed by specific corrections. You should use Wikipedia as a reference. If you are satisfied with the facts, respond with [Accept]. If you find inaccuracies, respond with [Reject] and provide corrections. You do NOT have to always ASK WIKIPEDIA. Also, give your own take on the facts.",
+}
+
+# (client, model) -> system prompt the model was last created with by this process
+provisioned = {}
+# CFP url -> desk reviewer system prompt (only successfully extracted topics are kept)
+desk_review_messages = {}
+
+def isModelLoaded(model, client=ollama):
+    loaded_models = [model.model for model in client.list().models]
     return model in loaded_models or f'{model}:latest' in loaded_models
 
 def gen_desk_review_message(url):
+    metrics.cache_lookup("cfp_topics", url in desk_review_messages)
+    if url in desk_review_messages:
+        return desk_review_messages[url]
     extractor = CFPTopicExtractor()
     results = extractor.extract_topics(url)
-    return f"Your job is to judge whether a paper is relevant to a conference on these topics and these topics ONLY: {', '.join(results['topics'])}. Your decisions have to be [Accept/Reject]."
+    desk_review_messages[url] = f"Your job is to judge whether a paper is relevant to a conference on these topics and these topics ONLY: {', '.join(results['topics'])}. Your decisions have to be [Accept/Reject]."
+    return desk_review_messages[url]
 
-def gen_novelty_model(paper_contents):
-    keywords = extract_keywords(paper_contents, num_keywords=10)
+def gen_novelty_model(paper_contents, keywords=None):
+    if keywords is None:
+        from util.extract_keywords import extract_keywords
+        keywords = extract_keywords(paper_contents, num_keywords=10)
     keywords = ' '.join(keywords)
     relevant_papers = search_arxiv_papers(keywords, max_results=5)
     for paper in relevant_papers:
@@ -26,42 +48,64 @@ def gen_novelty_model(paper_contents):
         paper['summary'] = re.sub(r'\W+', ' ', paper['summary'])
     return ' '.join([paper['title'] for paper in relevant_papers]), ' '.join([paper['summary'] for paper in relevant_papers])
 
-def generate_base_models(url, paper_contents):
+def provision_base_models(url):
+    """Creates the desk reviewer, reviewer and role agents (unchanged ones are kept)."""
     models = {
         "deskreviewer": gen_desk_review_message(url),
         "reviewer1": reviewer_messages[0],
         "reviewer2": reviewer_messages[1],
         "reviewer3": reviewer_messages[2],
-        "questioner": "Your job is to ask questions about this section. Your questions should be open-ended and should not be leading. Your questions should be about the paper and not about the authors. Your questions should be about the content of the paper and not about the presentation of the paper. Your questions should be about the paper and not about the conference. Your questions should be about the paper and not about the reviewers.",
-        "grammar": "Your job is to check the grammar of the paper. Your decisions have to be [Accept/Reject], where \"Accept\" means the grammar is correct and \"Reject\" means the grammar is incorrect. ONLY say \"Accept\" if the grammar is correct. ONLY say \"Reject\" if the grammar is incorrect.",
-        "test": "This is a test model. Please ignore this message.",
-        "novelty": f"Your job is to judge whether a paper is novel. Your decisions have to be [Accept/Reject], where \"Accept\" means the paper is novel and \"Reject\" means the paper is not novel. Say \"Accept\" if the paper is novel. Say \"Reject\" if the paper is not novel. Use all the information in the prompt to make your decision and tell why you chose what you chose.", 
-        "factchecker": "You are a fact checker. Respond with [Accept] if the facts are correct or [Reject] if there are inaccuracies, followed by specific corrections. You should use Wikipedia as a reference. If you are satisfied with the facts, respond with [Accept]. If you find inaccuracies, respond with [Reject] and provide corrections. You do NOT have to always ASK WIKIPEDIA. Also, give your own take on the facts.",
+        **ROLE_MESSAGES,
         # "grammar": "You are a grammar checker. Review the section for grammar issues. Respond with [Accept] if the grammar is correct or [Reject] if there are issues, followed by specific corrections.",
     }
 
     for model, system in models.items():
-        if not isModelLoaded(model):
+        provision_model(model, system)
+    if tiers.tiering.enabled:
+        for model, base, system in tiers.tier_agents(models):
+            provision_model(model, system, base)
+
+def generate_base_models(url, paper_contents, keywords=None):
+    provision_base_models(url)
+    return gen_novelty_model(paper_contents, keywords)
+
+def provision_model(model, system, base="llama3.2"):
+    """
+    Creates (or recreates) a model from base (llama3.2) with the given system prompt on every
+    Ollama host serving it. A model this process already created with the same prompt is kept.
+    """
+    for client in get_pool().clients(model):
+        metrics.cache_lookup("provisioned_model", provisioned.get((client, model)) == system)
+        if provisioned.get((client, model)) == system:
+            continue
+        if not isModelLoaded(model, client):
             print(f"Creating model {model}")
-            ollama.create(model=model, from_="llama3.2", system=system, parameters={"num_ctx": 4096, "temperature": 0.7})
+            client.create(model=model, from_=base, system=system, parameters={"num_ctx": PINNED_NUM_CTX, "temperature": 0.7})
         else:
             print(f"Recreating model {model}")
-            ollama.delete(model=model)
-            ollama.create(model=model, from_="llama3.2", system=system, parameters={"num_ctx": 4096, "temperature": 0.7})
+            client.delete(model=model)
+            metrics.MODEL_OPERATIONS.inc(operation="delete")
+            client.create(model=model, from_=base, system=system, parameters={"num_ctx": PINNED_NUM_CTX, "temperature": 0.7})
+        metrics.MODEL_OPERATIONS.inc(operation="create")
+        provisioned[(client, model)] = system
+        sizer.note_system(model, system)
+
+def generate_desk_reviewer(url):
+    """Creates only the desk reviewer, so a paper can be gated before the other agents are built."""
+    system = gen_desk_review_message(url)
+    provision_model("deskreviewer", system)
+    if tiers.tiering.enabled:
+        for model, base, system in tiers.tier_agents({"deskreviewer": system}):
+            provision_model(model, system, base)
 
-    return gen_novelty_model(paper_contents)
+def paper_model_key(section_name):
+    """Name of the paper-specific model built from a section."""
+    return section_name.replace("\n", "").replace(" ", "")[:10]
 
 def generate_paper_models(paper_contents):
     paper_keys = []
     for key, value in paper_contents:
-        key = key.replace("\n", "").replace(" ", "")[:10]
-        if not isModelLoaded(key):
-            print(f"Creating model {key}")
-            paper_keys.append(key)
-            ollama.create(model=key, from_="llama3.2", system=value, parameters={"num_ctx": 4096, "temperature": 0.7})
-        else:
-            print(f"Recreating model {key}")
-            ollama.delete(model=key)
-            paper_keys.append(key)
-            ollama.create(model=key, from_="llama3.2", system=value, parameters={"num_ctx": 4096, "temperature": 0.7})
+        key = paper_model_key(key)
+        paper_keys.append(key)
+        provision_model(key, value)
     return paper_keys
\ No newline at end of file
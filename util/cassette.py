@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+import httpx
+
+# Response headers kept in a cassette; the rest (dates, server, lengths) is dropped
+KEPT_HEADERS = ("content-type",)
+
+class CassetteMiss(LookupError):
+    """A replayed request that the cassette has no recording of."""
+
+def request_key(method, url, body, match_host=True):
+    """Key of a request: its method, URL (without the host for Ollama, so any backend matches) and canonical body."""
+    url = httpx.URL(url)
+    target = str(url) if match_host else url.raw_path.decode()
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(method.encode() + b" " + target.encode() + b"\n" + body).hexdigest()[:24]
+
+def encode_body(content, content_type):
+    """Response body as stored in the cassette: parsed JSON, text or base64."""
+    if "json" in content_type:
+        try:
+            return {"json": json.loads(content)}
+        except ValueError:
+            pass
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode()}
+
+def decode_body(body):
+    if "json" in body:
+        return json.dumps(body["json"]).encode()
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    return base64.b64decode(body["base64"])
+
+class Cassette:
+    """
+    Recorded HTTP exchanges of a run: every Ollama call (chat, generate, embed, model
+    create/delete/list/ps, tool calls included) and every CFP, Wikipedia and arXiv request.
+
+    The cassette is a JSON lines file with one exchange per line: the request key,
+    method and URL, the response status, content type and body (JSON bodies stored
+    parsed, so the file stays readable and compact), and the time it took. Requests
+    are matched by key; repeats of a request are served in recorded order, and the
+    last recording is reused once they run out.
+    """
+
+    def __init__(self, path, mode, latency="zero"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.recordings = defaultdict(list)
+        self.served = defaultdict(int)
+        if mode == "replay":
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self.recordings[exchange["key"]].append(exchange)
+        else:
+            open(path, "w").close()
+
+    def __len__(self):
+        return sum(len(exchanges) for exchanges in self.recordings.values())
+
+    def record(self, key, request, response, elapsed):
+        content_type = response.headers.get("content-type", "")
+        exchange = {
+            "key": key,
+            "method": request.method,
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            "body": encode_body(response.content, content_type),
+            "elapsed": round(elapsed, 4),
+        }
+        with self.lock:
+            self.recordings[key].append(exchange)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+
+    def replay(self, key, request):
+        """The recorded exchange of a request and the seconds to wait before answering."""
+        with self.lock:
+            exchanges = self.recordings.get(key)
+            if not exchanges:
+                raise CassetteMiss(f"No recording of {request.method} {request.url} in {self.path}")
+            exchange = exchanges[min(self.served[key], len(exchanges) - 1)]
+            self.served[key] += 1
+        response = httpx.Response(exchange["status"], headers=exchange["headers"],
+                                  content=decode_body(exchange["body"]), request=request)
+        return response, exchange["elapsed"] if self.latency == "recorded" else 0
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records the exchanges of an inner transport, or replays them from the cassette."""
+
+    def __init__(self, cassette, inner=None, match_host=True):
+        self.cassette = cassette
+        self.inner = inner
+        self.match_host = match_host
+
+    def handle_request(self, request):
+        key = request_key(request.method, request.url, request.read(), self.match_host)
+        if self.cassette.mode == "replay":
+            response, delay = self.cassette.replay(key, request)
+            time.sleep(delay)
+            return response
+        start = time.monotonic()
+        response = self.inner.handle_request(request)
+        response.read()
+        self.cassette.record(key, request, response, time.monotonic() - start)
+        return response
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Asynchronous CassetteTransport, for the shared transport of the external tools."""
+
+    def __init__(self, cassette, inner=None, match_host=True):
+        self.cassette = cassette
+        self.inner = inner
+        self.match_host = match_host
+
+    async def handle_async_request(self, request):
+        key = request_key(request.method, request.url, await request.aread(), self.match_host)
+        if self.cassette.mode == "replay":
+            response, delay = self.cassette.replay(key, request)
+            await asyncio.sleep(delay)
+            return response
+        start = time.monotonic()
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        self.cassette.record(key, request, response, time.monotonic() - start)
+        return response
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+active = None
+
+def configure(record=None, replay=None, latency="zero"):
+    """Records to or replays from a cassette file; must run before the first Ollama or HTTP client is created."""
+    global active
+    if record:
+        active = Cassette(record, "record")
+        print(f"Recording model and HTTP exchanges to {record}")
+    elif replay:
+        active = Cassette(replay, "replay", latency)
+        print(f"Replaying {len(active)} recorded exchanges from {replay} ({latency} latency)")
+    else:
+        active = None
+    return active
+
+def replaying():
+    return active is not None and active.mode == "replay"
+
+def transport(match_host=True, **options):
+    """Transport for an httpx.Client (options: of the inner httpx.HTTPTransport), or None without a cassette."""
+    if active is None:
+        return None
+    inner = httpx.HTTPTransport(**options) if active.mode == "record" else None
+    return CassetteTransport(active, inner, match_host)
+
+def async_transport(match_host=True, **options):
+    """Transport for an httpx.AsyncClient (options: of the inner httpx.AsyncHTTPTransport), or None without a cassette."""
+    if active is None:
+        return None
+    inner = httpx.AsyncHTTPTransport(**options) if active.mode == "record" else None
+    return AsyncCassetteTransport(active, inner, match_host)
@@ -0,0 +1,99 @@
+import json
+from util import llm
+from util.build_models import ROLE_MESSAGES
+from util.verdict import VERDICT_SCHEMA, parse_decision
+from util.defaults import COMBINED_MODEL
+
+def verdict_property(description):
+    """The structured verdict schema of util/verdict.py, described as one role's part of the response."""
+    return {**VERDICT_SCHEMA, "description": description}
+
+# JSON schema of the single combined response; one property per role agent.
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "test": {
+            "type": "object",
+            "properties": {"response": {"type": "string"}},
+            "required": ["response"],
+        },
+        "grammar": verdict_property("Grammar check"),
+        "novelty": verdict_property("Novelty check"),
+        "fact": verdict_property("Fact check"),
+        "questioner": {
+            "type": "object",
+            "properties": {"questions": {"type": "array", "items": {"type": "string"}}},
+            "required": ["questions"],
+        },
+    },
+    "required": ["test", "grammar", "novelty", "fact", "questioner"],
+}
+
+def build_combined_prompt(section_text):
+    return f"""You are a panel of review agents. Read the research paper section below and answer as every agent at once.
+
+    Section:
+    "{section_text}"
+
+    Agents:
+    - test: {ROLE_MESSAGES["test"]}
+    - grammar: {ROLE_MESSAGES["grammar"]}
+    - novelty: {ROLE_MESSAGES["novelty"]}
+    - fact: {ROLE_MESSAGES["factchecker"]}
+    - questioner: {ROLE_MESSAGES["questioner"]}
+
+    Respond ONLY with a JSON object with one field per agent. Each verdict has a "decision" (Accept or Reject),
+    a "confidence" between 0 and 1 and a short "rationale". The questioner lists its questions.
+    """
+
+def normalize_verdict(role_output, structured):
+    """Normalizes one verdict of the combined response to the per-agent output format."""
+    if not isinstance(role_output, dict):
+        role_output = {}
+    decision = role_output.get("decision")
+    rationale = str(role_output.get("rationale", "")).strip()
+    if decision not in ("Accept", "Reject"):
+        accepted = parse_decision(rationale)
+        decision = None if accepted is None else ("Accept" if accepted else "Reject")
+    if structured:
+        try:
+            confidence = min(1.0, max(0.0, float(role_output.get("confidence", 0.0))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return {"decision": decision, "confidence": confidence, "rationale": rationale}
+    return f"{decision or 'Undecided'} - {rationale}"
+
+def combined_checks(section_text, structured=False, model=COMBINED_MODEL):
+    """
+    Runs the test, grammar, novelty, fact and questioner checks in one model call.
+
+    Returns the outputs keyed like all_section_reviews[section]. Verdicts are
+    {decision, confidence, rationale} dicts in structured mode and "Decision - rationale"
+    strings otherwise, so both are read by the same scoring scripts as the per-agent path.
+    """
+    try:
+        response = llm.chat("combined", model, [{"role": "user", "content": build_combined_prompt(section_text)}],
+                            format=COMBINED_SCHEMA)
+    except llm.CallTimeout as e:
+        print(f"Timeout: {e}")
+        record = e.record()
+        return {"Test": record, "Grammar Check": record, "Novelty Check": record, "Fact Check": record, "Questioner": ""}
+    try:
+        data = json.loads(response['message']['content'])
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    questions = data.get("questioner", {}).get("questions", []) if isinstance(data.get("questioner"), dict) else []
+    # Stage 2 splits the questioner output on "?", so every question must end with one.
+    questions = [q.strip().rstrip("?") + "?" for q in questions if isinstance(q, str) and q.strip()]
+
+    test = data.get("test", {})
+    return {
+        "Test": test.get("response", "") if isinstance(test, dict) else str(test),
+        "Grammar Check": normalize_verdict(data.get("grammar"), structured),
+        "Novelty Check": normalize_verdict(data.get("novelty"), structured),
+        "Fact Check": normalize_verdict(data.get("fact"), structured),
+        "Questioner": "\n".join(questions),
+    }
@@ -0,0 +1,56 @@
+from util.verdict import parse_decision
+
+def is_skipped(review):
+    """True if the reviewer gave no review: not called after consensus, or timed out."""
+    return isinstance(review, dict) and (review.get("Skipped") is True or review.get("Timeout") is True)
+
+def review_decision(review):
+    """
+    Returns (decision, confidence) for a reviewer output.
+
+    Structured verdicts carry both fields. Free-form reviews are read with
+    parse_decision (the last explicit "Decision: ...", else the last Accept/Reject
+    mention); the confidence of a free-form review is unknown (None).
+    """
+    if isinstance(review, dict):
+        return review.get("decision"), review.get("confidence")
+
+    accepted = parse_decision(review)
+    if accepted is None:
+        return None, None
+    return ("Accept" if accepted else "Reject"), None
+
+def consensus_reached(decisions, k, min_confidence=0.0):
+    """
+    Sequential agreement rule over the (decision, confidence) pairs issued so far.
+
+    Consensus is reached once at least k reviewers have been issued, all of them
+    agree, and every known confidence is at least min_confidence. A single dissent
+    (or an unparsed decision) therefore means every remaining reviewer is issued: a
+    majority rule would stop after e.g. Reject, Accept, Reject, but flips sections
+    whose full panel ties (scored as Accept) far more often on the stored reviews.
+    """
+    if len(decisions) < k or decisions[0][0] is None:
+        return False
+    first = decisions[0][0]
+    return all(d == first and (c is None or c >= min_confidence) for d, c in decisions)
+
+def adaptive_reviews(review_fn, models, k=2, min_confidence=0.8):
+    """
+    Calls review_fn(model) for each model in order and stops once consensus is reached.
+
+    Models that were not called are recorded as {"Skipped": True, "Reason": ...}.
+    """
+    outputs = {}
+    decisions = []
+    for i, model in enumerate(models):
+        review = review_fn(model)
+        outputs[model] = review
+        decisions.append(review_decision(review))
+        if i + 1 < len(models) and consensus_reached(decisions, k, min_confidence):
+            reason = f"Consensus after {i + 1} of {len(models)} reviewers"
+            print(f"{reason}, skipping {', '.join(models[i + 1:])}")
+            for skipped in models[i + 1:]:
+                outputs[skipped] = {"Skipped": True, "Reason": reason}
+            break
+    return outputs
@@ -0,0 +1,166 @@
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from util.budget import estimate_tokens
+from util import metrics
+
+# Context windows a request can get; each call gets the smallest one that fits
+CONTEXT_BUCKETS = (1024, 2048, 4096, 8192, 16384, 32768)
+# num_ctx every agent model used to be pinned to (the baseline of the savings report)
+PINNED_NUM_CTX = 4096
+# Chat template tokens per message, and slack for the word-based token estimate
+MESSAGE_OVERHEAD = 8
+ESTIMATE_MARGIN = 1.15
+# Seconds Ollama keeps an idle model loaded when no keep_alive is set
+DEFAULT_KEEP_ALIVE = 300
+# KV cache bytes per context token when the model does not report its shape (fp16, 32 layers, 8 KV heads of 128)
+DEFAULT_KV_BYTES = 2 * 32 * 8 * 128 * 2
+
+def text_tokens(text):
+    """Token estimate that does not undercount symbol-heavy text (equations, code, tables)."""
+    return max(estimate_tokens(text), len(text) // 4)
+
+def kv_bytes_per_token(client, model):
+    """KV cache bytes per context token, from the architecture Ollama reports for the model."""
+    try:
+        info = client.show(model).modelinfo or {}
+        arch = info["general.architecture"]
+        heads = info[f"{arch}.attention.head_count"]
+        kv_heads = info.get(f"{arch}.attention.head_count_kv", heads)
+        head_size = info.get(f"{arch}.attention.key_length") or info[f"{arch}.embedding_length"] // heads
+        return 2 * info[f"{arch}.block_count"] * kv_heads * head_size * 2
+    except Exception:
+        return DEFAULT_KV_BYTES
+
+def keep_alive_seconds(keep_alive):
+    """Seconds an idle model stays loaded for a keep_alive setting ("30m", "1h30m", 600), or None if never unloaded."""
+    if keep_alive is None:
+        return DEFAULT_KEEP_ALIVE
+    text = str(keep_alive).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        parts = re.findall(r'(-?\d+(?:\.\d+)?)(ms|h|m|s)', text)
+        if not parts:
+            return DEFAULT_KEEP_ALIVE
+        seconds = sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit] for n, unit in parts)
+    return None if seconds < 0 else seconds
+
+class ContextSizer:
+    """
+    Picks num_ctx per request instead of pinning every model to PINNED_NUM_CTX.
+
+    A request needs its prompt tokens (messages, tools, prompt, the `context` it
+    continues from, plus the system prompt the model was created with) and its
+    completion budget (num_predict). It gets the smallest bucket that fits. Ollama
+    reloads a model whenever num_ctx changes, so each model keeps the bucket it runs
+    at as long as requests fit: calls are grouped by bucket, and a model only grows
+    (at most once per bucket) when a larger request comes in. A model shrinks back only
+    when it is loaded afresh: after it is recreated, or once it has been idle longer
+    than Ollama keeps it loaded (unload_after seconds, see keep_alive_seconds).
+
+    Only the models created by build_models were pinned to PINNED_NUM_CTX before; the
+    memory saved is reported for those, the others ran at Ollama's default context.
+    """
+
+    def __init__(self, buckets=CONTEXT_BUCKETS, pinned=PINNED_NUM_CTX, unload_after=DEFAULT_KEEP_ALIVE):
+        self.buckets = tuple(sorted(buckets))
+        self.pinned = pinned
+        self.unload_after = unload_after
+        self.system_tokens = {}
+        self.loaded = {}
+        self.last_call = {}
+        self.stats = defaultdict(lambda: {"Calls": 0, "Reloads": 0, "Largest Need": 0, "Truncations Avoided": 0, "Truncated": 0})
+        self.lock = threading.Lock()
+
+    def note_system(self, model, system):
+        """
+        Records the system prompt a model was (re)created with; it takes up context in
+        every call. A recreated model is loaded afresh, so it may start at a smaller bucket.
+        """
+        with self.lock:
+            self.system_tokens[model] = text_tokens(system) + MESSAGE_OVERHEAD
+            self.loaded.pop(model, None)
+
+    def prompt_tokens(self, model, kwargs):
+        tokens = self.system_tokens.get(model, 0)
+        for message in kwargs.get("messages") or []:
+            content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+            tokens += text_tokens(content or "") + MESSAGE_OVERHEAD
+        if kwargs.get("tools"):
+            tokens += text_tokens(json.dumps([getattr(t, "__doc__", None) or str(t) for t in kwargs["tools"]]))
+        if kwargs.get("format"):
+            tokens += text_tokens(json.dumps(kwargs["format"]))
+        tokens += text_tokens(kwargs.get("prompt") or "") + text_tokens(kwargs.get("system") or "")
+        return int(tokens * ESTIMATE_MARGIN) + len(kwargs.get("context") or [])
+
+    def fit(self, model, needed):
+        """num_ctx for a request of needed tokens (prompt and completion) to the model."""
+        with self.lock:
+            stats = self.stats[model]
+            stats["Calls"] += 1
+            stats["Largest Need"] = max(stats["Largest Need"], needed)
+            now = time.monotonic()
+            if self.unload_after is not None and now - self.last_call.get(model, now) > self.unload_after:
+                # Ollama has unloaded the idle model: its next load starts at the bucket this request needs
+                self.loaded.pop(model, None)
+            self.last_call[model] = now
+            current = self.loaded.get(model)
+            if current is not None and needed <= current:
+                size = current
+            else:
+                size = max(next((b for b in self.buckets if b >= needed), self.buckets[-1]), current or 0)
+            if current is not None and size != current:
+                stats["Reloads"] += 1
+                metrics.CONTEXT_RELOADS.inc(model=model)
+            if needed > size:
+                stats["Truncated"] += 1
+                metrics.CONTEXT_TRUNCATIONS.inc(model=model, outcome="truncated")
+                print(f"{model}: request of ~{needed} tokens exceeds the largest context ({size}); the prompt will be truncated")
+            elif needed > self.pinned and model in self.system_tokens:
+                stats["Truncations Avoided"] += 1
+                metrics.CONTEXT_TRUNCATIONS.inc(model=model, outcome="avoided")
+            self.loaded[model] = size
+            return size
+
+    def size(self, model, kwargs, num_predict):
+        return self.fit(model, self.prompt_tokens(model, kwargs) + max(num_predict or 0, 0))
+
+    def report(self, client_for=None):
+        """
+        Per-model contexts and the KV cache memory saved against PINNED_NUM_CTX
+        (negative where a model grew to avoid truncation). Models that build_models did
+        not create (the reviewers, the summarizer) have no pinned baseline: their saving
+        is None. client_for(model) gives an Ollama client to read the model's shape from.
+        """
+        rows = {}
+        with self.lock:
+            loaded = dict(self.loaded)
+            stats = {model: dict(s) for model, s in self.stats.items()}
+            provisioned = set(self.system_tokens)
+        for model, num_ctx in loaded.items():
+            saved = None
+            if model in provisioned:
+                client = client_for(model) if client_for else None
+                kv = kv_bytes_per_token(client, model) if client else DEFAULT_KV_BYTES
+                saved = (self.pinned - num_ctx) * kv
+            rows[model] = {**stats[model], "Num Ctx": num_ctx, "KV Bytes Saved": saved}
+        return {
+            "Models": rows,
+            "KV Bytes Saved": sum(row["KV Bytes Saved"] or 0 for row in rows.values()),
+            "Truncations Avoided": sum(row["Truncations Avoided"] for row in rows.values()),
+            "Truncated": sum(row["Truncated"] for row in rows.values()),
+        }
+
+def print_report(report):
+    print(f"\nContext sizes (num_ctx per model, KV cache saved against the pinned {PINNED_NUM_CTX}):")
+    for model, row in sorted(report["Models"].items()):
+        saved = "not pinned before" if row["KV Bytes Saved"] is None else f"{row['KV Bytes Saved'] / 2 ** 20:+.0f} MB"
+        print(f"- {model}: {row['Num Ctx']} ({row['Calls']} calls, largest ~{row['Largest Need']} tokens, "
+              f"{row['Reloads']} reloads, {saved})")
+    print(f"KV cache saved: {report['KV Bytes Saved'] / 2 ** 20:.0f} MB across the agent models; "
+          f"truncations avoided: {report['Truncations Avoided']}; still truncated: {report['Truncated']}")
+
+sizer = ContextSizer()
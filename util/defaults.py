@@ -0,0 +1,17 @@
+# Defaults of the command line options, kept free of imports so that building the
+# parser (e.g. for the MARS.py --server client) does not load ollama, httpx or the agents.
+
+# Model call policy (util/llm.py)
+RETRIES = 1
+HEDGE_PERCENTILE = 0.9
+
+# Model answering every check in --check-mode combined (util/combined_checks.py)
+COMBINED_MODEL = "llama3.2"
+
+# Stage 2 question routing and deduplication (util/routing.py, util/questions.py)
+ROUTE_MODEL = "nomic-embed-text"
+DEFAULT_TOP_K = 2
+LEXICAL_THRESHOLD = 0.8
+
+# Structured confidence below which a tiered call escalates (util/tiers.py)
+MIN_CONFIDENCE = 0.7
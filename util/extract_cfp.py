@@ -1,6 +1,7 @@
-import requests
 from bs4 import BeautifulSoup
 import re
+from util.transport import get_transport
+from util import profiling
 
 class CFPTopicExtractor:
     def __init__(self):
@@ -46,20 +47,21 @@ class CFPTopicExtractor:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=10)
+            response = get_transport().get(url, headers=headers)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            topics = set()  # Use set to avoid duplicates
-            
-            # Find the largest list in the document (usually contains topics)
-            lists = soup.find_all(['ul', 'ol'])
-            if lists:
-                largest_list = max(lists, key=lambda x: len(x.find_all('li')))
-                for item in largest_list.find_all('li'):
-                    topic = self.clean_topic(item.get_text())
-                    if self.is_valid_topic(topic):
-                        topics.add(topic)
+            with profiling.stage("cfp html parse"):
+                soup = BeautifulSoup(response.text, 'html.parser')
+                topics = set()  # Use set to avoid duplicates
+
+                # Find the largest list in the document (usually contains topics)
+                lists = soup.find_all(['ul', 'ol'])
+                if lists:
+                    largest_list = max(lists, key=lambda x: len(x.find_all('li')))
+                    for item in largest_list.find_all('li'):
+                        topic = self.clean_topic(item.get_text())
+                        if self.is_valid_topic(topic):
+                            topics.add(topic)
             
             # Convert to sorted list and remove duplicates
             return {
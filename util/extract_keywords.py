@@ -2,12 +2,23 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from collections import Counter
+from types import MappingProxyType
+import argparse
+import glob
+import json
+import math
+import os
+import re
 import string
 
 # Download necessary resources from NLTK
 nltk.download('punkt')
 nltk.download('stopwords')
 
+# Built once instead of on every call
+STOP_WORDS = frozenset(stopwords.words('english'))
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]+")
+
 def extract_keywords(paragraph, num_keywords=5):
     """
     Extracts a few keywords from a given paragraph.
@@ -23,9 +34,8 @@ def extract_keywords(paragraph, num_keywords=5):
     words = word_tokenize(paragraph.lower())
     
     # Remove stopwords and punctuation
-    stop_words = set(stopwords.words('english'))
     filtered_words = [
-        word for word in words if word not in stop_words and word not in string.punctuation
+        word for word in words if word not in STOP_WORDS and word not in string.punctuation
     ]
     
     # Count the frequency of each word
@@ -35,3 +45,98 @@ def extract_keywords(paragraph, num_keywords=5):
     keywords = [word for word, freq in word_freq.most_common(num_keywords)]
     
     return keywords
+
+class KeywordEngine:
+    """
+    TF-IDF keyword extractor with corpus statistics computed once.
+
+    The stopwords and IDF table are frozen (frozenset / read-only mapping), so one
+    engine can be shared by every section and every paper of a run.
+    """
+    __slots__ = ("idf", "default_idf", "num_documents", "stop_words")
+
+    def __init__(self, idf, num_documents, stop_words=STOP_WORDS):
+        self.idf = MappingProxyType(dict(idf))
+        self.num_documents = num_documents
+        # Words never seen in the corpus are treated as appearing in no document.
+        self.default_idf = math.log((1 + num_documents) / 1) + 1
+        self.stop_words = frozenset(stop_words)
+
+    def tokenize(self, text):
+        return [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in self.stop_words]
+
+    @classmethod
+    def from_corpus(cls, documents):
+        """Builds the IDF table (smoothed, as in scikit-learn) from an iterable of texts."""
+        document_freq = Counter()
+        num_documents = 0
+        for document in documents:
+            num_documents += 1
+            document_freq.update(set(TOKEN_PATTERN.findall(document.lower())) - STOP_WORDS)
+        idf = {word: math.log((1 + num_documents) / (1 + df)) + 1 for word, df in document_freq.items()}
+        return cls(idf, num_documents)
+
+    @classmethod
+    def from_directory(cls, directory):
+        """
+        Builds the engine from the JSON files in a directory, one document per section.
+
+        Sectioned papers (paper.schema.json) contribute their section text; MARS outputs
+        such as dataset_results/ contribute the text of their section reviews.
+        """
+        return cls.from_corpus(iter_corpus_documents(directory))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"num_documents": self.num_documents,
+                       "idf": {word: round(value, 4) for word, value in self.idf.items()}}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["idf"], data["num_documents"])
+
+    def keywords(self, text, num_keywords=10):
+        return self.keywords_for_sections([text], num_keywords)[0]
+
+    def keywords_for_sections(self, texts, num_keywords=10):
+        """Extracts the top TF-IDF keywords of every text in one pass over the batch."""
+        idf = self.idf
+        default_idf = self.default_idf
+        results = []
+        for text in texts:
+            counts = Counter(self.tokenize(text))
+            scored = sorted(counts.items(), key=lambda item: (-item[1] * idf.get(item[0], default_idf), item[0]))
+            results.append([word for word, _ in scored[:num_keywords]])
+        return results
+
+def iter_corpus_documents(directory):
+    """Yields one document per section for every JSON file in the directory."""
+    for file_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(file_path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Error parsing {file_path}: {e}")
+                continue
+        if not isinstance(data, dict):
+            continue
+        for section in data.get("input", {}).get("sections", []):
+            yield section.get("text", "")
+        for review in data.get("Section Reviews", {}).values():
+            if not isinstance(review, dict):
+                continue
+            texts = [v for v in review.values() if isinstance(v, str)]
+            texts += [v for v in review.get("Reviewers", {}).values() if isinstance(v, str)]
+            yield " ".join(texts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the IDF table used for novelty search keywords")
+    parser.add_argument("directory", help="Directory of paper or review JSON files (e.g. dataset_results)")
+    parser.add_argument("output", help="Where to write the IDF table (JSON)")
+    args = parser.parse_args()
+
+    engine = KeywordEngine.from_directory(args.directory)
+    engine.save(args.output)
+    print(f"IDF table with {len(engine.idf)} words from {engine.num_documents} documents saved to {args.output}")
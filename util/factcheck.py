@@ -0,0 +1,132 @@
+import json
+import time
+from util import llm
+from util.multiagent import wiki_lookup
+from util.transport import get_transport
+from util.verdict import VERDICT_SCHEMA, STRUCTURED_INSTRUCTION, structured_options, parse_verdict
+
+# Claims are extracted by the base model; the factchecker role model adjudicates.
+CLAIM_MODEL = "llama3.2"
+ADJUDICATOR_MODEL = "factchecker"
+MAX_CLAIMS = 6
+NO_RESULTS = "No results found on Wikipedia"
+
+CLAIMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "claims": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "claim": {"type": "string"},
+                    "query": {"type": "string"},
+                },
+                "required": ["claim", "query"],
+            },
+        },
+    },
+    "required": ["claims"],
+}
+
+def extract_claims(section_text, model=CLAIM_MODEL, max_claims=MAX_CLAIMS):
+    """Extracts the checkable factual claims of a section, each with a short encyclopedia query, in one call."""
+    prompt = f"""List the checkable factual claims made in the research paper section below: statements about
+    established facts, prior work, datasets, methods or history that an encyclopedia could confirm or refute.
+    Skip the paper's own new results. For each claim give a short search query (a few keywords).
+    List at most {max_claims} claims.
+
+    Section:
+    "{section_text}"
+    """
+    try:
+        response = llm.chat("claims", model, [{"role": "user", "content": prompt}], format=CLAIMS_SCHEMA)
+    except llm.CallTimeout as e:
+        print(f"Timeout: {e}")
+        return []
+    try:
+        claims = json.loads(response['message']['content']).get("claims", [])
+    except (json.JSONDecodeError, AttributeError):
+        return []
+    if not isinstance(claims, list):
+        return []
+    claims = [c for c in claims if isinstance(c, dict) and isinstance(c.get("claim"), str) and c["claim"].strip()]
+    return [{"claim": c["claim"].strip(), "query": (c["query"] if isinstance(c.get("query"), str) and c["query"].strip() else c["claim"]).strip()}
+            for c in claims[:max_claims]]
+
+async def lookup_claim(claim, lookup=wiki_lookup):
+    start = time.time()
+    try:
+        evidence = await lookup(claim["query"])
+        error = None
+    except Exception as e:
+        evidence, error = None, f"{type(e).__name__}: {e}"
+    record = {
+        "Claim": claim["claim"],
+        "Query": claim["query"],
+        "Evidence": evidence,
+        "Hit": bool(evidence) and not evidence.startswith(NO_RESULTS),
+        "Latency": round(time.time() - start, 3),
+    }
+    if error:
+        record["Error"] = error
+    return record
+
+def lookup_claims(claims, lookup=wiki_lookup):
+    """
+    Looks up all claims concurrently on the shared transport, whose per-host rate limits
+    and connection pool they share; returns the per-claim records in claim order.
+    """
+    if not claims:
+        return []
+    print(f"Searching Wikipedia for {len(claims)} claims")
+    return get_transport().gather([lookup_claim(claim, lookup) for claim in claims])
+
+@llm.records_timeouts
+def adjudicate(section_text, records, structured=False, model=ADJUDICATOR_MODEL):
+    """One final fact-check call on the section with the gathered evidence."""
+    evidence = "\n\n".join(
+        f"Claim {i + 1}: {r['Claim']}\nEvidence: {r['Evidence'] if r['Hit'] else 'none found'}"
+        for i, r in enumerate(records)
+    ) or "No checkable claims were found."
+    prompt = f"""Check the facts of the research paper section below against the evidence gathered for its claims.
+    Where the evidence contradicts a claim, give the correction. Where no evidence was found, use your own knowledge.
+
+    Section:
+    "{section_text}"
+
+    {evidence}
+
+    {STRUCTURED_INSTRUCTION if structured else "Say 'Accept' if the claims are correct and 'Reject' if there are inaccuracies."}
+    """
+    if structured:
+        response = llm.chat("factchecker", model, [{"role": "user", "content": prompt}],
+                            format=VERDICT_SCHEMA, options=structured_options("factchecker"))
+        return parse_verdict(response['message']['content'])
+    response = llm.chat("factchecker", model, [{"role": "user", "content": prompt}])
+    return response['message']['content']
+
+def claim_fact_check(section_text, structured=False, lookup=wiki_lookup):
+    """
+    Claim-level fact check: one extraction call, concurrent lookups, one adjudication call.
+
+    Returns (verdict, report). The verdict has the same form as consultFactChecker's
+    output; the report lists every claim with its evidence, hit and lookup latency,
+    plus the hit rate and timings of the lookups.
+    """
+    claims = extract_claims(section_text)
+    start = time.time()
+    records = lookup_claims(claims, lookup)
+    lookup_time = time.time() - start
+    verdict = adjudicate(section_text, records, structured)
+
+    hits = sum(r["Hit"] for r in records)
+    report = {
+        "Claims": records,
+        "Lookups": len(records),
+        "Hits": hits,
+        "Hit Rate": round(hits / len(records), 3) if records else None,
+        "Mean Latency": round(sum(r["Latency"] for r in records) / len(records), 3) if records else None,
+        "Lookup Wall Time": round(lookup_time, 3),
+    }
+    return verdict, report
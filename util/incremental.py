@@ -0,0 +1,38 @@
+import hashlib
+import re
+import unicodedata
+
+def normalize_section_text(text):
+    """Normalizes extraction noise (unicode forms, hyphenated line breaks, whitespace) before hashing."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = re.sub(r'-\s*\n\s*', '', text)
+    return " ".join(text.split())
+
+def section_hash(text):
+    """Content hash of a section, stable across re-extraction of the same text."""
+    return hashlib.sha256(normalize_section_text(text).encode("utf-8")).hexdigest()
+
+def diff_sections(sections, stored_hashes, reviewed):
+    """
+    Compares a (re-)submission with the hashes stored in a checkpoint.
+
+    Args:
+        sections (list): (name, text) pairs of the submission.
+        stored_hashes (dict): Section name -> hash from the checkpoint.
+        reviewed (set): Section names that already have a review.
+
+    Returns:
+        dict: "Changed", "Unchanged", "New" and "Removed" section names. Reviewed
+        sections without a stored hash (older checkpoints) count as unchanged.
+    """
+    current = {name: section_hash(text) for name, text in sections}
+    diff = {"Changed": [], "Unchanged": [], "New": [], "Removed": []}
+    for name, digest in current.items():
+        if name not in reviewed:
+            diff["New"].append(name)
+        elif name in stored_hashes and stored_hashes[name] != digest:
+            diff["Changed"].append(name)
+        else:
+            diff["Unchanged"].append(name)
+    diff["Removed"] = [name for name in stored_hashes if name not in current and name in reviewed]
+    return diff
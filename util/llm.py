@@ -0,0 +1,269 @@
+import functools
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+import ollama
+from util.backends import get_pool
+from util import metrics
+from util.context_size import sizer, keep_alive_seconds, PINNED_NUM_CTX
+from util.defaults import RETRIES, HEDGE_PERCENTILE
+
+# Seconds a call of each role may take before it counts as a timeout
+ROLE_DEADLINES = {
+    "reviewer": 300,
+    "summarizer": 240,
+    "combined": 300,
+    "deskreviewer": 120,
+    "grammar": 120,
+    "novelty": 120,
+    "factchecker": 120,
+    "claims": 120,
+    "test": 90,
+    "questioner": 120,
+    "prefix": 120,
+    "answer": 120,
+    "embedding": 60,
+}
+DEFAULT_DEADLINE = 180
+
+# Completion tokens a free-form call is sized for when picking its context window. Outputs
+# are not capped unless --max-tokens is set (structured calls have their own caps)
+ROLE_COMPLETION_TOKENS = {
+    "reviewer": 2048,
+    "summarizer": 1024,
+    "combined": 2048,
+    "answer": 1024,
+}
+DEFAULT_COMPLETION_TOKENS = 1024
+
+BACKOFF = 1.0
+HEDGE_MIN_SAMPLES = 10
+LATENCY_WINDOW = 50
+MAX_WORKERS = 16
+
+class CallTimeout(Exception):
+    """A model call that did not finish within its deadline, on any attempt."""
+
+    def __init__(self, role, model, deadline, attempts):
+        super().__init__(f"{model} ({role}) gave no response within {deadline:g}s after {attempts} attempt(s)")
+        self.role = role
+        self.model = model
+        self.deadline = deadline
+        self.attempts = attempts
+
+    def record(self):
+        """Output recorded in place of the response."""
+        return {"Timeout": True, "Role": self.role, "Model": self.model, "Reason": str(self)}
+
+def is_timeout(output):
+    return isinstance(output, dict) and output.get("Timeout") is True
+
+def records_timeouts(function):
+    """Makes an agent function return the timeout record instead of raising CallTimeout."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except CallTimeout as e:
+            print(f"Timeout: {e}")
+            return e.record()
+    return wrapper
+
+class CallPolicy:
+    """
+    Deadlines, retries, hedging and generation caps applied to every model call.
+    keep_alive (e.g. "30m") is sent with calls that do not set their own, so Ollama
+    keeps the models loaded between calls. With context_size "auto", each call that
+    does not set num_ctx gets a context window sized to it (see ContextSizer);
+    "pinned" leaves every model at PINNED_NUM_CTX.
+
+    A call is retried (with exponential backoff) when it times out or the server fails.
+    With hedging on, a duplicate request is sent once a call has run longer than the
+    hedge_percentile of recent latencies for its role and model; the first answer wins.
+    """
+
+    def __init__(self, deadline=None, retries=RETRIES, backoff=BACKOFF, hedge=False,
+                 hedge_percentile=HEDGE_PERCENTILE, max_tokens=None, keep_alive=None, context_size="auto"):
+        self.deadline_override = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.max_tokens = max_tokens
+        self.keep_alive = keep_alive
+        self.context_size = context_size
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.lock = threading.Lock()
+
+    def deadline(self, role):
+        return self.deadline_override or ROLE_DEADLINES.get(role, DEFAULT_DEADLINE)
+
+    def token_cap(self, role):
+        """num_predict cap of a call: none unless --max-tokens is set."""
+        return self.max_tokens
+
+    def completion_tokens(self, role):
+        return self.max_tokens or ROLE_COMPLETION_TOKENS.get(role, DEFAULT_COMPLETION_TOKENS)
+
+    def record_latency(self, role, model, seconds):
+        with self.lock:
+            self.latencies[(role, model)].append(seconds)
+
+    def hedge_delay(self, role, model):
+        """Seconds after which a duplicate request is sent, or None."""
+        if not self.hedge:
+            return None
+        with self.lock:
+            samples = sorted(self.latencies[(role, model)])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(self.hedge_percentile * len(samples)))]
+
+policy = CallPolicy()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="mars-llm")
+
+def configure(**settings):
+    """Replaces the call policy (e.g. from command line flags); see CallPolicy for the settings."""
+    global policy
+    policy = CallPolicy(**settings)
+    # A model Ollama unloads after keep_alive starts again at the context its next call needs
+    sizer.unload_after = keep_alive_seconds(policy.keep_alive)
+
+def first_result(submit, deadline, hedge_after):
+    """Waits for the first successful attempt (plus a hedged duplicate); raises TimeoutError at the deadline."""
+    start = time.monotonic()
+    futures = {submit()}
+    hedged = hedge_after is None
+    error = None
+    while futures:
+        elapsed = time.monotonic() - start
+        if elapsed >= deadline:
+            raise TimeoutError
+        timeout = deadline - elapsed if hedged else max(0.0, min(deadline, hedge_after) - elapsed)
+        done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not hedged and time.monotonic() - start >= hedge_after:
+            print(f"Hedging: no response after {hedge_after:.1f}s, sending a duplicate request")
+            futures.add(submit())
+            hedged = True
+    raise error
+
+def retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return isinstance(error, ollama.ResponseError) and error.status_code >= 500
+
+def host_failed(error):
+    """Whether an error means the host is down (connection errors, 5xx) rather than just slow."""
+    if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+        return False
+    return retryable(error)
+
+def send(pool, backend, method, deadline, model, kwargs):
+    """Runs one request on a backend host; the client's HTTP timeout matches the deadline, so abandoned calls are freed too."""
+    try:
+        result = getattr(backend.client(deadline), method)(model=model, **kwargs)
+    except Exception as e:
+        pool.release(backend, model, failed=host_failed(e), answered=False)
+        raise
+    pool.release(backend, model)
+    return result
+
+def call(method, role, model, affinity=None, **kwargs):
+    """
+    Sends one Ollama call (chat, generate or embed) under the call policy.
+
+    The host is picked by the backend pool; hedged and retried requests go to another
+    host when there is one. Calls with the same affinity key stay on one host.
+    Raises CallTimeout if every attempt timed out; other errors are raised once the
+    retries are used up.
+    """
+    deadline = policy.deadline(role)
+    if method != "embed":
+        options = dict(kwargs.get("options") or {})
+        cap = policy.token_cap(role)
+        if cap:
+            options["num_predict"] = min(options.get("num_predict", cap), cap)
+        if policy.context_size == "auto" and "num_ctx" not in options:
+            options["num_ctx"] = sizer.size(model, kwargs, options.get("num_predict", policy.completion_tokens(role)))
+        kwargs["options"] = options
+
+    if policy.keep_alive is not None:
+        kwargs.setdefault("keep_alive", policy.keep_alive)
+
+    pool = get_pool()
+    used = []
+    attempt_requests = []
+
+    def submit():
+        backend = pool.acquire(model, exclude=used, affinity=affinity)
+        used.append(backend)
+        attempt_requests.append(backend)
+        if len(attempt_requests) > 1:
+            metrics.LLM_HEDGES.inc(role=role, model=model)
+        return _executor.submit(send, pool, backend, method, deadline, model, kwargs)
+
+    for attempt in range(policy.retries + 1):
+        start = time.monotonic()
+        attempt_requests.clear()
+        try:
+            result = first_result(submit, deadline, policy.hedge_delay(role, model))
+            latency = time.monotonic() - start
+            policy.record_latency(role, model, latency)
+            record_call(role, model, result, latency)
+            return result
+        except Exception as e:
+            if not retryable(e):
+                metrics.LLM_CALLS.inc(role=role, model=model, outcome="error")
+                raise
+            timed_out = isinstance(e, (TimeoutError, httpx.TimeoutException))
+            print(f"{model} ({role}) attempt {attempt + 1} failed: {type(e).__name__}")
+            if attempt == policy.retries:
+                metrics.LLM_CALLS.inc(role=role, model=model, outcome="timeout" if timed_out else "error")
+                if timed_out:
+                    raise CallTimeout(role, model, deadline, attempt + 1)
+                raise
+        metrics.LLM_RETRIES.inc(role=role, model=model)
+        time.sleep(policy.backoff * 2 ** attempt + random.uniform(0, policy.backoff / 2))
+
+def record_call(role, model, response, latency):
+    """Counts a successful call, its latency and the prompt/completion tokens Ollama reported."""
+    metrics.LLM_CALLS.inc(role=role, model=model, outcome="ok")
+    metrics.LLM_LATENCY.observe(latency, role=role, model=model)
+    for kind, field in (("prompt", "prompt_eval_count"), ("completion", "eval_count")):
+        tokens = getattr(response, field, None)
+        if tokens:
+            metrics.LLM_TOKENS.inc(tokens, role=role, model=model, kind=kind)
+
+def context_window(model, needed):
+    """num_ctx for a group of calls needing up to `needed` tokens, to be passed explicitly to each of them."""
+    return sizer.fit(model, needed) if policy.context_size == "auto" else PINNED_NUM_CTX
+
+def fan_out(function, items):
+    """
+    Applies function to every item and returns the results in order.
+
+    Independent calls run concurrently when the backend pool has several hosts to
+    spread them over; with one host they run one after another, as Ollama would
+    queue them anyway.
+    """
+    items = list(items)
+    if len(get_pool().backends) < 2 or len(items) < 2:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(items))) as executor:
+        return list(executor.map(function, items))
+
+def chat(role, model, messages, **kwargs):
+    return call("chat", role, model, messages=messages, **kwargs)
+
+def generate(role, model, prompt, **kwargs):
+    return call("generate", role, model, prompt=prompt, **kwargs)
+
+def embed(model, input, **kwargs):
+    return call("embed", "embedding", model, input=input, **kwargs)
@@ -0,0 +1,135 @@
+import math
+import os
+import threading
+import time
+
+# Latency buckets (seconds) of model calls and of external HTTP tool calls
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Metric:
+    """A labelled metric in the Prometheus text exposition format."""
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes the labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+    def samples(self):
+        with self.lock:
+            return [(self.name + self.label_text(key), value) for key, value in sorted(self.values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name} {format_value(value)}" for name, value in self.samples()]
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LLM_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket" + self.label_text(key, [("le", format_value(bound))]), count))
+                samples.append((f"{self.name}_sum" + self.label_text(key), total))
+                samples.append((f"{self.name}_count" + self.label_text(key), counts[-1]))
+        return samples
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+REGISTRY = []
+
+LLM_CALLS = Counter("mars_llm_calls_total", "Model calls by role, model and outcome (ok, timeout, error).", ("role", "model", "outcome"))
+LLM_LATENCY = Histogram("mars_llm_call_seconds", "Latency of successful model calls.", ("role", "model"), LLM_BUCKETS)
+LLM_TOKENS = Counter("mars_llm_tokens_total", "Prompt and completion tokens reported by Ollama.", ("role", "model", "kind"))
+LLM_RETRIES = Counter("mars_llm_retries_total", "Model call attempts that were retried.", ("role", "model"))
+LLM_HEDGES = Counter("mars_llm_hedged_requests_total", "Duplicate (hedged) model requests sent.", ("role", "model"))
+CACHE_REQUESTS = Counter("mars_cache_requests_total", "Cache lookups by cache and result (hit, miss).", ("cache", "result"))
+PROMPT_TOKENS_SAVED = Counter("mars_prompt_tokens_saved_total", "Prompt-eval tokens saved by shared-prefix reuse.")
+MODEL_OPERATIONS = Counter("mars_model_operations_total", "Ollama model create and delete operations.", ("operation",))
+HTTP_REQUESTS = Counter("mars_http_requests_total", "External tool HTTP requests by host and status (or error).", ("host", "status"))
+HTTP_LATENCY = Histogram("mars_http_request_seconds", "Latency of external tool HTTP requests.", ("host",), HTTP_BUCKETS)
+CONTEXT_RELOADS = Counter("mars_context_reloads_total", "Model reloads caused by a larger context window.", ("model",))
+CONTEXT_TRUNCATIONS = Counter("mars_context_truncations_total", "Requests beyond the pinned context: truncation avoided by a larger window, or still truncated.", ("model", "outcome"))
+CASCADE_CALLS = Counter("mars_cascade_calls_total", "Tiered calls by role and tier: accepted, or escalated to the next tier.", ("role", "tier", "outcome"))
+SECTIONS_REVIEWED = Counter("mars_sections_reviewed_total", "Sections reviewed, by review depth.", ("depth",))
+SECTIONS_PER_MINUTE = Gauge("mars_sections_per_minute", "Sections reviewed per minute since the process started.")
+QUEUE_TASKS = Gauge("mars_queue_tasks", "Work queue tasks by status.", ("status",))
+SERVICE_JOBS = Gauge("mars_service_jobs", "Review service jobs by status.", ("status",))
+
+START_TIME = time.time()
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def section_reviewed(depth):
+    SECTIONS_REVIEWED.inc(depth=depth)
+    total = sum(SECTIONS_REVIEWED.values.values())
+    SECTIONS_PER_MINUTE.set(round(total / max((time.time() - START_TIME) / 60, 1e-9), 3))
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+def write_textfile(path):
+    """Dumps the metrics for the node_exporter textfile collector (written atomically)."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(temporary, path)
@@ -1,18 +1,22 @@
-import ollama
-from ollama import chat
-from ollama import ChatResponse
-import requests
 import re
 from bs4 import BeautifulSoup
+from util.transport import get_transport, WIKIPEDIA_URL
+from util.backends import get_pool
+from util.verdict import VERDICT_SCHEMA, STRUCTURED_INSTRUCTION, structured_options, parse_decision, parse_verdict
+from util.llm import chat, records_timeouts, is_timeout, ROLE_DEADLINES
+from util import tiers
 
 def isModelLoaded(model):
-    loaded_models = [model.model for model in ollama.list().models]
-    return model in loaded_models or f"{model}:latest" in loaded_models
-
-def consultWiki(question):
-    print(f"Searching Wikipedia for: {question}")
-    
-    search_url = "https://en.wikipedia.org/w/api.php"
+    """True if any healthy Ollama host of the backend pool has the model."""
+    for client in get_pool().clients(model):
+        loaded_models = [model.model for model in client.list().models]
+        if model in loaded_models or f"{model}:latest" in loaded_models:
+            return True
+    return False
+
+async def wiki_lookup(question):
+    """Top Wikipedia article for a question: title, first sentences and link (through the shared transport)."""
+    transport = get_transport()
     search_params = {
         "action": "query",
         "format": "json",
@@ -21,19 +25,19 @@ def consultWiki(question):
         "srlimit": 1,
     }
 
-    response = requests.get(search_url, params=search_params)
+    response = await transport.request("GET", f"{WIKIPEDIA_URL}/w/api.php", params=search_params)
     if response.status_code == 200:
         data = response.json()
         search_results = data.get("query", {}).get("search", [])
 
         if search_results:
             top_result = search_results[0]["title"]
-            page_url = f"https://en.wikipedia.org/wiki/{top_result.replace(' ', '_')}"
+            page_url = f"{WIKIPEDIA_URL}/wiki/{top_result.replace(' ', '_')}"
             print(f"Fetching full content from: {page_url}")
 
             # Fetch the full page HTML
-            html_url = f"https://en.wikipedia.org/api/rest_v1/page/html/{top_result.replace(' ', '_')}"
-            html_response = requests.get(html_url)
+            html_url = f"{WIKIPEDIA_URL}/api/rest_v1/page/html/{top_result.replace(' ', '_')}"
+            html_response = await transport.request("GET", html_url)
 
             if html_response.status_code == 200:
                 soup = BeautifulSoup(html_response.text, "html.parser")
@@ -48,13 +52,34 @@ def consultWiki(question):
                 return f"**{top_result}**\n{summary}...\n[Read more]({page_url})"
     
     return "No results found on Wikipedia. Try using simpler keywords."
+
+def consultWiki(question):
+    print(f"Searching Wikipedia for: {question}")
+    return get_transport().run(wiki_lookup(question))
     
-def consultAgent(agent, question):
+def consultAgent(agent, question, structured=False):
+    # With tiering, role agents are asked smallest tier first (see util/tiers.py)
+    if tiers.enabled(agent):
+        return tiers.cascade(agent, lambda model: askAgent(model, question, structured, agent))
+    return askAgent(agent, question, structured)
+
+@records_timeouts
+def askAgent(agent, question, structured=False, role=None):
     # print("Consulting agent", agent, "with question", question)
     if not isModelLoaded(agent):
         print(f"Model {agent} not found")
         return
-    response: ChatResponse = chat(model=agent, messages=[
+    # Paper-specific models answer Stage 2 questions
+    role = role or (agent if agent in ROLE_DEADLINES else "answer")
+    if structured:
+        response = chat(role, agent, [
+            {
+                'role': 'user',
+                'content': question + "\n\n" + STRUCTURED_INSTRUCTION,
+            },
+        ], format=VERDICT_SCHEMA, options=structured_options(role))
+        return parse_verdict(response.message.content)
+    response = chat(role, agent, [
         {
             'role': 'user',
             'content': question,
@@ -62,10 +87,15 @@ def consultAgent(agent, question):
     ])
     return response.message.content
 
-def consultDeskReviewer(abstract):
-    desk_review = consultAgent('deskreviewer', abstract)
+def consultDeskReviewer(abstract, structured=False):
+    desk_review = consultAgent('deskreviewer', abstract, structured)
     print(desk_review)
-    return 'accept' in desk_review.lower(), desk_review
+    if is_timeout(desk_review):
+        # No verdict: neither accept nor reject the paper on a timeout
+        return None, desk_review
+    if structured:
+        return desk_review['decision'] == 'Accept', desk_review
+    return parse_decision(desk_review) is True, desk_review
 
 def consultReviewer1(abstract):
     review = consultAgent('reviewer1', abstract)
@@ -88,16 +118,17 @@ def consultPaperSpecificModels(model, question):
 def consultQuestioner(text):
     return consultAgent('questioner', text)
 
-def consultGrammar(text):
-    return consultAgent('grammar', text)
+def consultGrammar(text, structured=False):
+    return consultAgent('grammar', text, structured)
 
 def consultTest(text):
     return consultAgent('test', text)
 
-def consultNovelty(text):
-    return consultAgent('novelty', text)
+def consultNovelty(text, structured=False):
+    return consultAgent('novelty', text, structured)
 
-def consultFactChecker(text):
+@records_timeouts
+def consultFactChecker(text, structured=False):
     tool_config = {
         "name": "consultWiki",
         "type": "function",
@@ -120,11 +151,15 @@ def consultFactChecker(text):
     retries = 3  # Set a max retry limit
     query = text
 
-    response = chat(model='factchecker', messages=[{'role': 'user', 'content': "Do you need more facts? Only say yes or no. \n " + query}])
+    if structured:
+        # Structured mode skips the Wikipedia round trips and asks for the verdict directly.
+        return consultAgent('factchecker', "Do you accept the claims? \n " + query, structured=True)
+
+    response = chat('factchecker', 'factchecker', [{'role': 'user', 'content': "Do you need more facts? Only say yes or no. \n " + query}])
     if 'yes' in response.message.content.lower():
         
         for attempt in range(retries):
-            response = chat(model='factchecker', messages=[{'role': 'user', 'content': query}], tools=[tool_config])
+            response = chat('factchecker', 'factchecker', [{'role': 'user', 'content': query}], tools=[tool_config])
             
             print("Attempt number", attempt + 1)
 
@@ -149,10 +184,7 @@ def consultFactChecker(text):
         print("Could not retrieve relevant information from Wikipedia after multiple attempts.")
         return None
     else:
-        response = chat(model='factchecker', messages=[{'role': 'user', 'content': "Do you accept the claims? Say 'Accept' if yes and 'Reject' if no. \n " + query}])
-        return response.message.content
-
-available_models = [model.model for model in ollama.list().models]
+        return consultAgent('factchecker', "Do you accept the claims? Say 'Accept' if yes and 'Reject' if no. \n " + query)
 
 available_functions = {
     'consultWiki': consultWiki,
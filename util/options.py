@@ -0,0 +1,105 @@
+import os
+import argparse
+from util.defaults import RETRIES, HEDGE_PERCENTILE, COMBINED_MODEL, ROUTE_MODEL, DEFAULT_TOP_K, LEXICAL_THRESHOLD, MIN_CONFIDENCE
+from util.prune import PRUNE_POLICIES, MIN_WORDS, SIMILARITY_THRESHOLD
+
+# Constants
+MODELS = ["mistral", "llama3.2", "qwen2.5", "deepseek-r1"]
+CHECKPOINT_FILE = "feedback_collab.json"
+ANSWER_FILE = "feedback_collab_with_answers.json"
+MODEL_LIST_FILE = "paper_specific_models.txt"
+
+# Options that configure the process (model call policy, Ollama hosts) rather than one review
+PROCESS_OPTIONS = {"call_deadline", "call_retries", "hedge", "hedge_percentile", "max_tokens", "keep_alive", "backends", "metrics_file", "profile", "record", "replay", "replay_latency", "context_size", "tiering", "cascade_confidence"}
+
+# Options naming files on the machine that runs the review; a remote job cannot use the client's files
+PATH_OPTIONS = {"idf_file", "plan_output", "calibration"}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="MultiAgent Paper Review with Optional Q&A")
+    parser.add_argument("url", type=str, help="Path to the Conference CFP")
+    parser.add_argument("pdf_path", type=str, help="Path to the PDF file")
+    parser.add_argument("section_name", type=str, nargs='?', default='', help="Optional: specific paper section for review")
+    parser.add_argument("--answer-questions", action="store_true", help="Enable answering questions in the second stage")
+    parser.add_argument("--stream", action="store_true", help="Parse the PDF page by page in parallel and review each section as soon as it is parsed")
+    parser.add_argument("--pdf-workers", type=int, default=None, help="Processes used to extract PDF pages with --stream (default: CPU count)")
+    parser.add_argument("--idf-file", type=str, default=None, help="IDF table (python -m util.extract_keywords) used to pick novelty search keywords")
+    parser.add_argument("--prune", choices=PRUNE_POLICIES, default="off", help="Skip or merge empty, reference-only and near-duplicate sections before review")
+    parser.add_argument("--prune-min-words", type=int, default=MIN_WORDS, help="Sections with fewer words count as empty")
+    parser.add_argument("--prune-similarity", type=float, default=SIMILARITY_THRESHOLD, help="MinHash similarity above which a section is a near-duplicate")
+    parser.add_argument("--structured", action="store_true", help="Agents return compact {decision, confidence, rationale} verdicts")
+    parser.add_argument("--desk-gate", action="store_true", help="Desk review the abstract first and stop if the paper is out of scope")
+    parser.add_argument("--force-full-review", action="store_true", help="With --desk-gate, review every section even after a desk reject")
+    parser.add_argument("--check-mode", choices=["agents", "shared-prefix", "combined"], default=os.environ.get("MARS_CHECK_MODE", "agents"),
+                        help="How the test/grammar/novelty/fact/questioner checks are run (default: $MARS_CHECK_MODE or agents)")
+    parser.add_argument("--fact-check", choices=["agent", "claims"], default="agent",
+                        help="agent: the fact checker agent (with its Wikipedia tool); claims: extract claims, look them up concurrently and adjudicate once")
+    parser.add_argument("--combined-model", type=str, default=COMBINED_MODEL, help="Model answering all checks in --check-mode combined")
+    parser.add_argument("--adaptive-reviewers", action="store_true", help="Stop issuing reviewers once they reach consensus")
+    parser.add_argument("--reviewer-order", type=str, default=",".join(MODELS), help="Comma separated order in which reviewer models are issued")
+    parser.add_argument("--consensus-k", type=int, default=2, help="Number of agreeing reviewers needed for an early exit")
+    parser.add_argument("--consensus-confidence", type=float, default=0.8, help="Minimum confidence of each agreeing verdict (structured mode)")
+    parser.add_argument("--budget-calls", type=int, default=None, help="Cap on LLM calls for the paper; low-value sections get a light review or none")
+    parser.add_argument("--budget-tokens", type=int, default=None, help="Cap on estimated prompt + completion tokens for the paper")
+    parser.add_argument("--budget-seconds", type=float, default=None, help="Cap on estimated model time (seconds) for the paper")
+    parser.add_argument("--light-model", type=str, default="llama3.2", help="Single reviewer used for light (budget-limited) section reviews")
+    parser.add_argument("--plan", action="store_true", help="Dry run: list every model call the run would make with token and time estimates, then exit")
+    parser.add_argument("--plan-output", type=str, default=None, help="With --plan, also write the call list and totals to this JSON file")
+    parser.add_argument("--route-top-k", type=int, default=DEFAULT_TOP_K, help="Stage 2 sends each question to the k most relevant section models (0: all models)")
+    parser.add_argument("--route-model", type=str, default=ROUTE_MODEL, help="Ollama embedding model used to route Stage 2 questions")
+    parser.add_argument("--question-similarity", type=float, default=LEXICAL_THRESHOLD, help="Word overlap above which Stage 2 questions are answered once (1.0: exact duplicates only)")
+    parser.add_argument("--call-deadline", type=float, default=None, help="Seconds any model call may take (default: per-role deadlines)")
+    parser.add_argument("--call-retries", type=int, default=RETRIES, help="Retries of a model call that timed out or hit a server error")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate request when a call runs longer than --hedge-percentile of recent latencies")
+    parser.add_argument("--hedge-percentile", type=float, default=HEDGE_PERCENTILE, help="Latency percentile that triggers a hedged request")
+    parser.add_argument("--max-tokens", type=int, default=None, help="num_predict cap of every model call (default: uncapped)")
+    parser.add_argument("--keep-alive", type=str, default=None, help="How long Ollama keeps models loaded after a call (e.g. 30m; default: Ollama's own setting)")
+    parser.add_argument("--context-size", choices=["auto", "pinned"], default="auto",
+                        help="auto: size num_ctx to each request (smallest bucket fitting the prompt and completion); pinned: every model at 4096")
+    parser.add_argument("--tiering", action="store_true",
+                        help="Route each role to its smallest model tier and escalate to a larger model only on a low-confidence or invalid answer")
+    parser.add_argument("--cascade-confidence", type=float, default=MIN_CONFIDENCE,
+                        help="With --tiering, structured confidence below which a verdict is escalated to the next tier")
+    parser.add_argument("--backends", type=str, default=None,
+                        help="Ollama hosts to spread calls over: comma separated URLs, or a JSON file mapping each host to its models (default: $MARS_OLLAMA_HOSTS or the local Ollama)")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                        help="Write Prometheus metrics (model calls, latencies, tokens, caches, tool calls) to this file on exit, for the node_exporter textfile collector")
+    parser.add_argument("--profile", type=str, nargs="?", const="profile", default=None,
+                        help="Profile CPU time and allocations per pipeline stage and write folded stacks and a stage summary to this directory (default: profile)")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", type=str, default=None, metavar="CASSETTE",
+                          help="Record every Ollama and external HTTP exchange of the run to this cassette file")
+    cassette.add_argument("--replay", type=str, default=None, metavar="CASSETTE",
+                          help="Serve the Ollama and external HTTP exchanges from a recorded cassette instead of the network")
+    parser.add_argument("--replay-latency", choices=["zero", "recorded"], default="zero", help="Answer replayed requests at once or after their recorded time")
+    parser.add_argument("--calibration", type=str, default=None, help="Throughput calibration file (results/scripts/calibrate.py) for time estimates")
+    return parser
+
+def check_options(args, tiering=False):
+    """Raises ValueError for options a review cannot combine; tiering is the process-wide --tiering."""
+    if tiering and args.adaptive_reviewers:
+        raise ValueError("--adaptive-reviewers cannot be combined with --tiering: both decide which reviewers are called")
+
+def job_args(url, pdf_path, options=None):
+    """
+    Review options of a job: options (keys as flag names, with dashes or underscores)
+    are checked by the command line parser. Raises ValueError for unknown or invalid options.
+    """
+    parser = build_parser()
+    parser.exit_on_error = False
+    defaults = parser.parse_args([url, pdf_path])
+    argv = [url, pdf_path]
+    for key, value in (options or {}).items():
+        key = key.lstrip("-").replace("-", "_")
+        if key in ("url", "pdf_path") or not hasattr(defaults, key):
+            raise ValueError(f"Unknown option: {key}")
+        if key == "section_name":
+            argv.insert(2, str(value))
+        elif isinstance(getattr(defaults, key), bool):
+            argv += [f"--{key.replace('_', '-')}"] if value else []
+        elif value is not None:
+            argv += [f"--{key.replace('_', '-')}", str(value)]
+    try:
+        return parser.parse_args(argv)
+    except argparse.ArgumentError as e:
+        raise ValueError(str(e))
@@ -0,0 +1,566 @@
+import os
+import json
+import time
+import atexit
+from functools import lru_cache
+from util import llm, backends, metrics, profiling, cassette, tiers
+from util.review_collab import (
+    parse_pdf_to_text, clean_text, extract_section,
+    split_text_into_sections, stream_sections, reviewer_agent, summarizer,
+    fancy_aggregate_reviews
+)
+from util.build_models import generate_base_models, generate_paper_models, generate_desk_reviewer, paper_model_key
+from util.multiagent import (
+    consultGrammar as consult_grammar,
+    consultNovelty as consult_novelty,
+    consultFactChecker as fact_checker,
+    consultQuestioner as consult_question,
+    consultTest as consult_test,
+    consultDeskReviewer as consult_desk_reviewer
+)
+from util.reviewer import assigned_reviewers
+from util.verdict import verdict_text
+from util.consensus import adaptive_reviews, is_skipped
+from util.shared_prefix import shared_prefix_checks, CHECK_ROLES
+from util.combined_checks import combined_checks
+from util.factcheck import claim_fact_check
+from util.extract_keywords import KeywordEngine
+from util.incremental import section_hash, diff_sections
+from util.prune import SectionPruner
+from util.budget import plan_review_depth, call_cost, estimate_tokens, INSTRUCTION_TOKENS, Calibration, DEFAULT_CALIBRATION
+from util.plan import TokenCounter, enumerate_calls, summarize_calls, print_plan, over_budget
+from util.routing import QuestionRouter
+from util.questions import parse_questions, cluster_questions
+from util.options import MODELS, CHECKPOINT_FILE, ANSWER_FILE, MODEL_LIST_FILE
+from util.context_size import sizer, print_report as print_context_report
+
+def configure_process(args):
+    """Applies the process-wide options: the cassette, the model call policy, the model tiers, the Ollama hosts and the metrics dump."""
+    cassette.configure(args.record, args.replay, args.replay_latency)
+    tiers.configure(args.tiering, args.cascade_confidence)
+    if args.metrics_file:
+        atexit.register(metrics.write_textfile, args.metrics_file)
+    llm.configure(deadline=args.call_deadline, retries=args.call_retries, hedge=args.hedge,
+                  hedge_percentile=args.hedge_percentile, max_tokens=args.max_tokens, keep_alive=args.keep_alive,
+                  context_size=args.context_size)
+    return backends.configure(args.backends)
+
+@lru_cache(maxsize=None)
+def load_keyword_engine(path):
+    """IDF table, loaded once per process."""
+    return KeywordEngine.load(path)
+
+@lru_cache(maxsize=None)
+def load_calibration(path):
+    return Calibration.load(path)
+
+def read_paper(path):
+    """(heading, text) sections and the abstract (None for PDFs) of a sectioned paper JSON or a PDF."""
+    if path.endswith(".pdf"):
+        with profiling.stage("pdf extract"):
+            pdf_text = parse_pdf_to_text(path)
+        with profiling.stage("clean and split"):
+            cleaned_text = clean_text(pdf_text)
+            return split_text_into_sections(cleaned_text), None
+    sections = []
+    abstract_text = None
+    with open(path, "r", encoding="utf-8") as f, profiling.stage("paper json load"):
+        data = json.load(f)
+    if "input" in data and "sections" in data["input"]:
+        sections = [(s["heading"], s["text"]) for s in data["input"]["sections"]]
+    if "input" in data:
+        abstract_text = data["input"].get("abstractText")
+    return sections, abstract_text
+
+def desk_gate_text(sections, abstract_text=None):
+    """Text the desk reviewer judges: the abstract if available, else the first section."""
+    if abstract_text:
+        return abstract_text
+    for heading, text in sections:
+        if "abstract" in heading.lower():
+            return text
+    return sections[0][1]
+
+def questioner_check(text):
+    """Questioner output of a section; "" on a timeout, as in the shared-prefix and combined modes."""
+    questions = consult_question(text)
+    return "" if llm.is_timeout(questions) else questions
+
+# Check key -> function(section_text, args) of the agents check mode
+CHECK_AGENTS = {
+    "Test": lambda text, args: consult_test(text),
+    "Grammar Check": lambda text, args: consult_grammar(text, args.structured),
+    "Novelty Check": lambda text, args: consult_novelty(text, args.structured),
+    "Fact Check": lambda text, args: fact_checker(text, args.structured) if args.fact_check == "agent" else None,
+    "Questioner": lambda text, args: questioner_check(text),
+}
+
+def run_checks(section_text, args, keys=None):
+    """
+    Test, grammar, novelty, fact and questioner checks of a section in args.check_mode.
+
+    In the agents mode, keys limits the checks to some of CHECK_AGENTS. The claim-level
+    fact check (args.fact_check == "claims") runs with the Fact Check key, in place of
+    the fact checker agent or shared-prefix role.
+    """
+    claims = args.fact_check == "claims" and (keys is None or "Fact Check" in keys)
+    if args.check_mode == "shared-prefix":
+        checks = shared_prefix_checks(section_text, args.structured,
+                                      keys=[key for key in CHECK_ROLES if key != "Fact Check"] if claims else None)
+    elif args.check_mode == "combined":
+        checks = combined_checks(section_text, args.structured, args.combined_model)
+    else:
+        checks = {key: check(section_text, args) for key, check in CHECK_AGENTS.items() if keys is None or key in keys}
+    if claims:
+        checks["Fact Check"], checks["Fact Check Claims"] = claim_fact_check(section_text, args.structured)
+    return checks
+
+def desk_entry(desk_review, tiering=False):
+    """DeskReviewer entry of an (accept, review) desk review; with tiering, its cascade records."""
+    entry = {"Review": desk_review[1], "Accept": desk_review[0]}
+    if tiering:
+        entry["Cascade"] = tiers.drain_log()
+    return entry
+
+def full_review(review_outputs, checks, aggregated_review, final_summary):
+    """Section Reviews entry of a fully reviewed section."""
+    review = {
+        "Review Depth": "full",
+        "Test": checks["Test"],
+        "Reviewers": review_outputs,
+        "Grammar Check": checks["Grammar Check"],
+        "Novelty Check": checks["Novelty Check"],
+        "Fact Check": checks["Fact Check"],
+        "Questioner": checks["Questioner"],
+        "Final Summary": aggregated_review + "\n" + verdict_text(final_summary)
+    }
+    for key in ("Prompt Reuse", "Fact Check Claims"):
+        if key in checks:
+            review[key] = checks[key]
+    return review
+
+def review_paper(args, workdir=".", emit=None):
+    """
+    Reviews a paper (Stage 1) and, with args.answer_questions, answers the questions (Stage 2).
+
+    The checkpoint, answer and model list files are kept in workdir. emit(event, data)
+    is called as results become available: "sections", "plan", "desk", "section"
+    (one per reviewed section) and "answers" (one per answered question).
+    Returns the exit status (1 when a --plan run exceeds the budget, else 0).
+    """
+    emit = emit or (lambda event, data: None)
+    # Set for the process (the service's --tiering), not per job
+    tiering = tiers.tiering.enabled
+    tiers.drain_log()  # cascade records of an earlier job
+    checkpoint_file = os.path.join(workdir, CHECKPOINT_FILE)
+    model_list_file = os.path.join(workdir, MODEL_LIST_FILE)
+
+    budget = {"calls": args.budget_calls, "tokens": args.budget_tokens, "seconds": args.budget_seconds}
+    review_plan = {}
+    calibration = load_calibration(args.calibration) if args.calibration else DEFAULT_CALIBRATION
+
+    # ---- Stage 1: Review Paper Sections ----
+
+    # Parse and clean the PDF text
+    abstract_text = None
+    streaming = args.stream and args.pdf_path.endswith(".pdf")
+    if streaming and (args.plan or any(limit is not None for limit in budget.values())):
+        # Sections are planned against each other, so the whole paper must be parsed first.
+        print("\nPlanning needs every section up front; parsing the PDF without --stream.")
+        streaming = False
+    if streaming:
+        # Sections are appended as the stream produces them; the first one is needed up front.
+        section_stream = stream_sections(args.pdf_path, args.pdf_workers)
+        sections = [section for section in [next(section_stream, None)] if section]
+    else:
+        sections, abstract_text = read_paper(args.pdf_path)
+
+    if streaming:
+        print("\nStreaming sections from the PDF; each section is reviewed as soon as it is parsed.")
+    else:
+        print("\nAvailable Sections in the Paper:")
+        for section in sections:
+            print(f"- {section[0]}")
+        emit("sections", {"Sections": [s[0] for s in sections]})
+
+    if not sections:
+        print("\nNo sections found in the paper. Exiting.")
+        return 0
+
+    # Pre-review pruning of low-value sections (fed incrementally when streaming)
+    pruner = SectionPruner(args.prune, args.prune_min_words, args.prune_similarity)
+    with profiling.stage("prune"):
+        review_sections = [] if streaming else [kept for s in sections for kept in pruner.add(*s)] + pruner.flush()
+    if pruner.pruned:
+        print("\nPruned sections:")
+        for name, info in pruner.pruned.items():
+            print(f"- {name}: {info['Reason']} ({info['Action']})")
+
+    # Load checkpoint if available
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            checkpoint_data = json.load(f)
+            all_section_reviews = checkpoint_data.get("Section Reviews", {})
+        processed_sections = set(all_section_reviews.keys())
+        section_hashes = checkpoint_data.get("Section Hashes", {})
+        desk_review_hash = checkpoint_data.get("Desk Review Hash")
+        print(f"\nFound checkpoint. Processed sections: {', '.join(processed_sections) if processed_sections else 'None'}")
+    else:
+        all_section_reviews = {}
+        processed_sections = set()
+        section_hashes = {}
+        desk_review_hash = None
+
+    # Incremental re-review: only sections whose content changed since the checkpoint are reviewed again
+    revision = None
+    if section_hashes and not streaming:
+        revision = diff_sections(review_sections, section_hashes, processed_sections)
+        for name in revision["Changed"] + revision["Removed"]:
+            all_section_reviews.pop(name, None)
+            processed_sections.discard(name)
+            if name in revision["Removed"]:
+                section_hashes.pop(name, None)
+        print(f"\nRevision: {len(revision['Changed'])} changed, {len(revision['Unchanged'])} unchanged (carried forward), "
+              f"{len(revision['New'])} new, {len(revision['Removed'])} removed sections.")
+
+    def needs_review(section_name, section_text):
+        """True unless the section has a review made on the same content (or on unknown content, for old checkpoints)."""
+        if section_name not in processed_sections:
+            return True
+        return section_name in section_hashes and section_hashes[section_name] != section_hash(section_text)
+
+    def desk_review_current(text):
+        """True if the stored desk review judged this text (or predates content hashes)."""
+        if "DeskReviewer" not in all_section_reviews:
+            return False
+        return desk_review_hash is None or desk_review_hash == section_hash(text)
+
+    # Both the --desk-gate review and the one made with the first full section judge this text
+    desk_text = desk_gate_text(sections, abstract_text)
+
+    # Checkpointing function
+    def checkpoint_progress():
+        feedback = {
+            "Available Sections": [s[0] for s in sections],
+            "Section Reviews": all_section_reviews,
+            "Section Hashes": section_hashes,
+            "Desk Review Hash": desk_review_hash
+        }
+        if revision:
+            feedback["Revision"] = revision
+        if review_plan:
+            feedback["Review Plan"] = review_plan
+        if pruner.pruned:
+            feedback["Pruned Sections"] = pruner.pruned
+        with open(checkpoint_file, "w", encoding="utf-8") as f, profiling.stage("checkpoint write"):
+            json.dump(feedback, f, indent=4, ensure_ascii=False)
+        print(f"\nCheckpoint saved to {checkpoint_file}.")
+
+    # Determine sections to process
+    if args.section_name:
+        if args.section_name in processed_sections:
+            print(f"\nSection '{args.section_name}' is already processed. Exiting.")
+            return 0
+        sections_to_process = [args.section_name]
+    else:
+        sections_to_process = [s[0] for s in review_sections if s[0] not in processed_sections]
+
+    if not sections_to_process and not streaming:
+        if revision and revision["Removed"]:
+            checkpoint_progress()
+        print("\nNo new sections to process. Exiting.")
+        return 0
+
+    # Novelty search keywords for every known section, ranked by TF-IDF against the corpus
+    keyword_engine = load_keyword_engine(args.idf_file) if args.idf_file else None
+    section_keywords = {}
+    if keyword_engine:
+        with profiling.stage("keywords"):
+            section_keywords = dict(zip([s[0] for s in review_sections], keyword_engine.keywords_for_sections([s[1] for s in review_sections])))
+
+    # Budget-aware depth: full reviews for the most valuable sections, light single-agent reviews for the rest
+    if any(limit is not None for limit in budget.values()):
+        section_texts = {**dict(sections), **dict(review_sections)}
+        planned = [(name, section_texts[name]) for name in sections_to_process if name in section_texts]
+        reserved = None if desk_review_current(desk_text) else call_cost(estimate_tokens(desk_text) + INSTRUCTION_TOKENS, calibration=calibration)
+        num_reviewers = len([m for m in args.reviewer_order.split(",") if m.strip()]) if args.adaptive_reviewers else len(MODELS)
+        review_plan = plan_review_depth(planned, budget, num_reviewers, args.check_mode, keyword_engine, reserved, calibration,
+                                        args.structured, args.fact_check)
+        print("\nReview plan:")
+        for name, plan in review_plan.items():
+            print(f"- {name}: {plan['Depth']} (value {plan['Value']}, ~{plan['Estimated Cost']['calls']} calls)")
+        emit("plan", {"Review Plan": review_plan})
+
+    # Dry run: enumerate the model calls of this run (nothing is sent to a model)
+    if args.plan:
+        section_texts = {**dict(sections), **dict(review_sections)}
+        known_questions = {name: len(parse_questions(review.get("Questioner", "")))
+                           for name, review in all_section_reviews.items() if isinstance(review, dict) and "Questioner" in review}
+        options = {
+            "reviewers": [m.strip() for m in args.reviewer_order.split(",") if m.strip()] if args.adaptive_reviewers else MODELS,
+            "light_model": args.light_model,
+            "check_mode": args.check_mode,
+            "combined_model": args.combined_model,
+            "fact_check": args.fact_check,
+            "structured": args.structured,
+            "desk_text": None if desk_review_current(desk_text) else desk_text,
+            "answer_questions": args.answer_questions,
+            "paper_models": [(paper_model_key(name), text) for name, text in review_sections],
+            "questions": known_questions,
+            "route_top_k": args.route_top_k,
+            "route_model": args.route_model,
+        }
+        planned_sections = [(name, section_texts[name]) for name in sections_to_process if name in section_texts]
+        depths = {name: plan["Depth"] for name, plan in review_plan.items()}
+        counter = TokenCounter(calibration)
+        calls = enumerate_calls(planned_sections, depths, options, counter, calibration)
+        totals = summarize_calls(calls)
+        if counter.unavailable:
+            totals["Unavailable Tokenizers"] = counter.unavailable
+        print_plan(calls, totals)
+        if args.plan_output:
+            with open(args.plan_output, "w", encoding="utf-8") as f:
+                json.dump({"Calls": calls, "Totals": totals, "Review Plan": review_plan}, f, indent=4, ensure_ascii=False)
+            print(f"Plan saved to {args.plan_output}")
+        exceeded = over_budget(totals, budget)
+        emit("plan", {"Calls": calls, "Totals": totals, "Review Plan": review_plan, "Exceeded": exceeded})
+        if exceeded:
+            print(f"\nThe planned run exceeds the budget: {exceeded}")
+            return 1
+        return 0
+
+    # ---- Desk review gate ----
+
+    if args.desk_gate:
+        if not desk_review_current(desk_text):
+            with profiling.stage("desk review"):
+                generate_desk_reviewer(args.url)
+                desk_review = consult_desk_reviewer(desk_text, args.structured)
+            all_section_reviews["DeskReviewer"] = desk_entry(desk_review, tiering)
+            desk_review_hash = section_hash(desk_text)
+            checkpoint_progress()
+            emit("desk", all_section_reviews["DeskReviewer"])
+
+        if all_section_reviews["DeskReviewer"]["Accept"] is False:
+            if not args.force_full_review:
+                print("\nDesk reviewer rejected the paper as out of scope. Skipping section reviews (use --force-full-review to review anyway).")
+                return 0
+            print("\nDesk reviewer rejected the paper; continuing with a full review (--force-full-review).")
+
+    def review_queue():
+        """Yields (section name, text) pairs to review, pulling from the PDF stream when streaming."""
+        if not streaming:
+            section_texts = {**dict(sections), **dict(review_sections)}
+            for section_name in sections_to_process:
+                if section_name in section_texts:
+                    yield section_name, section_texts[section_name]
+                elif args.pdf_path.endswith(".pdf"):
+                    yield section_name, extract_section(args.pdf_path, section_name)
+                else:
+                    print(f"\nSection '{section_name}' not found. Skipping.")
+            return
+
+        index = 0
+        while True:
+            if index == len(sections):
+                section = next(section_stream, None)
+                if section is None:
+                    break
+                sections.append(section)
+            section_name, section_text = sections[index]
+            index += 1
+            print(f"\nParsed section: {section_name}")
+            yield from review_ready(pruner.add(section_name, section_text))
+        yield from review_ready(pruner.flush())
+
+    def review_ready(ready_sections):
+        """Streaming: provisions each section that survived pruning and yields it if it needs a review."""
+        for section_name, section_text in ready_sections:
+            review_sections.append((section_name, section_text))
+            paper_specific_models.extend(generate_paper_models([(section_name, section_text)]))
+            if not needs_review(section_name, section_text):
+                continue
+            if args.section_name and args.section_name.lower() not in section_name.lower():
+                continue
+            yield section_name, section_text
+
+    # Generate paper-specific models (created as sections arrive when streaming)
+    with profiling.stage("provision models"):
+        paper_specific_models = [] if streaming else generate_paper_models(review_sections)
+
+    start_time = time.time()
+    for section_name, section_text in review_queue():
+        print(f"\n\nProcessing section: {section_name}")
+        
+        print("\n🔍 **Extracted Section:**")
+        print(section_text[:1000])
+
+        depth = review_plan.get(section_name, {}).get("Depth", "full")
+        if depth == "skipped":
+            print(f"\nSkipping {section_name}: outside the review budget.")
+            continue
+        if depth == "light":
+            print(f"\n📢 **Light review of {section_name} by {args.light_model} (review budget):**\n")
+            with profiling.stage("reviewers"):
+                review = reviewer_agent(assigned_reviewers[0], section_text, args.light_model, structured=args.structured)
+            all_section_reviews[section_name] = {
+                "Review Depth": "light",
+                "Reviewers": {args.light_model: review},
+                "Final Summary": verdict_text(review)
+            }
+            section_hashes[section_name] = section_hash(section_text)
+            metrics.section_reviewed("light")
+            checkpoint_progress()
+            emit("section", {"Section": section_name, "Review": all_section_reviews[section_name]})
+            continue
+
+        keywords = None
+        if keyword_engine:
+            keywords = section_keywords.get(section_name) or keyword_engine.keywords(section_text)
+        with profiling.stage("provision models"):
+            similar_paper_data = generate_base_models(args.url, section_text, keywords)
+       
+        tiers.drain_log()  # only this section's calls go into its Cascade entry
+        print(f"\n📢 **Reviewers Begin Discussion for {section_name}:**\n")
+        with profiling.stage("reviewers"):
+            if args.adaptive_reviewers:
+                reviewer_order = [m.strip() for m in args.reviewer_order.split(",") if m.strip()]
+                review_outputs = adaptive_reviews(
+                    lambda model: reviewer_agent(assigned_reviewers[0], section_text, model, structured=args.structured),
+                    reviewer_order, args.consensus_k, args.consensus_confidence
+                )
+            elif tiering:
+                review_outputs = tiers.cascade_reviews(
+                    lambda model: reviewer_agent(assigned_reviewers[0], section_text, model, structured=args.structured), MODELS
+                )
+            else:
+                reviews = llm.fan_out(lambda model: reviewer_agent(assigned_reviewers[0], section_text, model, structured=args.structured), MODELS)
+                review_outputs = dict(zip(MODELS, reviews))
+
+        with profiling.stage("aggregate"):
+            aggregated_review = fancy_aggregate_reviews([verdict_text(r) for r in review_outputs.values() if not is_skipped(r)])
+        with profiling.stage("summarizer"):
+            if tiering:
+                final_summary = tiers.cascade("summarizer", lambda model: summarizer(section_text, aggregated_review, model))
+            else:
+                final_summary = summarizer(section_text, aggregated_review)
+
+        # The desk review's cascade records go to its own entry, not the section's
+        cascade_log = tiers.drain_log()
+        if not desk_review_current(desk_text):
+            with profiling.stage("desk review"):
+                desk_review = consult_desk_reviewer(desk_text, args.structured)
+            all_section_reviews["DeskReviewer"] = desk_entry(desk_review, tiering)
+            desk_review_hash = section_hash(desk_text)
+            emit("desk", all_section_reviews["DeskReviewer"])
+
+        with profiling.stage("checks"):
+            checks = run_checks(section_text, args)
+        all_section_reviews[section_name] = full_review(review_outputs, checks, aggregated_review, final_summary)
+        if tiering:
+            all_section_reviews[section_name]["Cascade"] = cascade_log + tiers.drain_log()
+        section_hashes[section_name] = section_hash(section_text)
+        metrics.section_reviewed("full")
+
+        checkpoint_progress()
+        emit("section", {"Section": section_name, "Review": all_section_reviews[section_name]})
+
+    print("\nAll new sections processed. Final checkpoint saved.")
+    print(f"\nTotal time taken: {time.time() - start_time:.2f} seconds")
+    pool = backends.get_pool()
+    if len(pool.backends) > 1:
+        for host in pool.status():
+            print(f"{host['Host']}: {host['Calls']} calls, {'healthy' if host['Healthy'] else 'ejected'}")
+
+    with open(model_list_file, "w") as f:
+        for key in paper_specific_models:
+            f.write(f"{key}\n")
+
+    # ---- Stage 2: Answering Questions (Optional) ----
+
+    if args.answer_questions:
+        answer_questions(args, review_sections, workdir, emit)
+    if args.context_size == "auto" and sizer.loaded:
+        print_context_report(sizer.report(lambda model: next(iter(pool.clients(model)), None)))
+    return 0
+
+def answer_questions(args, review_sections, workdir=".", emit=None):
+    """Stage 2: answers each section's questions with the paper-specific models of the most relevant sections."""
+    emit = emit or (lambda event, data: None)
+    checkpoint_file = os.path.join(workdir, CHECKPOINT_FILE)
+    answer_file = os.path.join(workdir, ANSWER_FILE)
+    model_list_file = os.path.join(workdir, MODEL_LIST_FILE)
+
+    print("\nStarting Question-Answering Stage...")
+
+    with open(model_list_file, "r") as f:
+        paper_specific_models = [line.strip() for line in f if line.strip()]
+
+    with open(checkpoint_file, "r") as f:
+        feedback = json.load(f)
+
+    if "Answers" not in feedback:
+        feedback["Answers"] = {}
+
+    # Embed every section once; each question is then sent to the --route-top-k closest section models
+    router = None
+    if args.route_top_k:
+        paper_model_texts = {paper_model_key(name): text for name, text in review_sections}
+        with profiling.stage("question routing"):
+            router = QuestionRouter([(model, paper_model_texts.get(model, model)) for model in paper_specific_models], args.route_model)
+
+    # Parse every section's questions, then answer each cluster of near-identical questions once
+    pending = {}
+    for section_name, section_data in feedback["Section Reviews"].items():
+        if not isinstance(section_data, dict):
+            continue
+        questions = parse_questions(section_data.get("Questioner", ""))
+        answered = feedback["Answers"].get(section_name, {})
+        if section_name in feedback["Answers"] and all(q in answered for q in questions):
+            print(f"\nSkipping already processed section: {section_name}")
+            continue
+        pending[section_name] = [q for q in questions if q not in answered]
+        feedback["Answers"].setdefault(section_name, {})
+
+    all_questions = list(dict.fromkeys(q for questions in pending.values() for q in questions))
+    with profiling.stage("question routing"):
+        vectors = dict(zip(all_questions, router.embed_questions(all_questions))) if router and all_questions else None
+        clusters = cluster_questions(pending, args.question_similarity, vectors)
+    print(f"\n{sum(len(q) for q in pending.values())} questions from {len(pending)} sections, {len(clusters)} after deduplication.")
+    routes = None
+    if router and clusters:
+        with profiling.stage("question routing"):
+            routes = router.route([c["Question"] for c in clusters], args.route_top_k,
+                                  exclude=[[paper_model_key(s) for s, _ in c["Members"]] for c in clusters],
+                                  question_vectors=[vectors[c["Question"]] for c in clusters] if vectors else None)
+
+    start_time = time.time()
+    for i, cluster in enumerate(clusters):
+        print(f"Processing question: {cluster['Question']} (asked by {len(cluster['Members'])})")
+        asking = {paper_model_key(s) for s, _ in cluster["Members"]}
+        models = routes[i]["Models"] if routes else [m for m in paper_specific_models if m not in asking]
+        def answer(model):
+            try:
+                return llm.chat("answer", model, [{"role": "user", "content": cluster["Question"]}]).message.content.strip()
+            except llm.CallTimeout as e:
+                return e.record()
+        with profiling.stage("answers"):
+            answers = dict(zip(models, llm.fan_out(answer, models)))
+
+        # Fan the answers back out to every section that asked the question
+        for section_name, question in cluster["Members"]:
+            feedback["Answers"][section_name][question] = answers
+            routing = feedback["Answers"][section_name].setdefault("Routing", {
+                "Top K": args.route_top_k if router else None,
+                "Embedding": (router.embedding_model or "tf-idf") if router else None,
+                "Questions": {},
+            })
+            routing["Questions"][question] = {**(routes[i] if routes else {"Models": models}),
+                                              "Cluster": i, "Answered As": cluster["Question"]}
+            emit("answers", {"Section": section_name, "Question": question, "Answers": answers})
+
+        with open(answer_file, "w") as f, profiling.stage("checkpoint write"):
+            json.dump(feedback, f, indent=4)
+
+    print(f"\nAll questions answered in {time.time() - start_time:.2f} seconds")
+    print(f"Final answers saved to {answer_file}")
@@ -0,0 +1,210 @@
+from collections import defaultdict
+from util.budget import DEFAULT_CALIBRATION, estimate_tokens
+from util.verdict import ROLE_NUM_PREDICT, STRUCTURED_INSTRUCTION
+from util.build_models import paper_model_key
+from util.routing import ROUTE_MODEL
+
+# Hugging Face tokenizers matching the Ollama models (the role and paper-specific models are built from llama3.2).
+# The Meta and Mistral repos are gated, so their ungated copies are used.
+TOKENIZERS = {
+    "llama3.2": "unsloth/Llama-3.2-1B",
+    "mistral": "unsloth/mistral-7b-instruct-v0.3",
+    "qwen2.5": "Qwen/Qwen2.5-7B",
+    "deepseek-r1": "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
+}
+
+# Typical completion lengths (tokens) of the free-form outputs; the calibration file overrides them.
+COMPLETION_TOKENS = {
+    "reviewer": 450,
+    "summarizer": 400,
+    "deskreviewer": 150,
+    "test": 200,
+    "grammar": 250,
+    "novelty": 300,
+    "factchecker-probe": 5,
+    "factchecker": 250,
+    "claims": 250,
+    "questioner": 250,
+    "combined": 700,
+    "answer": 300,
+}
+
+# Prompt overhead (tokens) of the reviewer, summarizer and per-role templates around the section text
+TEMPLATE_TOKENS = {"reviewer": 250, "summarizer": 120, "combined": 420, "prefix": 50, "role": 20, "question": 25,
+                   "claims": 100, "evidence": 1200}
+
+def base_model(model):
+    """Ollama model whose weights (and throughput) a role or paper-specific model uses."""
+    return model if model in TOKENIZERS or model == ROUTE_MODEL else "llama3.2"
+
+class TokenCounter:
+    """Counts tokens with the tokenizer of each model, falling back to a word-based estimate."""
+
+    def __init__(self, calibration=DEFAULT_CALIBRATION):
+        self.calibration = calibration
+        self.tokenizers = {}
+
+    @property
+    def unavailable(self):
+        """Tokenizers that could not be loaded, whose counts are word-based estimates."""
+        return sorted(name for name, tokenizer in self.tokenizers.items() if tokenizer is None)
+
+    def tokenizer(self, model):
+        model = base_model(model)
+        name = self.calibration.model(model).get("tokenizer") or TOKENIZERS.get(model, TOKENIZERS["llama3.2"])
+        if name not in self.tokenizers:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizers[name] = AutoTokenizer.from_pretrained(name)
+            except Exception as e:
+                print(f"Tokenizer {name} unavailable ({type(e).__name__}); estimating tokens from word counts.")
+                self.tokenizers[name] = None
+        return self.tokenizers[name]
+
+    def count(self, model, text):
+        tokenizer = self.tokenizer(model)
+        if tokenizer is None:
+            return estimate_tokens(text)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+def completion_tokens(role, structured, calibration):
+    if structured and role in ROLE_NUM_PREDICT:
+        return ROLE_NUM_PREDICT[role]
+    return calibration.completion_tokens(role, COMPLETION_TOKENS.get(role, COMPLETION_TOKENS["reviewer"]))
+
+def enumerate_calls(sections, depths, options, counter, calibration=DEFAULT_CALIBRATION):
+    """
+    Lists every model call a run would make, without making any.
+
+    Args:
+        sections (list): (name, text) pairs to be reviewed in this run.
+        depths (dict): Section name -> "full", "light" or "skipped" (missing means full).
+        options (dict): Run settings: "reviewers", "light_model", "check_mode", "combined_model",
+            "fact_check", "structured", "desk_text" (None if no desk review is due), "answer_questions",
+            "paper_models" ((model, section text) pairs), "questions" (section name -> known
+            question count, from earlier runs), "route_top_k" and "route_model".
+        counter (TokenCounter): Counts prompt tokens with the model's tokenizer.
+
+    Returns:
+        list: One dict per call with its stage, section, role, model, token estimates and seconds.
+    """
+    structured = options.get("structured", False)
+    calls = []
+
+    def add(stage, section, role, model, prompt_tokens, completion=None):
+        completion = completion_tokens(role, structured, calibration) if completion is None else completion
+        calls.append({"Stage": stage, "Section": section, "Role": role, "Model": model,
+                      "Prompt Tokens": prompt_tokens, "Completion Tokens": completion,
+                      "Seconds": round(calibration.seconds(prompt_tokens, completion, base_model(model)), 2)})
+
+    if options.get("desk_text"):
+        add("desk", "DeskReviewer", "deskreviewer", "deskreviewer", counter.count("deskreviewer", options["desk_text"]) + 100)
+
+    structured_tokens = counter.count("llama3.2", STRUCTURED_INSTRUCTION) if structured else 0
+    for name, text in sections:
+        depth = depths.get(name, "full")
+        if depth == "skipped":
+            continue
+        if depth == "light":
+            model = options["light_model"]
+            add("review", name, "reviewer", model, counter.count(model, text) + TEMPLATE_TOKENS["reviewer"] + structured_tokens)
+            continue
+
+        for model in options["reviewers"]:
+            add("review", name, "reviewer", model, counter.count(model, text) + TEMPLATE_TOKENS["reviewer"] + structured_tokens)
+        add("review", name, "summarizer", "mistral", counter.count("mistral", text) + TEMPLATE_TOKENS["summarizer"] + 150)
+
+        section_tokens = counter.count("llama3.2", text)
+        check_mode = options.get("check_mode", "agents")
+        if check_mode == "combined":
+            model = options["combined_model"]
+            add("checks", name, "combined", model, counter.count(model, text) + TEMPLATE_TOKENS["combined"])
+        elif check_mode == "shared-prefix":
+            add("checks", name, "prefix", "llama3.2", section_tokens + TEMPLATE_TOKENS["prefix"], 1)
+            for role in ["test", "grammar", "novelty", "factchecker", "questioner"]:
+                if role == "factchecker" and options.get("fact_check") == "claims":
+                    continue
+                add("checks", name, role, "llama3.2", TEMPLATE_TOKENS["role"] + structured_tokens)
+        else:
+            for role in ["test", "grammar", "novelty", "questioner"]:
+                add("checks", name, role, role, section_tokens + TEMPLATE_TOKENS["role"] + structured_tokens)
+            if options.get("fact_check", "agent") == "agent":
+                if not structured:
+                    # Free-form fact checks first ask whether Wikipedia is needed (up to 3 tool calls more if so)
+                    add("checks", name, "factchecker-probe", "factchecker", section_tokens + TEMPLATE_TOKENS["role"])
+                add("checks", name, "factchecker", "factchecker", section_tokens + TEMPLATE_TOKENS["role"] + structured_tokens)
+        if options.get("fact_check") == "claims":
+            add("checks", name, "claims", "llama3.2", section_tokens + TEMPLATE_TOKENS["claims"])
+            add("checks", name, "factchecker", "factchecker",
+                section_tokens + TEMPLATE_TOKENS["claims"] + TEMPLATE_TOKENS["evidence"] + structured_tokens)
+
+    if options.get("answer_questions"):
+        paper_models = options.get("paper_models", [])
+        model_tokens = {model: counter.count("llama3.2", model_text) + TEMPLATE_TOKENS["question"] for model, model_text in paper_models}
+        top_k = options.get("route_top_k")
+        route_model = options.get("route_model", ROUTE_MODEL)
+        questioned = [name for name, _ in sections if depths.get(name, "full") == "full"] + list(options.get("questions", {}))
+        if top_k and paper_models:
+            add("answers", "Routing", "embedding", route_model, sum(counter.count("llama3.2", text) for _, text in paper_models), 0)
+        for name in dict.fromkeys(questioned):
+            num_questions = int(round(options.get("questions", {}).get(name, calibration.questions_per_section)))
+            candidates = [model for model, _ in paper_models if model != paper_model_key(name)]
+            if top_k:
+                # Routing picks the top_k models per question; their sizes are unknown until then
+                if num_questions:
+                    add("answers", name, "embedding", route_model, TEMPLATE_TOKENS["question"] * num_questions, 0)
+                mean_tokens = round(sum(model_tokens[m] for m in candidates) / len(candidates)) if candidates else 0
+                for _ in range(num_questions * min(top_k, len(candidates))):
+                    add("answers", name, "answer", "routed paper model", mean_tokens)
+                continue
+            for model in candidates:
+                for _ in range(num_questions):
+                    add("answers", name, "answer", model, model_tokens[model])
+    return calls
+
+def summarize_calls(calls):
+    """Totals of calls, tokens and seconds per stage and per model."""
+    totals = {"Calls": len(calls), "Prompt Tokens": 0, "Completion Tokens": 0, "Seconds": 0.0,
+              "By Stage": defaultdict(lambda: {"Calls": 0, "Tokens": 0, "Seconds": 0.0}),
+              "By Model": defaultdict(lambda: {"Calls": 0, "Tokens": 0, "Seconds": 0.0})}
+    for call in calls:
+        tokens = call["Prompt Tokens"] + call["Completion Tokens"]
+        totals["Prompt Tokens"] += call["Prompt Tokens"]
+        totals["Completion Tokens"] += call["Completion Tokens"]
+        totals["Seconds"] += call["Seconds"]
+        for group, key in [("By Stage", call["Stage"]), ("By Model", call["Model"])]:
+            totals[group][key]["Calls"] += 1
+            totals[group][key]["Tokens"] += tokens
+            totals[group][key]["Seconds"] += call["Seconds"]
+    totals["Seconds"] = round(totals["Seconds"], 1)
+    for group in ["By Stage", "By Model"]:
+        totals[group] = {key: {**value, "Seconds": round(value["Seconds"], 1)} for key, value in totals[group].items()}
+    return totals
+
+def print_plan(calls, totals):
+    print(f"\n{'Stage':<8} {'Section':<30} {'Role':<18} {'Model':<14} {'Prompt':>7} {'Output':>7} {'Secs':>7}")
+    for call in calls:
+        print(f"{call['Stage']:<8} {call['Section'][:30]:<30} {call['Role']:<18} {call['Model'][:14]:<14} "
+              f"{call['Prompt Tokens']:>7} {call['Completion Tokens']:>7} {call['Seconds']:>7.1f}")
+    print("\nBy stage:")
+    for stage, value in totals["By Stage"].items():
+        print(f"- {stage}: {value['Calls']} calls, {value['Tokens']} tokens, {value['Seconds']}s")
+    print("By model:")
+    for model, value in totals["By Model"].items():
+        print(f"- {model}: {value['Calls']} calls, {value['Tokens']} tokens, {value['Seconds']}s")
+    print(f"\nTotal: {totals['Calls']} calls, {totals['Prompt Tokens']} prompt + {totals['Completion Tokens']} completion tokens, "
+          f"~{totals['Seconds']}s ({totals['Seconds'] / 60:.1f} min) of model time")
+    if totals.get("Unavailable Tokenizers"):
+        print(f"Prompt tokens estimated from word counts (tokenizer unavailable): {', '.join(totals['Unavailable Tokenizers'])}")
+    if "answers" in totals["By Stage"]:
+        print("The budget covers Stage 1 only; the Stage 2 answers are not counted against it.")
+
+def over_budget(totals, budget):
+    """
+    Budget limits ("calls", "tokens", "seconds") the planned run exceeds. Like the review
+    plan (util/budget.py), the budget covers Stage 1: the Stage 2 answers are not counted.
+    """
+    stages = [value for stage, value in totals["By Stage"].items() if stage != "answers"]
+    planned = {"calls": sum(value["Calls"] for value in stages), "tokens": sum(value["Tokens"] for value in stages),
+               "seconds": round(sum(value["Seconds"] for value in stages), 1)}
+    return {key: planned[key] for key, limit in budget.items() if limit is not None and planned[key] > limit}
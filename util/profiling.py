@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Seconds between two samples of the thread stacks
+SAMPLE_INTERVAL = 0.005
+# Allocation sites kept per stage
+TOP_SITES = 5
+# Innermost functions of a thread that waits (for a model, the network or a lock), used
+# to tell idle from busy samples where per-thread CPU clocks are not available
+IDLE_FUNCTIONS = {"wait", "wait_for", "select", "poll", "read", "readinto", "recv", "recv_into", "acquire", "_wait_for_tstate_lock"}
+
+def thread_cpu(thread_id):
+    """CPU seconds used so far by a thread, or None where per-thread CPU clocks are not available."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError, ProcessLookupError):
+        return None
+
+def stack_text(frame):
+    """A frame and its callers as a folded stack (outermost first): module:function;..."""
+    names = []
+    while frame is not None:
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        names.append(f"{module}:{frame.f_code.co_name}".replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Profiler:
+    """
+    Attributes CPU time and allocations to pipeline stages.
+
+    Stages are entered with stage(name) by the thread that started the profiler and
+    may nest; time is charged to the innermost stage only. At every stage boundary the
+    wall time, process CPU time (including native threads such as torch's) and traced
+    memory (net and peak) since the last boundary are charged to the stage. Snapshots
+    are expensive with many live objects, so the allocation sites of a stage are taken
+    from tracemalloc snapshots around its first run only.
+
+    A sampler thread reads every Python thread's stack each SAMPLE_INTERVAL and weighs
+    it by the CPU time the thread used since its previous sample, so threads waiting
+    for a model or the network do not show up in the folded stacks.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.thread = threading.get_ident()
+        self.stack = []
+        self.stats = {}
+        self.folded = Counter()
+        self.cpu_seen = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="profiler", daemon=True)
+
+    def start(self):
+        tracemalloc.start()
+        self.enter("pipeline")
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+        self.exit()
+        tracemalloc.stop()
+
+    def stage(self, name):
+        if threading.get_ident() != self.thread:
+            return nullcontext()
+        return self.staged(name)
+
+    @contextmanager
+    def staged(self, name):
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def enter(self, name):
+        with self.lock:
+            if self.stack:
+                self.charge()
+            self.stack.append(name)
+            self.stats.setdefault(name, {"Calls": 0, "Wall": 0.0, "CPU": 0.0, "Sampled CPU": 0.0,
+                                         "Allocated": 0, "Peak": 0, "Sites": None})["Calls"] += 1
+            self.mark()
+
+    def exit(self):
+        with self.lock:
+            self.charge()
+            self.stack.pop()
+            if self.stack:
+                self.mark()
+
+    def mark(self):
+        """Starts measuring the innermost stage (the snapshot is taken before the clocks start)."""
+        self.snapshot = tracemalloc.take_snapshot() if self.stats[self.stack[-1]]["Sites"] is None else None
+        self.memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.cpu_seen = {thread_id: thread_cpu(thread_id) for thread_id in sys._current_frames()}
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def charge(self):
+        """Charges everything since the last mark to the innermost stage."""
+        stats = self.stats[self.stack[-1]]
+        stats["Wall"] += time.perf_counter() - self.wall
+        stats["CPU"] += time.process_time() - self.cpu
+        memory, peak = tracemalloc.get_traced_memory()
+        stats["Allocated"] += memory - self.memory
+        stats["Peak"] = max(stats["Peak"], peak - self.memory)
+        if self.snapshot is not None:
+            stats["Sites"] = Counter()
+            for diff in tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno"):
+                frame = diff.traceback[0]
+                if diff.size_diff > 0 and frame.filename not in (__file__, tracemalloc.__file__):
+                    stats["Sites"][f"{frame.filename}:{frame.lineno}"] += diff.size_diff
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                frames = sys._current_frames()
+                if not self.stack:
+                    continue
+                path = ";".join(self.stack)
+                stats = self.stats[self.stack[-1]]
+                for thread_id, frame in frames.items():
+                    if thread_id == self.sampler.ident:
+                        continue
+                    cpu = thread_cpu(thread_id)
+                    if cpu is None:
+                        busy = 0 if frame.f_code.co_name in IDLE_FUNCTIONS else self.interval
+                    else:
+                        seen = self.cpu_seen.get(thread_id)
+                        busy = cpu - (cpu if seen is None else seen)
+                        self.cpu_seen[thread_id] = cpu
+                    if busy > 0:
+                        self.folded[f"{path};{stack_text(frame)}"] += busy
+                        stats["Sampled CPU"] += busy
+
+    def summary(self):
+        """Per-stage rows, the most CPU-hungry stage first."""
+        rows = []
+        for name, stats in self.stats.items():
+            rows.append({
+                "Stage": name,
+                "Calls": stats["Calls"],
+                "Wall Seconds": round(stats["Wall"], 3),
+                "CPU Seconds": round(stats["CPU"], 3),
+                "Sampled CPU Seconds": round(stats["Sampled CPU"], 3),
+                "Allocated Bytes": stats["Allocated"],
+                "Peak Bytes": stats["Peak"],
+                "Top Allocation Sites": [{"Site": site, "Bytes": size} for site, size in (stats["Sites"] or Counter()).most_common(TOP_SITES)],
+            })
+        return sorted(rows, key=lambda row: -row["CPU Seconds"])
+
+    def write(self, directory):
+        """Writes stacks.folded (flamegraph.pl / speedscope input, in CPU microseconds) and stages.json."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "stacks.folded"), "w", encoding="utf-8") as f:
+            for stack, seconds in sorted(self.folded.items()):
+                if int(seconds * 1e6):
+                    f.write(f"{stack} {int(seconds * 1e6)}\n")
+        with open(os.path.join(directory, "stages.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
+
+def print_summary(rows):
+    mb = lambda size: f"{size / 2 ** 20:.1f}"
+    header = f"{'Stage':<20} {'Calls':>6} {'Wall s':>9} {'CPU s':>9} {'Sampled':>9} {'Alloc MB':>9} {'Peak MB':>8}  Top allocation site"
+    print("\nCPU and allocations per stage (most CPU first):")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        sites = row["Top Allocation Sites"]
+        site = f"{os.path.basename(sites[0]['Site'])} ({mb(sites[0]['Bytes'])} MB)" if sites else ""
+        print(f"{row['Stage'][:20]:<20} {row['Calls']:>6} {row['Wall Seconds']:>9.2f} {row['CPU Seconds']:>9.2f} "
+              f"{row['Sampled CPU Seconds']:>9.2f} {mb(row['Allocated Bytes']):>9} {mb(row['Peak Bytes']):>8}  {site}")
+
+profiler = None
+
+def stage(name):
+    """Context manager charging the enclosed work to a stage while profiling (a no-op otherwise)."""
+    return profiler.stage(name) if profiler else nullcontext()
+
+@contextmanager
+def profiled(directory):
+    """Profiles the enclosed run and writes the results to directory (a no-op if directory is None)."""
+    global profiler
+    if directory is None:
+        yield
+        return
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        profiler.write(directory)
+        print_summary(profiler.summary())
+        print(f"\nProfile saved to {directory} (stacks.folded: flamegraph.pl or speedscope; stages.json)")
+        profiler = None
@@ -0,0 +1,119 @@
+import re
+import zlib
+
+PRUNE_POLICIES = ["off", "skip", "merge"]
+MIN_WORDS = 40
+SIMILARITY_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+
+# Universal hashing parameters for the MinHash permutations (fixed, so signatures are reproducible)
+MERSENNE_PRIME = (1 << 61) - 1
+PERMUTATIONS = [((i * 0x9E3779B1 + 1) % MERSENNE_PRIME, (i * 0x85EBCA77 + 7) % MERSENNE_PRIME) for i in range(1, NUM_PERMUTATIONS + 1)]
+
+REFERENCE_HEADING = re.compile(r'\b(references|bibliography)\b', re.IGNORECASE)
+ACKNOWLEDGMENT_HEADING = re.compile(r'\backnowledge?ments?\b', re.IGNORECASE)
+CITATION_LINE = re.compile(r'^\s*(\[\d+\]|\d+\.\s+[A-Z][a-z]+,)|\bet al\.|\b(19|20)\d{2}[a-z]?\b.*\b(proceedings|journal|arxiv|conference|pp\.|vol\.)', re.IGNORECASE)
+
+def body_words(heading, text):
+    """Words of the section text, without the heading the PDF splitter leaves at its start."""
+    if text.startswith(heading):
+        text = text[len(heading):]
+    return text.split()
+
+def shingles(words, size=SHINGLE_SIZE):
+    """Set of hashed word k-grams."""
+    words = [w.lower() for w in words]
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+def minhash(shingle_set):
+    """MinHash signature of a shingle set."""
+    if not shingle_set:
+        return None
+    return [min((a * s + b) % MERSENNE_PRIME for s in shingle_set) for a, b in PERMUTATIONS]
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two signatures."""
+    if signature_a is None or signature_b is None:
+        return 0.0
+    return sum(x == y for x, y in zip(signature_a, signature_b)) / len(signature_a)
+
+def is_reference_list(text):
+    """True if most lines of the text look like bibliography entries."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 5:
+        return False
+    return sum(bool(CITATION_LINE.search(line)) for line in lines) / len(lines) >= 0.6
+
+class SectionPruner:
+    """
+    Detects empty, reference-only and near-duplicate sections before they are reviewed.
+
+    Sections are fed in document order with add(), which returns the sections that are
+    ready for review. Under the "skip" policy pruned sections are dropped. Under "merge",
+    near-empty sections (e.g. a bare "APPENDIX" heading) are folded into the next section.
+    Near-duplicates are skipped under both policies: the section they duplicate already
+    covers their content (and may already be under review). Reference lists and
+    acknowledgments are always skipped. The reason for every pruned section is kept in `pruned`.
+    """
+
+    def __init__(self, policy="off", min_words=MIN_WORDS, threshold=SIMILARITY_THRESHOLD):
+        self.policy = policy
+        self.min_words = min_words
+        self.threshold = threshold
+        self.signatures = []
+        self.pending = []
+        self.pruned = {}
+
+    def add(self, heading, text):
+        if self.policy == "off":
+            return [(heading, text)]
+
+        words = body_words(heading, text)
+        if REFERENCE_HEADING.search(heading) or is_reference_list(text):
+            self.pruned[heading] = {"Reason": "reference list", "Action": "skipped"}
+            return []
+        if ACKNOWLEDGMENT_HEADING.search(heading):
+            self.pruned[heading] = {"Reason": "acknowledgments", "Action": "skipped"}
+            return []
+        if len(words) < self.min_words:
+            if self.policy == "merge":
+                self.pending.append((heading, text))
+            else:
+                self.pruned[heading] = {"Reason": f"empty ({len(words)} words)", "Action": "skipped"}
+            return []
+
+        signature = minhash(shingles(words))
+        for kept_heading, kept_signature in self.signatures:
+            score = similarity(signature, kept_signature)
+            if score >= self.threshold:
+                self.pruned[heading] = {"Reason": f"near-duplicate of {kept_heading} (similarity {score:.2f})",
+                                        "Action": f"skipped (duplicate of {kept_heading})"}
+                return []
+        self.signatures.append((heading, signature))
+
+        if self.pending:
+            for pending_heading, pending_text in self.pending:
+                self.pruned[pending_heading] = {"Reason": f"empty ({len(body_words(pending_heading, pending_text))} words)",
+                                                "Action": f"merged into {heading}"}
+            text = "\n".join([t for _, t in self.pending] + [text])
+            self.pending = []
+        return [(heading, text)]
+
+    def flush(self):
+        """Called once the paper is fully parsed; near-empty sections left at the end are skipped."""
+        for heading, text in self.pending:
+            self.pruned[heading] = {"Reason": f"empty ({len(body_words(heading, text))} words)", "Action": "skipped"}
+        self.pending = []
+        return []
+
+def prune_sections(sections, policy="off", min_words=MIN_WORDS, threshold=SIMILARITY_THRESHOLD):
+    """Batch form of SectionPruner: returns (sections to review, pruned sections with reasons)."""
+    pruner = SectionPruner(policy, min_words, threshold)
+    kept = []
+    for heading, text in sections:
+        kept.extend(pruner.add(heading, text))
+    kept.extend(pruner.flush())
+    return kept, pruner.pruned
@@ -0,0 +1,79 @@
+import re
+from util.routing import TOKEN_PATTERN, cosine
+from util.defaults import LEXICAL_THRESHOLD
+
+EMBEDDING_THRESHOLD = 0.92
+MIN_QUESTION_WORDS = 3
+
+# Blank lines, or line breaks before a bullet / numbered item, separate the questioner's items
+ITEM_BREAK = re.compile(r'\n\s*\n|\n(?=\s*(?:[-*•]|\(?\d+[.)]|Q\d+[:.]))')
+LIST_MARKER = re.compile(r'^\s*(?:[-*•]+|\(?\d+[.)]|\(?[a-z][.)]|Q\d+[:.])\s*', re.IGNORECASE)
+PREAMBLE = re.compile(r'^[^?]*\bquestions?\b[^?:]*:\s*', re.IGNORECASE)
+
+def parse_questions(text):
+    """
+    Splits questioner output into clean questions.
+
+    Handles bullet and numbered lists, markdown emphasis and "Here are some questions:"
+    preambles. A context sentence before a question in the same item is kept with it;
+    fragments shorter than MIN_QUESTION_WORDS words are dropped. Anything but text
+    (e.g. the timeout record of an older checkpoint) has no questions.
+    """
+    questions = []
+    if not isinstance(text, str):
+        return questions
+    for item in ITEM_BREAK.split(text):
+        item = " ".join(item.replace("**", "").replace("__", "").split())
+        for part in re.findall(r'[^?]*\?', item):
+            question = PREAMBLE.sub("", LIST_MARKER.sub("", part.strip()))
+            question = LIST_MARKER.sub("", question).strip()
+            if len(question.split()) >= MIN_QUESTION_WORDS:
+                questions.append(question)
+    return questions
+
+def normalize_question(question):
+    """Case, punctuation and whitespace insensitive key of a question."""
+    return " ".join(re.sub(r'[^a-z0-9 ]', ' ', question.lower()).split())
+
+def word_set(question):
+    return set(TOKEN_PATTERN.findall(question.lower()))
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def cluster_questions(questions_by_section, lexical_threshold=LEXICAL_THRESHOLD, vectors=None,
+                      embedding_threshold=EMBEDDING_THRESHOLD):
+    """
+    Groups near-identical questions across the whole paper.
+
+    Args:
+        questions_by_section (dict): Section name -> list of parsed questions.
+        vectors (dict): Optional question -> embedding; questions whose embeddings are at
+            least embedding_threshold similar are merged as well.
+
+    Returns:
+        list: Clusters in order of first appearance, each {"Question": the first phrasing,
+        "Members": [(section, question), ...]}. Each cluster needs to be answered once.
+    """
+    clusters = []
+    by_key = {}
+    for section, questions in questions_by_section.items():
+        for question in questions:
+            key = normalize_question(question)
+            cluster = by_key.get(key)
+            if cluster is None:
+                words = word_set(question)
+                for candidate in clusters:
+                    if jaccard(words, candidate["words"]) >= lexical_threshold:
+                        cluster = candidate
+                        break
+                    if vectors and cosine(vectors[question], vectors[candidate["Question"]]) >= embedding_threshold:
+                        cluster = candidate
+                        break
+            if cluster is None:
+                cluster = {"Question": question, "Members": [], "words": word_set(question)}
+                clusters.append(cluster)
+            by_key[key] = cluster
+            if (section, question) not in cluster["Members"]:
+                cluster["Members"].append((section, question))
+    return [{"Question": c["Question"], "Members": c["Members"]} for c in clusters]
@@ -1,14 +1,20 @@
-import ollama
 import argparse
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from PyPDF2 import PdfReader
 import re
 from util.reviewer import assigned_reviewers  
+from util.verdict import VERDICT_SCHEMA, STRUCTURED_INSTRUCTION, structured_options, parse_verdict
+from util import llm, profiling
+from util.llm import records_timeouts
 
 def parse_pdf_to_text(pdf_path):
     """Extract text from a PDF file."""
     try:
         reader = PdfReader(pdf_path)
-        text = "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
+        texts = [page.extract_text() for page in reader.pages]
+        text = "\n".join([t for t in texts if t])
         return text
     except Exception as e:
         return f"Error parsing PDF: {e}"
@@ -20,23 +26,29 @@ def clean_text(text):
     text = re.sub(r'([IVX]+)\.\s*([A-Z])', r'\1. \2', text)  
     return text
 
-def split_text_into_sections(text):
-    """Splits text into sections based on research paper headers."""
-    section_pattern = r"""
-        (?:^|\n)                   
-        (?:
-            (?:[IVX]+\.)\s*       
-            [A-Z][A-Za-z\s]*      
-            |
-            (?:Abstract|ABSTRACT|ACKNOWLEDGMENTS|REFERENCES)  
-        )
-    """
+SECTION_PATTERN = re.compile(r"""
+    (?:^|\n)                   
+    (?:
+        (?:[IVX]+\.)\s*       
+        [A-Z][A-Za-z\s]*      
+        |
+        (?:Abstract|ABSTRACT|ACKNOWLEDGMENTS|REFERENCES)  
+    )
+""", re.VERBOSE | re.MULTILINE)
+
+def find_section_headers(text):
+    """Returns (start, end, header) for every research paper header in the text."""
     headers = []
-    for match in re.finditer(section_pattern, text, re.VERBOSE | re.MULTILINE):
+    for match in SECTION_PATTERN.finditer(text):
         header_text = match.group().strip()
         if "et al." in header_text.lower() or re.search(r'\[\d+\]', header_text) or "TABLE" in header_text:
             continue
-        headers.append((match.start(), header_text))
+        headers.append((match.start(), match.end(), header_text))
+    return headers
+
+def split_text_into_sections(text):
+    """Splits text into sections based on research paper headers."""
+    headers = [(start, header) for start, _, header in find_section_headers(text)]
 
     headers.append((len(text), "END"))
     sections = []
@@ -50,6 +62,114 @@ def split_text_into_sections(text):
 
     return sections
 
+def extract_page_range(pdf_path, start, stop):
+    """Extracts the text of pages [start, stop) of a PDF. Runs inside a worker process."""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def iter_pdf_pages(pdf_path, workers=None, chunk_size=4):
+    """
+    Yields the text of every page in order, extracting each page exactly once.
+
+    Pages are extracted in chunks across a process pool, so later pages keep parsing
+    in the background while the caller works on the earlier ones.
+    """
+    num_pages = len(PdfReader(pdf_path).pages)
+    workers = workers or os.cpu_count() or 1
+    ranges = [(start, min(start + chunk_size, num_pages)) for start in range(0, num_pages, chunk_size)]
+    if workers <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield from extract_page_range(pdf_path, start, stop)
+        return
+
+    # The backend monitor and transport threads may already run, so the workers are not
+    # forked from this process but started by a fresh forkserver (or spawned).
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=multiprocessing.get_context(method))
+    futures = [executor.submit(extract_page_range, pdf_path, start, stop) for start, stop in ranges]
+    # Every chunk is queued: the workers exit once the pages are extracted rather than living as long as the review
+    executor.shutdown(wait=False)
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+# Two lowercase letters: no clean_text substitution spans them, so the raw text can be cut
+# between them and each part cleaned on its own
+SAFE_CUT = re.compile(r'(?<=[a-z])(?=[a-z])')
+MAX_CUT_TRIES = 4
+CUT_WINDOW = 256
+
+def safe_cut(raw, low, high):
+    """
+    Position p in raw with clean_text(raw) == clean_text(raw[:p]) + clean_text(raw[p:]) and
+    low <= len(clean_text(raw[:p])) <= high, and that length; (0, 0) if none is found.
+
+    clean_text shifts offsets (it joins spaced capitals and breaks lines before numerals),
+    so the raw position is found by correcting a guess with the cleaned length of its prefix.
+    """
+    guess = high
+    for _ in range(MAX_CUT_TRIES):
+        window = max(0, guess - CUT_WINDOW)
+        cuts = [m.start() for m in SAFE_CUT.finditer(raw, window, max(window, min(len(raw), guess + 1)))]
+        if not cuts:
+            return 0, 0
+        cut = cuts[-1]
+        length = len(clean_text(raw[:cut]))
+        if low <= length <= high:
+            return cut, length
+        next_guess = cut + (high - length)
+        if next_guess == guess or next_guess <= 0:
+            return 0, 0
+        guess = next_guess
+    return 0, 0
+
+def stream_sections_from_pages(pages):
+    """
+    Yields (header, content) as soon as a section is complete, exactly as
+    split_text_into_sections(clean_text(parse_pdf_to_text(...))) would split the whole text.
+
+    Pages are joined like parse_pdf_to_text. Only the raw text from a cursor before the
+    first section not yet emitted is cleaned and scanned for headers again when a page
+    comes in; the cursor sits in the body of the section before it, where clean_text
+    cannot match across it. A section is complete once the header that follows it ends
+    before the newest page, which leaves clean_text a page of context on either side of it.
+    """
+    raw = ""
+    done = 0
+    for page in pages:
+        if not page:
+            continue
+        raw = f"{raw}\n{page}" if raw else page
+        text = clean_text(raw)
+        complete = len(text) - len(page)
+        headers = [h for h in find_section_headers(text) if h[1] < complete]
+        emitted_end = None
+        for (start, header_end, header), (end, _, _) in zip(headers, headers[1:]):
+            if start < done:
+                continue
+            content = text[start:end].strip()
+            if content and not content.isspace():
+                yield header, content
+            done, emitted_end = end, header_end
+        if emitted_end is not None:
+            # Move the cursor past the emitted sections: their text is not cleaned again
+            cut, length = safe_cut(raw, emitted_end, done)
+            raw, done = raw[cut:], done - length
+
+    text = clean_text(raw)
+    headers = find_section_headers(text) + [(len(text), len(text), "END")]
+    for (start, _, header), (end, _, _) in zip(headers, headers[1:]):
+        content = text[start:end].strip()
+        if start >= done and content and not content.isspace():
+            yield header, content
+
+def stream_sections(pdf_path, workers=None):
+    """Streaming counterpart of parse_pdf_to_text + clean_text + split_text_into_sections."""
+    return stream_sections_from_pages(iter_pdf_pages(pdf_path, workers))
+
 def extract_section(pdf_path, section_name):
     """Extracts a section based on approximate name matching."""
     pdf_text = parse_pdf_to_text(pdf_path)
@@ -77,8 +197,14 @@ for reviewer in assigned_reviewers:
     """
     reviewer_messages.append(message)
 
-def reviewer_agent(reviewer, section_text, model, previous_feedback=None):
+@records_timeouts
+def reviewer_agent(reviewer, section_text, model, previous_feedback=None, structured=False):
     """LLM agent that reviews a section based on assigned reviewer attributes and provides a decision."""
+    instructions = STRUCTURED_INSTRUCTION if structured else """Respond in a conversational manner, directly addressing previous comments if any.
+    If you agree with a previous reviewer, elaborate on why.
+    If you disagree, provide justification and alternative suggestions.
+    
+    🔹 **At the end of your review, explicitly state your final decision (Accept, Reject).**"""
     prompt = f"""
     {reviewer_messages[assigned_reviewers.index(reviewer)]}
     
@@ -87,16 +213,17 @@ def reviewer_agent(reviewer, section_text, model, previous_feedback=None):
     
     {f"Previous discussion so far: {previous_feedback}" if previous_feedback else ""}
     
-    Respond in a conversational manner, directly addressing previous comments if any.
-    If you agree with a previous reviewer, elaborate on why.
-    If you disagree, provide justification and alternative suggestions.
-    
-    🔹 **At the end of your review, explicitly state your final decision (Accept, Reject).**
+    {instructions}
     """
-    response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
+    if structured:
+        response = llm.chat("reviewer", model, [{"role": "user", "content": prompt}],
+                            format=VERDICT_SCHEMA, options=structured_options("reviewer"))
+        return parse_verdict(response['message']['content'])
+    response = llm.chat("reviewer", model, [{"role": "user", "content": prompt}])
     return response['message']['content']
 
-def summarizer(section_text, reviews):
+@records_timeouts
+def summarizer(section_text, reviews, model="mistral"):
     """Summarizes the discussion into a structured summary with a final decision."""
     prompt = f"""Summarize the discussion among three reviewers about the following research paper section.
     
@@ -109,9 +236,95 @@ def summarizer(section_text, reviews):
     
     🔹 **At the end, determine the final decision based on the majority vote (Accept, Reject).**
     """
-    response = ollama.chat(model="mistral", messages=[{"role": "user", "content": prompt}])
+    response = llm.chat("summarizer", model, [{"role": "user", "content": prompt}])
     return response['message']['content']
 
+# BART reads at most 1024 tokens; the weighted extract is kept below that.
+SUMMARY_INPUT_TOKENS = 1000
+
+sentiment_analyzer = None
+summarizer_model = None
+
+def get_sentiment_analyzer():
+    """VADER analyzer shared by every section (its lexicon is loaded once)."""
+    global sentiment_analyzer
+    if sentiment_analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        sentiment_analyzer = SentimentIntensityAnalyzer()
+    return sentiment_analyzer
+
+def get_summarizer_model():
+    """BART summarization pipeline, loaded on first use and kept for the whole run."""
+    global summarizer_model
+    if summarizer_model is None:
+        from transformers import pipeline
+        summarizer_model = pipeline("summarization", model="facebook/bart-large-cnn")
+    return summarizer_model
+
+def weighted_extract(review_list, weights, count_tokens, token_budget=SUMMARY_INPUT_TOKENS):
+    """
+    Selects review sentences under a token budget, favouring heavily weighted reviews.
+
+    A sentence scores its review's weight, scaled up when its words also appear in the
+    other reviews. The best sentences are picked greedily and returned in their original
+    order, so the text never grows beyond the budget, however long the reviews are. If
+    no sentence fits, the best one is cut to the budget; "" only without any sentence.
+    """
+    split_reviews = [[x.strip() for x in re.split(r'(?<=[.!?])\s+', r) if x.strip()] for r in review_list]
+    review_words = [set(re.findall(r'[a-z]{4,}', r.lower())) for r in review_list]
+
+    candidates = []
+    seen = set()
+    for i, (sentences, weight) in enumerate(zip(split_reviews, weights)):
+        other_words = set().union(*(w for j, w in enumerate(review_words) if j != i))
+        for j, sentence in enumerate(sentences):
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            words = set(re.findall(r'[a-z]{4,}', sentence.lower()))
+            centrality = len(words & other_words) / len(words) if words else 0
+            candidates.append((weight * (0.5 + 0.5 * centrality), i, j, sentence))
+
+    selected = []
+    used = 0
+    for score, i, j, sentence in sorted(candidates, key=lambda c: -c[0]):
+        tokens = count_tokens(sentence)
+        if used + tokens > token_budget:
+            continue
+        selected.append((i, j, sentence))
+        used += tokens
+    if not selected and candidates:
+        words = max(candidates, key=lambda c: c[0])[3].split()
+        keep = len(words)
+        while keep > 1 and count_tokens(" ".join(words[:keep])) > token_budget:
+            keep -= max(1, keep // 10)
+        return " ".join(words[:keep])
+    return " ".join(sentence for _, _, sentence in sorted(selected))
+
+def fancy_aggregate_reviews(review_list):
+    """
+    Summarizes the reviews with BART, weighting each review by the strength of its sentiment.
+    Returns "" when there is no review text to summarize (e.g. every reviewer was skipped).
+    """
+    review_list = [r for r in review_list if r and r.strip()]
+    if not review_list:
+        return ""
+    with profiling.stage("vader sentiment"):
+        analyzer = get_sentiment_analyzer()
+        sentiments = [analyzer.polarity_scores(r) for r in review_list]
+    weights = [abs(s['compound']) for s in sentiments]
+    total = sum(weights) + 1e-6
+    # Same relative weights the old repeat-the-text scheme used (max(1, 10 * w)), without copying text.
+    normalized_weights = [max(1.0, 10 * w / total) for w in weights]
+
+    with profiling.stage("bart summary"):
+        model = get_summarizer_model()
+        count_tokens = lambda text: len(model.tokenizer(text, add_special_tokens=False)["input_ids"])
+        weighted_text = weighted_extract(review_list, normalized_weights, count_tokens)
+
+        summary = model(weighted_text, max_length=150, min_length=40, do_sample=False)
+    return summary[0]['summary_text']
+
 def main():
     parser = argparse.ArgumentParser(description="Extract and discuss a specific section of a research paper.")
     parser.add_argument("pdf_path", type=str, help="Path to the PDF file")
@@ -0,0 +1,84 @@
+import math
+import re
+from collections import Counter
+from util import llm
+from util.defaults import ROUTE_MODEL, DEFAULT_TOP_K
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]+")
+
+def embed_texts(texts, model=ROUTE_MODEL):
+    """Embeds a batch of texts with one Ollama call (long texts are truncated to the model's context)."""
+    return llm.embed(model, texts, truncate=True).embeddings
+
+def lexical_vectors(texts):
+    """TF-IDF vectors (sparse dicts) of a batch of texts, used when no embedding model is available."""
+    counts = [Counter(TOKEN_PATTERN.findall(text.lower())) for text in texts]
+    document_freq = Counter(word for count in counts for word in count)
+    idf = {word: math.log((1 + len(texts)) / (1 + df)) + 1 for word, df in document_freq.items()}
+    return [{word: tf * idf[word] for word, tf in count.items()} for count in counts]
+
+def cosine(a, b):
+    if isinstance(a, dict):
+        dot = sum(value * b.get(word, 0.0) for word, value in a.items())
+        norm_a = math.sqrt(sum(v * v for v in a.values()))
+        norm_b = math.sqrt(sum(v * v for v in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+class QuestionRouter:
+    """
+    Sends each Stage 2 question only to the paper-specific models of the most relevant sections.
+
+    Every section is embedded once when the router is built. The pending questions of
+    all sections are then embedded together in one batch (embed_questions), and those
+    vectors are reused both to cluster duplicate questions and to route them, so Stage 2
+    adds one embedding call for its questions. Falls back to TF-IDF similarity if the
+    embedding model is unavailable.
+    """
+
+    def __init__(self, paper_models, model=ROUTE_MODEL):
+        self.models = [name for name, _ in paper_models]
+        self.texts = [text for _, text in paper_models]
+        self.embedding_model = model
+        try:
+            self.vectors = embed_texts(self.texts, model) if self.texts else []
+        except Exception as e:
+            print(f"Embedding model {model} unavailable ({e}); routing questions by TF-IDF similarity.")
+            self.embedding_model = None
+            self.vectors = None
+
+    def embed_questions(self, questions):
+        if self.embedding_model:
+            try:
+                return embed_texts(questions, self.embedding_model)
+            except Exception as e:
+                print(f"Embedding failed ({e}); routing questions by TF-IDF similarity.")
+                self.embedding_model = None
+        vectors = lexical_vectors(self.texts + questions)
+        self.vectors = vectors[:len(self.texts)]
+        return vectors[len(self.texts):]
+
+    def route(self, questions, top_k=DEFAULT_TOP_K, exclude=None, question_vectors=None):
+        """
+        Returns, for every question, {"Models": the top_k models, "Scores": {model: similarity}}.
+
+        exclude names the model(s) of the asking section(s), which are never chosen; pass a
+        list to give each question its own exclusions. question_vectors are the questions'
+        vectors from an earlier embed_questions call, if any, so they are not embedded again.
+        """
+        if not questions:
+            return []
+        excludes = exclude if isinstance(exclude, list) else [exclude] * len(questions)
+        if question_vectors is None:
+            question_vectors = self.embed_questions(questions)
+        routes = []
+        for vector, excluded in zip(question_vectors, excludes):
+            excluded = {excluded} if isinstance(excluded, str) else set(excluded or ())
+            scores = {model: cosine(vector, section_vector) for model, section_vector in zip(self.models, self.vectors)}
+            candidates = [m for m in scores if m not in excluded]
+            ranked = sorted(candidates, key=lambda m: -scores[m])[:top_k]
+            routes.append({"Models": ranked, "Scores": {m: round(scores[m], 4) for m in ranked}})
+        return routes
@@ -1,4 +1,24 @@
-import arxiv
+from datetime import datetime, timezone
+import feedparser
+from util.transport import get_transport, ARXIV_URL
+
+async def arxiv_search(query, max_results=5):
+    """Queries the arXiv API (through the shared transport) and parses the Atom feed."""
+    response = await get_transport().request("GET", ARXIV_URL, params={"search_query": query, "start": 0, "max_results": max_results})
+    response.raise_for_status()
+    feed = feedparser.parse(response.text)
+
+    papers = []
+    for entry in feed.entries:
+        pdf_url = next((link.href for link in entry.get("links", []) if link.get("type") == "application/pdf"), None)
+        papers.append({
+            "title": " ".join(entry.get("title", "").split()),
+            "authors": [author.name for author in entry.get("authors", [])],
+            "published": datetime(*entry.published_parsed[:6], tzinfo=timezone.utc) if entry.get("published_parsed") else None,
+            "summary": " ".join(entry.get("summary", "").split()),
+            "pdf_url": pdf_url,
+        })
+    return papers
 
 def search_arxiv_papers(query, max_results=5):
     """
@@ -11,28 +31,7 @@ def search_arxiv_papers(query, max_results=5):
     Returns:
         list: A list of dictionaries containing paper details.
     """
-    # Create an arXiv client
-    client = arxiv.Client()
-
-    # Define the search
-    search = arxiv.Search(
-        query=query,
-        max_results=max_results,
-        # Uncomment if sorting is needed
-        # sort_by=arxiv.SortCriterion.SubmittedDate,
-    )
-
-    # Fetch results and format them
-    papers = []
-    for result in client.results(search):
-        papers.append({
-            "title": result.title,
-            "authors": [author.name for author in result.authors],
-            "published": result.published,
-            "summary": result.summary,
-            "pdf_url": result.pdf_url,
-        })
-    return papers
+    return get_transport().run(arxiv_search(query, max_results))
 
 # Example usage
 if __name__ == "__main__":
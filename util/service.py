@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import httpx
+from util import metrics, tiers
+from util.options import job_args, check_options, PROCESS_OPTIONS, PATH_OPTIONS, CHECKPOINT_FILE, ANSWER_FILE
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+JOBS_DIR = "service_jobs"
+KEEP_ALIVE = "30m"
+MAX_BODY_BYTES = 100 * 1024 * 1024
+
+class Job:
+    """One submitted paper: its options, working directory, status and result events."""
+
+    def __init__(self, job_id, workdir, args):
+        self.id = job_id
+        self.workdir = workdir
+        self.args = args
+        self.status = "queued"
+        self.error = None
+        self.exit_status = None
+        self.events = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def add_event(self, event, data):
+        self.events.append({"Event": event, "Data": data, "Time": round(time.time() - self.started, 3)})
+        await self.notify()
+
+    def summary(self):
+        return {
+            "Id": self.id,
+            "Status": self.status,
+            "Paper": os.path.basename(self.args.pdf_path),
+            "Sections Reviewed": sum(e["Event"] == "section" for e in self.events),
+            "Events": len(self.events),
+            "Exit Status": self.exit_status,
+            "Error": self.error,
+            "Queued Seconds": round((self.started or time.time()) - self.created, 3),
+            "Run Seconds": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+        }
+
+class ReviewService:
+    """
+    Long-running review service over asyncio HTTP.
+
+    The process keeps its warm state between jobs: the BART summarizer and VADER
+    analyzer, NLTK data, IDF tables and calibrations, CFP topics, provisioned agent
+    models and (with keep_alive) the models loaded in Ollama. Jobs run one at a time
+    in a worker thread, since they provision the shared agent models; each job has its
+    own working directory for its checkpoint and answer files.
+
+    Endpoints:
+        POST /jobs                 submit {"url", "paper" (paper JSON) or "pdf" (base64), "options", "resume"}
+        GET  /jobs, /jobs/<id>     job status
+        GET  /jobs/<id>/events     section results as they complete (newline-delimited JSON, streamed)
+        GET  /jobs/<id>/result     the final feedback_collab document
+        GET  /jobs/<id>/answers    the document with Stage 2 answers
+        GET  /health
+        GET  /metrics              Prometheus metrics (text exposition format)
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.jobs = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mars-job")
+        self.loop = None
+
+    def warm_up(self):
+        """Loads the local models used by every job, so the first job does not pay for them."""
+        from util.review_collab import get_summarizer_model, get_sentiment_analyzer
+        start = time.time()
+        get_sentiment_analyzer()
+        get_summarizer_model()
+        print(f"Warm-up done in {time.time() - start:.1f}s")
+
+    def submit(self, payload):
+        """Creates and queues a job; raises ValueError for an invalid submission."""
+        if not isinstance(payload, dict) or not payload.get("url"):
+            raise ValueError("A submission needs the CFP url")
+        options = payload.get("options") or {}
+        keys = {k.lstrip("-").replace("-", "_") for k in options}
+        if keys & PROCESS_OPTIONS:
+            raise ValueError(f"Set by the service, not per job: {', '.join(sorted(keys & PROCESS_OPTIONS))}")
+        if keys & PATH_OPTIONS:
+            raise ValueError(f"Files on the client are not available to the service: {', '.join(sorted(keys & PATH_OPTIONS))}")
+
+        pdf = None
+        if "pdf" in payload:
+            try:
+                pdf = base64.b64decode(payload["pdf"], validate=True)
+            except (TypeError, ValueError):
+                raise ValueError("The pdf must be base64 encoded")
+
+        job_id = uuid.uuid4().hex[:12]
+        workdir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(workdir)
+        if pdf is not None:
+            paper_path = os.path.join(workdir, "paper.pdf")
+            with open(paper_path, "wb") as f:
+                f.write(pdf)
+        elif "paper" in payload:
+            paper_path = os.path.join(workdir, "paper.json")
+            with open(paper_path, "w", encoding="utf-8") as f:
+                json.dump(payload["paper"], f)
+        else:
+            shutil.rmtree(workdir)
+            raise ValueError("A submission needs a paper (JSON) or a pdf (base64)")
+        try:
+            args = job_args(payload["url"], paper_path, options)
+            check_options(args, tiers.tiering.enabled)
+        except ValueError:
+            shutil.rmtree(workdir)
+            raise
+
+        # Continue from an earlier job's checkpoint: only changed sections are reviewed again
+        resume = payload.get("resume")
+        if resume:
+            if resume not in self.jobs:
+                shutil.rmtree(workdir)
+                raise ValueError(f"Unknown job to resume: {resume}")
+            previous = os.path.join(self.jobs[resume].workdir, CHECKPOINT_FILE)
+            if os.path.exists(previous):
+                shutil.copy(previous, os.path.join(workdir, CHECKPOINT_FILE))
+
+        job = Job(job_id, workdir, args)
+        self.jobs[job_id] = job
+        self.loop.run_in_executor(self.executor, self.execute, job)
+        return job
+
+    def execute(self, job):
+        """Runs a job in the worker thread; results are handed to the event loop."""
+        from util.pipeline import review_paper  # the pipeline (and its warm state) is only loaded by the service
+        run = lambda coroutine: asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+        job.started = time.time()
+        job.status = "running"
+        run(job.notify())
+        try:
+            job.exit_status = review_paper(job.args, job.workdir, lambda event, data: run(job.add_event(event, data)))
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+            print(f"Job {job.id} failed: {job.error}")
+        job.finished = time.time()
+        run(job.notify())
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            if len(request_line) < 2:
+                return
+            method, path = request_line[0], request_line[1].split("?")[0].rstrip("/")
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                await respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"Error": "Submission too large"})
+                return
+            body = await reader.readexactly(length) if length else b""
+            await self.route(method, path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/health":
+            await respond(writer, HTTPStatus.OK, {"Status": "ok", "Jobs": len(self.jobs),
+                                                  "Running": sum(j.status == "running" for j in self.jobs.values())})
+        elif method == "GET" and path == "/metrics":
+            for status in ("queued", "running", "done", "failed"):
+                metrics.SERVICE_JOBS.set(sum(j.status == status for j in self.jobs.values()), status=status)
+            await respond(writer, HTTPStatus.OK, metrics.render().encode(), "text/plain; version=0.0.4")
+        elif parts[0] != "jobs":
+            await respond(writer, HTTPStatus.NOT_FOUND, {"Error": f"No such endpoint: {path}"})
+        elif len(parts) == 1 and method == "POST":
+            try:
+                job = self.submit(json.loads(body or b"null"))
+            except (ValueError, TypeError) as e:
+                await respond(writer, HTTPStatus.BAD_REQUEST, {"Error": str(e)})
+                return
+            await respond(writer, HTTPStatus.ACCEPTED, job.summary())
+        elif len(parts) == 1 and method == "GET":
+            await respond(writer, HTTPStatus.OK, [job.summary() for job in self.jobs.values()])
+        elif method != "GET":
+            await respond(writer, HTTPStatus.METHOD_NOT_ALLOWED, {"Error": f"{method} is not supported on {path}"})
+        elif parts[1] not in self.jobs:
+            await respond(writer, HTTPStatus.NOT_FOUND, {"Error": f"No such job: {parts[1]}"})
+        elif len(parts) == 2:
+            await respond(writer, HTTPStatus.OK, self.jobs[parts[1]].summary())
+        elif parts[2] == "events":
+            await self.stream_events(self.jobs[parts[1]], writer)
+        elif parts[2] in ("result", "answers"):
+            await self.send_document(self.jobs[parts[1]], parts[2], writer)
+        else:
+            await respond(writer, HTTPStatus.NOT_FOUND, {"Error": f"No such endpoint: {path}"})
+
+    async def stream_events(self, job, writer):
+        """Sends every event of the job so far, then each new one, until the job has finished."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: sent < len(job.events) or job.done)
+            while sent < len(job.events):
+                line = json.dumps(job.events[sent], ensure_ascii=False).encode() + b"\n"
+                writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                sent += 1
+            await writer.drain()
+            if job.done and sent == len(job.events):
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def send_document(self, job, name, writer):
+        if not job.done:
+            await respond(writer, HTTPStatus.CONFLICT, {"Error": f"Job is {job.status}", "Status": job.status})
+            return
+        path = os.path.join(job.workdir, CHECKPOINT_FILE if name == "result" else ANSWER_FILE)
+        if not os.path.exists(path):
+            await respond(writer, HTTPStatus.NOT_FOUND, {"Error": f"The job produced no {name}", "Status": job.status})
+            return
+        with open(path, "rb") as f:
+            await respond(writer, HTTPStatus.OK, f.read())
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.loop = asyncio.get_running_loop()
+        await self.loop.run_in_executor(self.executor, self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Review service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+async def respond(writer, status, body, content_type="application/json"):
+    """Writes a complete response; body is JSON-serialized unless it is already bytes."""
+    if not isinstance(body, bytes):
+        body = json.dumps(body, indent=4, ensure_ascii=False).encode()
+    writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+def review_remotely(server, args, parser):
+    """
+    Thin client: submits the paper to a review service with the options that differ
+    from their defaults, prints the section results as they arrive and saves the final
+    documents locally, like a local run would. Returns the exit status.
+    """
+    server = server.rstrip("/")
+    # --plan-output is written here from the "plan" event
+    options = {key: value for key, value in vars(args).items()
+               if key not in ("url", "pdf_path", "server", "plan_output") and key not in PROCESS_OPTIONS
+               and value != parser.get_default(key)}
+    payload = {"url": args.url, "options": options}
+    if args.pdf_path.endswith(".pdf"):
+        with open(args.pdf_path, "rb") as f:
+            payload["pdf"] = base64.b64encode(f.read()).decode()
+    else:
+        with open(args.pdf_path, "r", encoding="utf-8") as f:
+            payload["paper"] = json.load(f)
+
+    with httpx.Client(base_url=server, timeout=httpx.Timeout(30.0, read=None)) as client:
+        response = client.post("/jobs", json=payload)
+        if response.status_code != HTTPStatus.ACCEPTED:
+            print(f"The service refused the paper: {response.json().get('Error', response.text)}")
+            return 1
+        job_id = response.json()["Id"]
+        print(f"Submitted job {job_id} to {server}")
+
+        with client.stream("GET", f"/jobs/{job_id}/events") as events:
+            for line in events.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                data = event["Data"]
+                if event["Event"] == "section":
+                    review = data["Review"]
+                    print(f"\n[{event['Time']:.1f}s] Reviewed {data['Section']} ({review.get('Review Depth', 'full')}):")
+                    print(review.get("Final Summary", ""))
+                elif event["Event"] == "desk":
+                    print(f"\n[{event['Time']:.1f}s] Desk review: {'accepted' if data['Accept'] else 'rejected' if data['Accept'] is False else 'no decision'}")
+                elif event["Event"] == "sections":
+                    print(f"\nSections: {', '.join(data['Sections'])}")
+                elif event["Event"] == "plan" and "Calls" in data:
+                    from util.plan import print_plan  # only a --plan run needs the planner
+                    print_plan(data["Calls"], data["Totals"])
+                    if args.plan_output:
+                        with open(args.plan_output, "w", encoding="utf-8") as f:
+                            json.dump({key: data[key] for key in ("Calls", "Totals", "Review Plan")}, f, indent=4, ensure_ascii=False)
+                        print(f"Plan saved to {args.plan_output}")
+                    if data["Exceeded"]:
+                        print(f"\nThe planned run exceeds the budget: {data['Exceeded']}")
+                elif event["Event"] == "plan":
+                    print("\nReview plan:")
+                    for name, plan in data["Review Plan"].items():
+                        print(f"- {name}: {plan['Depth']} (value {plan['Value']}, ~{plan['Estimated Cost']['calls']} calls)")
+                elif event["Event"] == "answers":
+                    print(f"[{event['Time']:.1f}s] Answered: {data['Question']}")
+
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["Status"] == "failed":
+            print(f"\nJob {job_id} failed: {job['Error']}")
+            return 1
+        for name, filename in (("result", CHECKPOINT_FILE), ("answers", ANSWER_FILE)):
+            response = client.get(f"/jobs/{job_id}/{name}")
+            if response.status_code == HTTPStatus.OK:
+                with open(filename, "wb") as f:
+                    f.write(response.content)
+                print(f"Saved {filename}")
+        print(f"\nJob {job_id} finished in {job['Run Seconds']:.2f} seconds")
+        return job["Exit Status"] or 0
+
+def main():
+    from util.pipeline import configure_process
+    from util.defaults import RETRIES, HEDGE_PERCENTILE, MIN_CONFIDENCE
+    parser = argparse.ArgumentParser(description="Long-running MARS review service")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--jobs-dir", type=str, default=JOBS_DIR, help="Directory of the per-job working directories")
+    parser.add_argument("--keep-alive", type=str, default=KEEP_ALIVE, help="How long Ollama keeps models loaded between calls and jobs")
+    parser.add_argument("--backends", type=str, default=None, help="Ollama hosts (see MARS.py --backends)")
+    parser.add_argument("--call-deadline", type=float, default=None, help="Seconds any model call may take (default: per-role deadlines)")
+    parser.add_argument("--call-retries", type=int, default=RETRIES, help="Retries of a model call that timed out or hit a server error")
+    parser.add_argument("--hedge", action="store_true", help="Send duplicate requests for slow calls")
+    parser.add_argument("--hedge-percentile", type=float, default=HEDGE_PERCENTILE, help="Latency percentile that triggers a hedged request")
+    parser.add_argument("--max-tokens", type=int, default=None, help="num_predict cap of every model call (default: uncapped)")
+    parser.add_argument("--context-size", choices=["auto", "pinned"], default="auto", help="Size num_ctx per request, or pin every model at 4096")
+    parser.add_argument("--tiering", action="store_true", help="Route each role to its smallest model tier, escalating on low confidence")
+    parser.add_argument("--cascade-confidence", type=float, default=MIN_CONFIDENCE, help="Structured confidence below which a tiered verdict escalates")
+    parser.add_argument("--metrics-file", type=str, default=None, help="Also write the metrics to this file on exit (they are served at /metrics)")
+    parser.add_argument("--record", type=str, default=None, help="Record the Ollama and external HTTP exchanges of all jobs to this cassette")
+    parser.add_argument("--replay", type=str, default=None, help="Serve the Ollama and external HTTP exchanges from this cassette")
+    parser.add_argument("--replay-latency", choices=["zero", "recorded"], default="zero", help="Answer replayed requests at once or after their recorded time")
+    args = parser.parse_args()
+
+    configure_process(args)
+    os.makedirs(args.jobs_dir, exist_ok=True)
+    service = ReviewService(args.jobs_dir)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nReview service stopped.")
+
+if __name__ == "__main__":
+    main()
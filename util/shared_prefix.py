@@ -0,0 +1,111 @@
+from util import llm, metrics
+from util.context_size import text_tokens, ESTIMATE_MARGIN
+from util.build_models import ROLE_MESSAGES
+from util.verdict import VERDICT_SCHEMA, STRUCTURED_INSTRUCTION, structured_options, parse_verdict
+
+# All role calls go to one base model so they can share its prompt-evaluation state.
+SHARED_PREFIX_MODEL = "llama3.2"
+KEEP_ALIVE = "10m"
+BASE_OPTIONS = {"temperature": 0.7}
+
+# Output key in all_section_reviews -> (role, instruction appended after the shared prefix).
+# The test agent gets no instruction, only its system prompt, as in the agents mode.
+CHECK_ROLES = {
+    "Test": ("test", ""),
+    "Grammar Check": ("grammar", "Check the grammar of the section above."),
+    "Novelty Check": ("novelty", "Judge whether the section above is novel."),
+    "Fact Check": ("factchecker", "Do you accept the claims in the section above? Say 'Accept' if yes and 'Reject' if no."),
+    "Questioner": ("questioner", "Ask your questions about the section above."),
+}
+
+VERDICT_ROLES = {"grammar", "novelty", "factchecker"}
+
+def build_shared_prefix(section_text):
+    """Canonical prefix shared by every role call on a section; role instructions always come after it."""
+    return (
+        "You are one of several agents reviewing the research paper section below. "
+        "Each agent receives its own instructions after the section.\n\n"
+        f"Section:\n\"\"\"\n{section_text}\n\"\"\"\n\n"
+        "Reply with OK once you have read the section."
+    )
+
+def role_prompt(role, instruction):
+    """Prompt of a role call after the shared prefix: the role agent's system prompt and its instruction."""
+    return "\n\n".join(part for part in (ROLE_MESSAGES[role], instruction) if part)
+
+def group_tokens(prefix, structured, roles=CHECK_ROLES):
+    """Tokens the prefix plus the longest role prompt and completion may take."""
+    role_tokens = 0
+    for role, instruction in roles.values():
+        prompt = role_prompt(role, instruction)
+        cap = llm.policy.completion_tokens(role)
+        if structured and role in VERDICT_ROLES:
+            prompt += f"\n\n{STRUCTURED_INSTRUCTION}"
+            cap = min(cap, structured_options(role).get("num_predict", cap))
+        role_tokens = max(role_tokens, text_tokens(prompt) + cap)
+    return int(text_tokens(prefix) * ESTIMATE_MARGIN) + role_tokens
+
+def shared_prefix_checks(section_text, structured=False, model=SHARED_PREFIX_MODEL, keys=None):
+    """
+    Runs the test, grammar, novelty, fact and questioner checks on one section
+    (keys limits them to some of CHECK_ROLES).
+
+    The section is evaluated once as a shared prefix; every role call continues from
+    the returned `context`, so Ollama only evaluates the role instructions. Returns the
+    check outputs keyed like all_section_reviews[section], plus a "Prompt Reuse" report.
+    """
+    roles = {key: role for key, role in CHECK_ROLES.items() if keys is None or key in keys}
+    prefix = build_shared_prefix(section_text)
+    # Every role call goes to the host that holds the evaluated prefix
+    affinity = hash(prefix)
+    # One context window for the prefix and its longest role call: a larger window would
+    # reload the model and drop the evaluated prefix
+    base_options = {**BASE_OPTIONS, "num_ctx": llm.context_window(model, group_tokens(prefix, structured, roles))}
+    try:
+        primed = llm.generate("prefix", model, prefix, affinity=affinity, keep_alive=KEEP_ALIVE,
+                              options={**base_options, "num_predict": 1})
+    except llm.CallTimeout as e:
+        print(f"Timeout: {e}")
+        checks = {key: e.record() for key in roles}
+        if "Questioner" in checks:
+            checks["Questioner"] = ""
+        return checks
+    context = primed.context
+    prefix_tokens = len(context)
+
+    checks = {}
+    evaluated = primed.prompt_eval_count or 0
+    unshared = 0
+    for key, (role, instruction) in roles.items():
+        prompt = role_prompt(role, instruction)
+        try:
+            if structured and role in VERDICT_ROLES:
+                response = llm.generate(role, model, f"{prompt}\n\n{STRUCTURED_INSTRUCTION}", context=context,
+                                        affinity=affinity, keep_alive=KEEP_ALIVE, format=VERDICT_SCHEMA,
+                                        options={**base_options, **structured_options(role)})
+                checks[key] = parse_verdict(response.response)
+            else:
+                response = llm.generate(role, model, prompt, context=context, affinity=affinity,
+                                        keep_alive=KEEP_ALIVE, options=base_options)
+                checks[key] = response.response
+        except llm.CallTimeout as e:
+            print(f"Timeout: {e}")
+            checks[key] = "" if key == "Questioner" else e.record()
+            continue
+        role_tokens = response.prompt_eval_count or 0
+        evaluated += role_tokens
+        metrics.cache_lookup("prompt_prefix", role_tokens < prefix_tokens)
+        # Without sharing this role would have evaluated the whole prefix again. If the
+        # runner dropped the cached prefix, the prefix is already part of role_tokens.
+        role_only = role_tokens - prefix_tokens if role_tokens > prefix_tokens else role_tokens
+        unshared += prefix_tokens + role_only
+
+    saved = max(0, unshared - evaluated)
+    metrics.PROMPT_TOKENS_SAVED.inc(saved)
+    print(f"Shared prefix: {prefix_tokens} tokens, {evaluated} evaluated, {saved} prompt-eval tokens saved")
+    checks["Prompt Reuse"] = {
+        "Prefix Tokens": prefix_tokens,
+        "Tokens Evaluated": evaluated,
+        "Tokens Saved": saved,
+    }
+    return checks
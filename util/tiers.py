@@ -0,0 +1,114 @@
+import threading
+from util import metrics
+from util.consensus import review_decision
+from util.defaults import MIN_CONFIDENCE
+
+# Base model of each tier, smallest first. The role agents were always built from llama3.2.
+TIER_MODELS = {
+    "small": "llama3.2:1b",
+    "medium": "llama3.2",
+    "large": "mistral",
+}
+BASE_TIER = "medium"
+
+# Role -> tiers tried in order. A call goes to the first tier and escalates to the next
+# one only when the output fails validation or its structured confidence is too low.
+ROLE_TIERS = {
+    "test": ("small", "medium"),
+    "questioner": ("small", "medium"),
+    "grammar": ("small", "medium"),
+    "novelty": ("medium", "large"),
+    "factchecker": ("medium", "large"),
+    "deskreviewer": ("medium", "large"),
+    "reviewer": ("medium", "large"),
+    "summarizer": ("medium", "large"),
+}
+
+# Roles answered by a model created with a system prompt (build_models); the others call the base model
+AGENT_ROLES = {"test", "questioner", "grammar", "novelty", "factchecker", "deskreviewer"}
+MIN_TEST_WORDS = 20
+
+class Tiering:
+    """Whether calls are cascaded through ROLE_TIERS, and the structured confidence that stops a cascade."""
+
+    def __init__(self, enabled=False, min_confidence=MIN_CONFIDENCE):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.log = []
+        self.lock = threading.Lock()
+
+tiering = Tiering()
+
+def configure(enabled=False, min_confidence=MIN_CONFIDENCE):
+    global tiering
+    tiering = Tiering(enabled, min_confidence)
+
+def enabled(role):
+    return tiering.enabled and role in ROLE_TIERS
+
+def tier_model(role, tier):
+    """Model answering a role at a tier: role agents get one model per tier (e.g. grammar-small), other roles the base model."""
+    if role not in AGENT_ROLES:
+        return TIER_MODELS[tier]
+    return role if tier == BASE_TIER else f"{role}-{tier}"
+
+def tier_agents(system_prompts):
+    """(model, base model, system prompt) of the role agents of every tier other than the base tier."""
+    return [(tier_model(role, tier), TIER_MODELS[tier], system)
+            for role, system in system_prompts.items() if role in ROLE_TIERS
+            for tier in ROLE_TIERS[role] if tier != BASE_TIER]
+
+def valid(role, output, min_confidence=MIN_CONFIDENCE):
+    """
+    True if a role's output can be used without escalating: a decision for the
+    Accept/Reject roles (with at least min_confidence when it is a structured verdict),
+    at least one question for the questioner and a non-trivial answer for the test agent.
+    """
+    if not output or (isinstance(output, dict) and output.get("Timeout")):
+        return False
+    if role == "questioner":
+        from util.questions import parse_questions
+        return bool(parse_questions(output))
+    if role == "test":
+        return len(str(output).split()) >= MIN_TEST_WORDS
+    decision, confidence = review_decision(output)
+    return decision is not None and (confidence is None or confidence >= min_confidence)
+
+def cascade(role, ask):
+    """
+    Calls ask(model) for each tier of the role until an output is valid; returns the
+    first valid output (or the last one). The tier that answered is logged.
+    """
+    tiers = ROLE_TIERS[role]
+    for i, tier in enumerate(tiers):
+        model = tier_model(role, tier)
+        output = ask(model)
+        accepted = valid(role, output, tiering.min_confidence)
+        metrics.CASCADE_CALLS.inc(role=role, tier=tier, outcome="accepted" if accepted else "escalated")
+        if accepted or i + 1 == len(tiers):
+            with tiering.lock:
+                tiering.log.append({"Role": role, "Tier": tier, "Model": model, "Escalations": i, "Valid": accepted})
+            return output
+        print(f"{role}: {model} gave no usable answer, escalating to {tier_model(role, tiers[i + 1])}")
+
+def cascade_reviews(review_fn, models):
+    """
+    Reviewer cascade: one review at a time from the reviewer tiers, stopping at the
+    first valid one. The models of the panel that were not called are recorded as
+    {"Skipped": True, "Reason": ...}, like the consensus early exit.
+    """
+    outputs = {}
+    def ask(model):
+        outputs[model] = review_fn(model)
+        return outputs[model]
+    cascade("reviewer", ask)
+    reason = f"Tiered review answered by {list(outputs)[-1]}"
+    for model in models:
+        outputs.setdefault(model, {"Skipped": True, "Reason": reason})
+    return outputs
+
+def drain_log():
+    """Cascade records since the last call (e.g. of one section)."""
+    with tiering.lock:
+        log, tiering.log = tiering.log, []
+    return log
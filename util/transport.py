@@ -0,0 +1,143 @@
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import httpx
+from util import metrics, cassette
+
+# Base URLs of the external tools (point them at a local stand-in server for testing)
+WIKIPEDIA_URL = os.environ.get("MARS_WIKIPEDIA_URL", "https://en.wikipedia.org")
+ARXIV_URL = os.environ.get("MARS_ARXIV_URL", "http://export.arxiv.org/api/query")
+
+# Per-host (requests per second, burst). arXiv asks for at most one request every three seconds.
+HOST_RATES = {
+    "export.arxiv.org": (1 / 3, 1),
+    "en.wikipedia.org": (10.0, 10),
+}
+DEFAULT_RATE = (5.0, 5)
+
+MAX_CONNECTIONS = 20
+MAX_CONCURRENCY = 10
+TIMEOUT = 10.0
+RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = "MARS/1.0 (multi-agent paper review)"
+
+class TokenBucket:
+    """Token bucket limiting the request rate to one host."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = None
+
+    async def acquire(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Transport:
+    """
+    Shared HTTP transport of the external tools (CFP pages, Wikipedia, arXiv).
+
+    One httpx.AsyncClient with keep-alive pools runs on a background event loop, so
+    synchronous callers on any thread share its connections. Requests are limited per
+    host by token buckets, bounded overall by a semaphore, and retried with exponential
+    backoff on connection errors, timeouts, 429 and 5xx responses (honouring Retry-After).
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT,
+                 retries=RETRIES, host_rates=None):
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.host_rates = {**HOST_RATES, **(host_rates or {})}
+        self.buckets = {}
+        self.client = None
+        self.semaphore = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="mars-transport", daemon=True)
+        self.thread.start()
+
+    def bucket(self, url):
+        host = urlparse(url).hostname or ""
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(*self.host_rates.get(host, DEFAULT_RATE))
+        return self.buckets[host]
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request; returns the last response, or raises the last error once retries are exhausted."""
+        if self.client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout, follow_redirects=True, headers={"User-Agent": USER_AGENT},
+                limits=limits, transport=cassette.async_transport(limits=limits))
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = self.bucket(url)
+        host = urlparse(url).hostname or ""
+        for attempt in range(self.retries + 1):
+            delay = 0.5 * 2 ** attempt + random.uniform(0, 0.25)
+            if not cassette.replaying():
+                await bucket.acquire()
+            start = time.monotonic()
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                metrics.HTTP_REQUESTS.inc(host=host, status=type(e).__name__)
+                if attempt == self.retries:
+                    raise
+            else:
+                metrics.HTTP_REQUESTS.inc(host=host, status=response.status_code)
+                metrics.HTTP_LATENCY.observe(time.monotonic() - start, host=host)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+    def run(self, coroutine):
+        """Runs a coroutine on the transport loop from synchronous code and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def get(self, url, **kwargs):
+        return self.run(self.request("GET", url, **kwargs))
+
+    def gather(self, coroutines):
+        """Runs several coroutines concurrently on the transport loop; returns their results in order."""
+        async def gather_all():
+            return await asyncio.gather(*coroutines, return_exceptions=True)
+        return self.run(gather_all())
+
+    def close(self):
+        if self.client is not None:
+            self.run(self.client.aclose())
+            self.client = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """The process-wide transport, created on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+            atexit.register(_transport.close)
+        return _transport
@@ -0,0 +1,82 @@
+import json
+import re
+
+# JSON schema passed as Ollama's `format` when agents run in structured mode.
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "decision": {"type": "string", "enum": ["Accept", "Reject"]},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        "rationale": {"type": "string"},
+    },
+    "required": ["decision", "confidence", "rationale"],
+}
+
+# Generation caps (num_predict) per role in structured mode.
+ROLE_NUM_PREDICT = {
+    "deskreviewer": 160,
+    "grammar": 160,
+    "novelty": 200,
+    "factchecker": 200,
+    "reviewer": 256,
+}
+
+DEFAULT_NUM_PREDICT = 256
+
+STRUCTURED_INSTRUCTION = (
+    "Respond ONLY with a JSON object with the fields \"decision\" (Accept or Reject), "
+    "\"confidence\" (a number between 0 and 1) and \"rationale\" (at most three sentences)."
+)
+
+def structured_options(role):
+    """Ollama options for a structured call made by the given role."""
+    return {"num_predict": ROLE_NUM_PREDICT.get(role, DEFAULT_NUM_PREDICT)}
+
+def parse_decision(text):
+    """
+    Returns True for Accept, False for Reject and None if neither is mentioned.
+
+    The last explicit "Decision: ..." (e.g. "Final Decision: Reject") wins. Without one,
+    the last decision word counts, as reviews tend to end on their verdict: "Cannot
+    accept as is ... I recommend to reject" is a Reject. Whole words only: "accepted"
+    and "rejected" count, "acceptable" and "rejection" do not.
+    """
+    matches = (re.findall(r'decision\W{0,5}\s*(accept|reject)', text or "", re.IGNORECASE)
+               or re.findall(r'\b(accept|reject)(?:ed)?\b', text or "", re.IGNORECASE))
+    if not matches:
+        return None
+    return matches[-1].lower() == "accept"
+
+def parse_verdict(content):
+    """Parses a structured agent response into a {decision, confidence, rationale} dict."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, dict) and data.get("decision") in ("Accept", "Reject"):
+        try:
+            confidence = min(1.0, max(0.0, float(data.get("confidence", 0.0))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return {
+            "decision": data["decision"],
+            "confidence": confidence,
+            "rationale": str(data.get("rationale", "")).strip(),
+        }
+
+    # The model ignored the schema; fall back to scraping the raw text.
+    accepted = parse_decision(content)
+    return {
+        "decision": None if accepted is None else ("Accept" if accepted else "Reject"),
+        "confidence": 0.0,
+        "rationale": (content or "").strip(),
+    }
+
+def verdict_text(review):
+    """Renders a review (free-form string or structured verdict) as plain text."""
+    if isinstance(review, dict) and review.get("Timeout"):
+        return f"[Timeout] {review.get('Reason', '')}"
+    if isinstance(review, dict):
+        return f"{review.get('decision')} (confidence {review.get('confidence', 0.0):.2f}): {review.get('rationale', '')}"
+    return review or ""
@@ -0,0 +1,453 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from util import metrics
+
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30.0
+POLL_SECONDS = 5.0
+BUSY_TIMEOUT_MS = 30000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    sections TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    paper TEXT NOT NULL,
+    section TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    requires TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (paper, section, agent)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, available_at);
+"""
+
+class Task:
+    """One leased unit of work: an agent's call(s) on one section of one paper."""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.paper = row["paper"]
+        self.section = row["section"]
+        self.agent = row["agent"]
+        self.payload = json.loads(row["payload"])
+        self.attempts = row["attempts"]
+        self.owner = row["lease_owner"]
+
+    def __repr__(self):
+        return f"Task({self.paper!r}, {self.section!r}, {self.agent!r}, attempt {self.attempts})"
+
+class WorkQueue:
+    """
+    Durable task queue in one SQLite file, shared by worker processes on one machine.
+
+    Tasks are unique per (paper, section, agent), so enqueueing again is a no-op.
+    A worker leases a task for lease_seconds (renewed while it runs); the lease of a
+    worker that died simply expires and the task is leased again. Results are written
+    once: the first completion wins and later ones are ignored. A task that failed
+    (or whose worker died) max_attempts times is poisoned: it is parked as "failed"
+    until retry_failed() puts it back. Tasks with requirements stay "blocked" until
+    the required agents of the same section are done.
+
+    The database uses WAL journaling; on a network filesystem, where WAL does not
+    work, pass journal_mode="DELETE".
+    """
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, retry_backoff=RETRY_BACKOFF, journal_mode="WAL"):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.journal_mode = journal_mode
+        self.local = threading.local()
+        self.db.executescript(SCHEMA)
+
+    @property
+    def db(self):
+        """Connection of the calling thread (SQLite connections are not shared between threads)."""
+        if not hasattr(self.local, "db"):
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self.local.db = db
+        return self.local.db
+
+    def transaction(self):
+        return Transaction(self.db)
+
+    def add_paper(self, paper, url, options, sections):
+        """Registers a paper; returns False if it was already registered (its tasks are kept)."""
+        with self.transaction() as db:
+            cursor = db.execute("INSERT OR IGNORE INTO papers VALUES (?, ?, ?, ?, ?)",
+                                (paper, url, json.dumps(options), json.dumps(sections), time.time()))
+            return cursor.rowcount == 1
+
+    def paper(self, paper):
+        row = self.db.execute("SELECT * FROM papers WHERE paper = ?", (paper,)).fetchone()
+        if row is None:
+            return None
+        return {"Paper": row["paper"], "Url": row["url"], "Options": json.loads(row["options"]),
+                "Sections": json.loads(row["sections"])}
+
+    def papers(self):
+        return [row["paper"] for row in self.db.execute("SELECT paper FROM papers ORDER BY created")]
+
+    def enqueue(self, paper, section, agent, payload=None, requires=()):
+        """Adds a task unless it exists; returns whether it was added."""
+        status = "blocked" if requires else "pending"
+        with self.transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO tasks (paper, section, agent, payload, requires, status, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (paper, section, agent, json.dumps(payload or {}), ",".join(requires), status, time.time()))
+            return cursor.rowcount == 1
+
+    def lease(self, owner, seconds=LEASE_SECONDS):
+        """Leases the oldest ready task (pending, or leased by a worker whose lease expired); None if there is none."""
+        now = time.time()
+        with self.transaction() as db:
+            # Tasks whose workers died on every attempt are poisoned too
+            db.execute("UPDATE tasks SET status = 'failed', error = COALESCE(error, 'Lease expired'), lease_owner = NULL, updated = ? "
+                       "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, now, self.max_attempts))
+            row = db.execute("SELECT * FROM tasks WHERE (status = 'pending' AND available_at <= ?) "
+                             "OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                       "WHERE id = ?", (owner, now + seconds, now, row["id"]))
+            return Task(db.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone())
+
+    def renew(self, task, seconds=LEASE_SECONDS):
+        """Extends a lease; returns False if the task is no longer leased by its worker."""
+        with self.transaction() as db:
+            cursor = db.execute("UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                                (time.time() + seconds, time.time(), task.id, task.owner))
+            return cursor.rowcount == 1
+
+    def complete(self, task, result):
+        """
+        Stores a task's result; returns False if the task already had one (the write is
+        idempotent: the first result is kept). Unblocks the tasks that required it.
+        """
+        with self.transaction() as db:
+            cursor = db.execute("UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                                "lease_expires = NULL, updated = ? WHERE id = ? AND status != 'done'",
+                                (json.dumps(result), time.time(), task.id))
+            if cursor.rowcount == 0:
+                return False
+            done = {row["agent"] for row in db.execute("SELECT agent FROM tasks WHERE paper = ? AND section = ? AND status = 'done'",
+                                                       (task.paper, task.section))}
+            for row in db.execute("SELECT id, requires FROM tasks WHERE paper = ? AND section = ? AND status = 'blocked'",
+                                  (task.paper, task.section)).fetchall():
+                if set(row["requires"].split(",")) <= done:
+                    db.execute("UPDATE tasks SET status = 'pending', updated = ? WHERE id = ?", (time.time(), row["id"]))
+            return True
+
+    def fail(self, task, error):
+        """Records a failed attempt: the task is retried after a backoff, or poisoned after max_attempts."""
+        now = time.time()
+        poisoned = task.attempts >= self.max_attempts
+        with self.transaction() as db:
+            db.execute("UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, available_at = ?, updated = ? "
+                       "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                       ("failed" if poisoned else "pending", error, now + self.retry_backoff * 2 ** (task.attempts - 1),
+                        now, task.id, task.owner))
+        return poisoned
+
+    def retry_failed(self, paper=None):
+        """Puts poisoned tasks back in the queue with fresh attempts; returns how many."""
+        with self.transaction() as db:
+            cursor = db.execute("UPDATE tasks SET status = 'pending', attempts = 0, available_at = 0, updated = ? "
+                                "WHERE status = 'failed' AND (? IS NULL OR paper = ?)", (time.time(), paper, paper))
+            return cursor.rowcount
+
+    def results(self, paper, section=None):
+        """{section: {agent: result}} of the finished tasks of a paper (or {agent: result} of one section)."""
+        rows = self.db.execute("SELECT section, agent, result FROM tasks WHERE paper = ? AND status = 'done'", (paper,))
+        results = {}
+        for row in rows:
+            results.setdefault(row["section"], {})[row["agent"]] = json.loads(row["result"])
+        return results.get(section, {}) if section is not None else results
+
+    def counts(self, paper=None):
+        """Number of tasks per status."""
+        rows = self.db.execute("SELECT status, COUNT(*) AS n FROM tasks WHERE (? IS NULL OR paper = ?) GROUP BY status", (paper, paper))
+        return {row["status"]: row["n"] for row in rows}
+
+    def failures(self, paper=None):
+        """
+        Poisoned tasks, and the blocked tasks that require one of them: those cannot run
+        until the poisoned task is retried and done.
+        """
+        rows = [dict(row) for row in self.db.execute(
+            "SELECT paper, section, agent, status, attempts, error, requires FROM tasks WHERE status IN ('failed', 'blocked') "
+            "AND (? IS NULL OR paper = ?) ORDER BY id", (paper, paper))]
+        failed = {(row["paper"], row["section"], row["agent"]) for row in rows if row["status"] == "failed"}
+        failures = []
+        for row in rows:
+            requires = row.pop("requires").split(",")
+            if row["status"] == "blocked":
+                waiting = [agent for agent in requires if (row["paper"], row["section"], agent) in failed]
+                if not waiting:
+                    continue
+                row["error"] = f"Requires failed {', '.join(waiting)}"
+            failures.append(row)
+        return failures
+
+class Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (or ROLLBACK on error), so concurrent workers never lease the same task."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, kind, value, traceback):
+        self.db.execute("COMMIT" if kind is None else "ROLLBACK")
+
+# ---- Review tasks ----
+
+DESK_SECTION = "DeskReviewer"
+
+def paper_tasks(sections, options):
+    """
+    (section, agent, requires) units of work of a paper: the desk review, one task per
+    reviewer model and per check agent of each section (one task for all checks in the
+    shared-prefix and combined modes), and a summarizer task that requires the reviewers.
+    """
+    from util.pipeline import CHECK_AGENTS
+    from util.options import MODELS
+    tasks = [(DESK_SECTION, "deskreviewer", ())]
+    for name, _ in sections:
+        reviewers = tuple(f"reviewer:{model}" for model in MODELS)
+        tasks += [(name, agent, ()) for agent in reviewers]
+        if options.get("check_mode", "agents") == "agents":
+            tasks += [(name, f"check:{key}", ()) for key in CHECK_AGENTS]
+        else:
+            tasks.append((name, "checks", ()))
+        tasks.append((name, "summarizer", reviewers))
+    return tasks
+
+def enqueue_paper(queue, paper, url, path, options):
+    """Parses (and prunes) a paper and enqueues its tasks; returns the number of new tasks."""
+    from util.pipeline import read_paper, desk_gate_text
+    from util.prune import prune_sections, MIN_WORDS, SIMILARITY_THRESHOLD
+    sections, abstract_text = read_paper(path)
+    if not sections:
+        print(f"No sections found in {path}")
+        return 0
+    # The desk reviewer judges the abstract, as in a local run (before pruning)
+    texts = {DESK_SECTION: desk_gate_text(sections, abstract_text)}
+    sections, _ = prune_sections(sections, options.get("prune", "off"), options.get("prune_min_words", MIN_WORDS),
+                                 options.get("prune_similarity", SIMILARITY_THRESHOLD))
+    if not sections:
+        print(f"No sections left to review in {path}")
+        return 0
+    queue.add_paper(paper, url, options, sections)
+    texts.update(sections)
+    added = 0
+    for section, agent, requires in paper_tasks(sections, options):
+        added += queue.enqueue(paper, section, agent, {"text": texts[section]}, requires)
+    return added
+
+def execute_task(queue, task):
+    """Runs one review task and returns its result (JSON-serializable)."""
+    from util import pipeline
+    from util.build_models import provision_base_models, generate_desk_reviewer
+    from util.review_collab import reviewer_agent, summarizer, fancy_aggregate_reviews
+    from util.reviewer import assigned_reviewers
+    from util.consensus import is_skipped
+    from util.verdict import verdict_text
+
+    info = queue.paper(task.paper)
+    args = argparse.Namespace(**{**vars(pipeline_defaults()), **info["Options"]})
+    text = task.payload["text"]
+
+    if task.agent == "deskreviewer":
+        generate_desk_reviewer(info["Url"])
+        accept, review = pipeline.consult_desk_reviewer(text, args.structured)
+        return {"Review": review, "Accept": accept}
+    if task.agent.startswith("reviewer:"):
+        return reviewer_agent(assigned_reviewers[0], text, task.agent.split(":", 1)[1], structured=args.structured)
+    if task.agent.startswith("check:"):
+        provision_base_models(info["Url"])
+        return pipeline.run_checks(text, args, keys={task.agent.split(":", 1)[1]})
+    if task.agent == "checks":
+        provision_base_models(info["Url"])
+        return pipeline.run_checks(text, args)
+    if task.agent == "summarizer":
+        results = queue.results(task.paper, task.section)
+        reviews = [results[a] for a in sorted(results) if a.startswith("reviewer:")]
+        aggregated_review = fancy_aggregate_reviews([verdict_text(r) for r in reviews if not is_skipped(r)])
+        return {"Aggregated": aggregated_review, "Summary": summarizer(text, aggregated_review)}
+    raise ValueError(f"Unknown agent: {task.agent}")
+
+def pipeline_defaults():
+    from util.options import build_parser
+    return build_parser().parse_args(["", ""])
+
+def assemble_feedback(queue, paper):
+    """The feedback_collab document of a paper, from the results finished so far."""
+    from util.incremental import section_hash
+    from util.pipeline import full_review
+    info = queue.paper(paper)
+    results = queue.results(paper)
+    reviews = {}
+    if "deskreviewer" in results.get(DESK_SECTION, {}):
+        reviews["DeskReviewer"] = results[DESK_SECTION]["deskreviewer"]
+    for name, _ in info["Sections"]:
+        done = results.get(name, {})
+        if "summarizer" not in done or not ("checks" in done or any(a.startswith("check:") for a in done)):
+            continue
+        checks = dict(done.get("checks", {}))
+        for agent, result in done.items():
+            if agent.startswith("check:"):
+                checks.update(result)
+        if not all(key in checks for key in ("Test", "Grammar Check", "Novelty Check", "Fact Check", "Questioner")):
+            continue
+        review_outputs = {a.split(":", 1)[1]: r for a, r in done.items() if a.startswith("reviewer:")}
+        reviews[name] = full_review(review_outputs, checks, done["summarizer"]["Aggregated"], done["summarizer"]["Summary"])
+    return {
+        "Available Sections": [s[0] for s in info["Sections"]],
+        "Section Reviews": reviews,
+        "Section Hashes": {name: section_hash(text) for name, text in info["Sections"] if name in reviews},
+        "Desk Review Hash": None,
+    }
+
+class Heartbeat:
+    """Renews a task's lease in the background while the task runs."""
+
+    def __init__(self, queue, task, seconds):
+        self.stop = threading.Event()
+        def run():
+            while not self.stop.wait(seconds / 3):
+                if not queue.renew(task, seconds):
+                    break
+        self.thread = threading.Thread(target=run, name="mars-lease", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+
+    def __exit__(self, *exc):
+        self.stop.set()
+
+def record_queue_metrics(queue, metrics_file=None):
+    """Sets the queue depth gauges and, with metrics_file, dumps the metrics."""
+    counts = queue.counts()
+    for status in ("pending", "blocked", "leased", "done", "failed"):
+        metrics.QUEUE_TASKS.set(counts.get(status, 0), status=status)
+    if metrics_file:
+        metrics.write_textfile(metrics_file)
+    return counts
+
+def run_worker(queue, worker_id=None, lease_seconds=LEASE_SECONDS, exit_when_empty=False, poll_seconds=POLL_SECONDS,
+               metrics_file=None):
+    """
+    Leases and runs tasks until interrupted (or, with exit_when_empty, until nothing is ready or running).
+    With metrics_file, the worker's metrics are written there after every task.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Worker {worker_id} started on {queue.path}")
+    while True:
+        task = queue.lease(worker_id, lease_seconds)
+        if task is None:
+            counts = record_queue_metrics(queue, metrics_file)
+            if exit_when_empty and not counts.get("pending") and not counts.get("leased"):
+                print(f"Worker {worker_id}: nothing left to do ({counts})")
+                return
+            time.sleep(poll_seconds)
+            continue
+        print(f"Worker {worker_id}: {task}")
+        start = time.time()
+        try:
+            with Heartbeat(queue, task, lease_seconds):
+                result = execute_task(queue, task)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            poisoned = queue.fail(task, error)
+            print(f"Worker {worker_id}: {task} failed ({error}){', poisoned' if poisoned else ', will be retried'}")
+            record_queue_metrics(queue, metrics_file)
+            continue
+        if not queue.complete(task, result):
+            print(f"Worker {worker_id}: {task} was already done; result discarded")
+        elif task.agent == "summarizer":
+            metrics.section_reviewed("full")
+        print(f"Worker {worker_id}: {task} done in {time.time() - start:.1f}s")
+        record_queue_metrics(queue, metrics_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable review queue shared by several MARS workers")
+    parser.add_argument("db", type=str, help="Queue database (SQLite file)")
+    parser.add_argument("--journal-mode", type=str, default="WAL", help="SQLite journal mode (use DELETE on network filesystems)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Add papers and their review tasks")
+    enqueue.add_argument("url", type=str, help="Conference CFP")
+    enqueue.add_argument("papers", nargs="+", help="Paper JSON or PDF files (the file name is the paper id)")
+    enqueue.add_argument("--structured", action="store_true", help="Agents return compact {decision, confidence, rationale} verdicts")
+    enqueue.add_argument("--check-mode", choices=["agents", "shared-prefix", "combined"], default="agents", help="How the checks are run")
+    enqueue.add_argument("--fact-check", choices=["agent", "claims"], default="agent", help="Fact check agent or claim-level fact check")
+    enqueue.add_argument("--prune", choices=["off", "skip", "merge"], default="off", help="Prune empty, reference-only and near-duplicate sections")
+
+    work = commands.add_parser("work", help="Run a worker")
+    work.add_argument("--worker-id", type=str, default=None, help="Worker name (default: host:pid)")
+    work.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS, help="Lease of a task; renewed while the task runs")
+    work.add_argument("--exit-when-empty", action="store_true", help="Stop once no task is ready or running")
+    work.add_argument("--metrics-file", type=str, default=None, help="Write the worker's Prometheus metrics to this file after every task")
+
+    commands.add_parser("status", help="Task counts, poisoned tasks and the tasks they block")
+    retry = commands.add_parser("retry", help="Put poisoned tasks back in the queue")
+    retry.add_argument("--paper", type=str, default=None, help="Only this paper's tasks")
+    export = commands.add_parser("export", help="Write a paper's feedback_collab document")
+    export.add_argument("paper", type=str, help="Paper id")
+    export.add_argument("output", type=str, help="Output JSON file")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db, journal_mode=args.journal_mode)
+    if args.command == "enqueue":
+        options = {"structured": args.structured, "check_mode": args.check_mode, "fact_check": args.fact_check, "prune": args.prune}
+        for path in args.papers:
+            paper = os.path.splitext(os.path.basename(path))[0]
+            print(f"{paper}: {enqueue_paper(queue, paper, args.url, path, options)} new tasks")
+    elif args.command == "work":
+        from util.pipeline import configure_process
+        configure_process(pipeline_defaults())
+        run_worker(queue, args.worker_id, args.lease_seconds, args.exit_when_empty, metrics_file=args.metrics_file)
+    elif args.command == "status":
+        for paper in queue.papers():
+            print(f"{paper}: {queue.counts(paper)}")
+        for failure in queue.failures():
+            if failure["status"] == "blocked":
+                print(f"Blocked: {failure['paper']} / {failure['section']} / {failure['agent']}: {failure['error']}")
+                continue
+            print(f"Poisoned: {failure['paper']} / {failure['section']} / {failure['agent']} "
+                  f"after {failure['attempts']} attempts: {failure['error']}")
+    elif args.command == "retry":
+        print(f"{queue.retry_failed(args.paper)} tasks queued again")
+    elif args.command == "export":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(assemble_feedback(queue, args.paper), f, indent=4, ensure_ascii=False)
+        print(f"Saved {args.output}")
+
+if __name__ == "__main__":
+    main()